@@ -12,6 +12,7 @@ export default function Admin() {
   const [message, setMessage] = useState('');
   const [logs, setLogs] = useState([]);      
   const [students, setStudents] = useState([]); 
+  const [nextCursor, setNextCursor] = useState(null);
   const [stats, setStats] = useState({ total: 0, avgCGPA: '0.00', highestCGPA: '0.00' });
   
   // History Modal State
@@ -35,22 +36,32 @@ export default function Admin() {
       const response = await authFetch('/api/students');
       const studentsList = Array.isArray(response.data) ? response.data : response || [];
       setStudents(studentsList);
-      calculateStats(studentsList);
+      setNextCursor(response.next || null);
     } catch (err) { console.error(err); }
   };
 
-  const calculateStats = (list) => {
-    if (list.length === 0) return;
-    const total = list.length;
-    const sumCGPA = list.reduce((acc, curr) => acc + parseFloat(curr.cgpa || 0), 0);
-    const avg = (sumCGPA / total).toFixed(2);
-    const highest = Math.max(...list.map(s => parseFloat(s.cgpa || 0))).toFixed(2);
-    setStats({ total, avgCGPA: avg, highestCGPA: highest });
+  // Aggregates are maintained server-side, so they cover every student, not just the loaded page.
+  const fetchStats = async () => {
+    try {
+      const response = await authFetch('/api/stats');
+      setStats({ total: response.total || 0, avgCGPA: response.avgCGPA || '0.00', highestCGPA: response.highestCGPA || '0.00' });
+    } catch (err) { console.error(err); }
+  };
+
+  const loadMoreStudents = async () => {
+    if (!nextCursor) return;
+    try {
+      const response = await authFetch(`/api/students?start_after=${encodeURIComponent(nextCursor)}`);
+      const page = Array.isArray(response.data) ? response.data : [];
+      setStudents(prev => [...prev, ...page]);
+      setNextCursor(response.next || null);
+    } catch (err) { console.error(err); }
   };
 
   useEffect(() => { 
       fetchLogs(); 
       fetchStudents();
+      fetchStats();
       
       // Close dropdown if clicking anywhere else
       const closeMenu = () => setActiveDropdown(null);
@@ -104,7 +115,7 @@ export default function Admin() {
     try {
       await authFetch('/api/results', { method: 'POST', body: JSON.stringify(formData) });
       setMessage('✅ Result Processed Successfully!');
-      fetchLogs(); fetchStudents();
+      fetchLogs(); fetchStudents(); fetchStats();
       setFormData({
         matricNumber: '', name: '', department: '', level: '', semester: 'First',
         yearOfAdmission: new Date().getFullYear(),
@@ -117,7 +128,7 @@ export default function Admin() {
     if(!window.confirm(`Delete record for ${matric}?`)) return;
     try { 
         await authFetch(`/api/results/${matric}`, { method: 'DELETE' }); 
-        fetchStudents(); fetchLogs(); 
+        fetchStudents(); fetchStats(); fetchLogs(); 
     } catch (err) { setMessage(`❌ Delete failed: ${err.message}`); }
   };
 
@@ -161,12 +172,12 @@ export default function Admin() {
   };
 
   const clearAllLogs = async () => {
-    const password = prompt("Enter Admin Passcode to confirm clear:");
+    const password = prompt("Enter Admin Passcode to confirm archiving:");
     if (password !== 'admin123') return alert("Wrong Passcode");
     try {
       await authFetch('/api/logs', { method: 'DELETE' });
-      fetchLogs(); setMessage('✅ Logs cleared successfully');
-    } catch (err) { setMessage(`❌ Failed to clear logs: ${err.message}`); }
+      fetchLogs(); setMessage('✅ Log archiving started; archived events stay listed');
+    } catch (err) { setMessage(`❌ Failed to archive logs: ${err.message}`); }
   };
   
   // Toggle Menu helper
@@ -281,13 +292,16 @@ export default function Admin() {
                 </tbody>
             </table>
         </div>
+        {nextCursor && (
+            <button type="button" className="secondary-btn" onClick={loadMoreStudents} style={{ marginTop: '10px', width: '100%' }}>Load More</button>
+        )}
       </div>
 
       {/* SYSTEM LOGS */}
       <div style={{ marginTop: '40px' }}>
         <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '15px' }}>
             <h3>🔒 System Audit Logs</h3>
-            <button onClick={clearAllLogs} className="secondary-btn" style={{ color: 'var(--danger)', borderColor: 'var(--danger)' }}>Clear Logs</button>
+            <button onClick={clearAllLogs} className="secondary-btn" style={{ color: 'var(--danger)', borderColor: 'var(--danger)' }}>Archive Logs</button>
         </div>
         <div className="table-container" style={{ maxHeight: '300px', overflowY: 'auto' }}>
             <table>
@@ -1,115 +1,235 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import happybase
+import atexit
 import json
+import os
 import time
-import uuid
 import datetime
+import threading
+from contextlib import contextmanager
+from itertools import chain
+
+import archive
+import audit
+import breaker
+import cache
+import export
+import grading
+import indexes
+import ingest
+import metrics
+import records
+import search
+import stats
+import versions
+import writes
+from storage import make_storage, row_prefix_stop
 
 app = Flask(__name__)
 CORS(app)
 
 # --- CONFIGURATION ---
-HBASE_HOST = '10.47.246.170'  # YOUR SERVER IP
-HBASE_PORT = 9090
+# UNISEMI_STORAGE=hbase (default) or memory; HBASE_HOST / HBASE_PORT / HBASE_POOL_SIZE
+# tune the HBase backend (see storage.py).
 TABLE_STUDENTS = 'students'
 TABLE_LOGS = 'system_logs'
+TABLE_STATS = stats.TABLE_STATS
+TABLE_INDEX = indexes.TABLE_INDEX
+
+# Column families per table; ensure_schema creates whatever is missing.
+SCHEMA = {
+    TABLE_STUDENTS: {'info': dict(), 'academic': {'max_versions': 5}},  # Versioning for History
+    TABLE_LOGS: {'details': dict()},
+    TABLE_STATS: stats.STATS_FAMILIES,
+    TABLE_INDEX: indexes.INDEX_FAMILIES,
+}
+
+# Student listing: page sizes and the columns a list row needs (never academic:history).
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+FILTERED_SCAN_BATCH = 1000
+STUDENT_LIST_COLUMNS = [b'info:name', b'info:dept', b'info:cgpa']
+DEFAULT_LEADERBOARD_SIZE = 50
+DEFAULT_LOG_PAGE_SIZE = 50
+# Full-registry export: whole rows per scanner batch.
+EXPORT_SCAN_BATCH = export.DEFAULT_BATCH_SIZE
+# Batch lookups: matrics per request, and keys per table.rows() call.
+MAX_BATCH_MATRICS = 1000
+BATCH_ROWS_CHUNK = 100
+# fields= projection: each field and the columns it needs (academicHistory reads the academic family).
+BATCH_FIELDS = {
+    'name': [b'info:name'],
+    'department': [b'info:dept'],
+    'cgpa': [b'info:cgpa'],
+    'gpa': [b'info:gpa'],
+    'semesters': [records.COL_SEMESTERS],
+    'academicHistory': [b'academic'],
+}
+
+# Bulk ingestion: records grouped per multi-get, and mutations per table.batch() send.
+BULK_CHUNK_RECORDS = 5000
+BULK_BATCH_SIZE = 1000
+
+# One storage backend (and connection pool) per process; threaded WSGI workers share it.
+storage = make_storage()
+
+# Fails storage calls fast (503) while HBase is down; UNISEMI_BREAKER_FAILURES /
+# UNISEMI_BREAKER_RESET tune it, UNISEMI_HEALTH_INTERVAL sets the probe period.
+BREAKER = breaker.make_breaker()
+
+@contextmanager
+def db_connection():
+    """A pooled connection, guarded by the circuit breaker."""
+    with BREAKER.guard(), storage.connection() as connection:
+        yield connection
+
+def probe_storage():
+    with storage.connection() as connection, metrics.storage_op('tables'):
+        connection.tables()
+
+HEALTH = breaker.HealthProber(probe_storage, BREAKER,
+                              interval=float(os.environ.get('UNISEMI_HEALTH_INTERVAL', 5.0)))
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def use_storage(backend):
+    """Swaps the storage backend (benchmarks and local runs use MemoryStorage)."""
+    global storage, _schema_ready
+    with _schema_lock:
+        storage = backend
+        _schema_ready = False
+
+def ensure_schema():
+    """Creates the tables once per process instead of on every request."""
+    global _schema_ready
+    if _schema_ready: return
+    with _schema_lock:
+        if _schema_ready: return
+        with storage.connection() as connection:  # callers hold the breaker guard
+            with metrics.storage_op('tables'):
+                tables = connection.tables()
+            for name, families in SCHEMA.items():
+                if name.encode() not in tables:
+                    connection.create_table(name, families)
+        _schema_ready = True
 
-def get_db(table_name, retry=True):
+@contextmanager
+def get_db(table_name):
+    """Checks a pooled connection out (unless the circuit is open) and yields the requested (timed) table."""
+    with get_dbs(table_name) as (table,):
+        yield table
+
+@contextmanager
+def get_dbs(*table_names):
+    """
+    get_db for several tables under one breaker guard and on one pooled
+    connection, so a request that needs two tables spends one half-open
+    trial, not two, and never holds more than one connection.
+    """
+    with BREAKER.guard():
+        try:
+            ensure_schema()
+        except Exception as e:
+            print(f"⚠️ DB Connect Error: {e}")
+            raise
+        with storage.connection() as connection:
+            yield [metrics.InstrumentedTable(connection.table(name)) for name in table_names]
+
+# Rendered GET /api/results/<matric> bodies; UNISEMI_CACHE_BYTES / UNISEMI_CACHE_TTL size it.
+TRANSCRIPTS = cache.make_transcript_cache()
+
+# Audit events are queued and written in batches by a background thread (see audit.py);
+# UNISEMI_AUDIT_QUEUE_SIZE / _BATCH_SIZE / _FLUSH_INTERVAL / _QUEUE_POLICY tune it.
+AUDIT = audit.make_audit_log(lambda: get_db(TABLE_LOGS))
+atexit.register(AUDIT.close)
+atexit.register(HEALTH.close)
+# Events moved out of system_logs by retention (see archive.py); UNISEMI_LOG_ARCHIVE_DIR sets where.
+LOG_ARCHIVE = archive.LogArchive(os.environ.get('UNISEMI_LOG_ARCHIVE_DIR', archive.DEFAULT_DIR))
+# DELETE /api/logs archives on this background thread, never on the request's worker.
+LOG_ARCHIVER = archive.ArchiveRunner(lambda: get_db(TABLE_LOGS),
+                                     flush=lambda: AUDIT.flush(timeout=AUDIT.flush_interval))
+
+# Name / matric lookups; built from an info:-only scan on first use (serve.py warms it).
+SEARCH = search.SearchIndex(lambda: get_db(TABLE_STUDENTS))
+
+# Result uploads: coalesced per matric, written with a version check (see writes.py);
+# UNISEMI_WRITE_ATTEMPTS / _BACKOFF / _CLAIM_TIMEOUT tune the retries.
+WRITES = writes.make_writer()
+UPLOADS = writes.Coalescer(lambda matric, uploads: apply_uploads(matric, uploads))
+
+def write_stats():
+    return {**UPLOADS.stats(), **WRITES.stats()}
+
+def log_action(action, details, matric=None):
+    AUDIT.submit(action, details, matric)
+
+def record_student_change(matric, old, new):
+    record_student_changes([(matric, old, new)])
+
+def record_student_changes(changes):
+    """
+    Keeps the transcript cache, search index, statistics counters and
+    secondary indexes in step with writes to `students`, given as
+    (matric, old state, new state).
+    Counter and index failures only cause drift, which `stats.py rebuild`
+    and `indexes.py rebuild` repair, so they never fail the request.
+    """
+    TRANSCRIPTS.invalidate([matric for matric, _, _ in changes])
     try:
-        connection = happybase.Connection(
-            HBASE_HOST, port=HBASE_PORT, timeout=5000, 
-            transport='buffered', protocol='binary', autoconnect=True
-        )
-        tables = connection.tables()
-        
-        # Enable Versioning for History
-        if TABLE_STUDENTS.encode() not in tables:
-            connection.create_table(TABLE_STUDENTS, {
-                'info': dict(), 
-                'academic': {'max_versions': 5}
-            })
-        if TABLE_LOGS.encode() not in tables:
-            connection.create_table(TABLE_LOGS, {'details': dict()})
-            
-        return connection, connection.table(table_name)
+        SEARCH.record_changes(changes)
     except Exception as e:
-        print(f"⚠️ DB Connect Error: {e}")
-        if retry:
-            time.sleep(1)
-            return get_db(table_name, retry=False)
-        return None, None
-
-def log_action(action, details):
-    conn, table = get_db(TABLE_LOGS)
-    if not table: return
+        print(f"⚠️ Search Index Update Error: {e}")
+    as_pair = lambda state: (state['department'], state['cgpa']) if state else None
     try:
-        timestamp = str(int(time.time() * 1000))
-        row_key = f"{timestamp}_{uuid.uuid4().hex[:8]}"
-        table.put(row_key.encode(), {
-            b'details:action': action.encode(),
-            b'details:info': details.encode(),
-            b'details:time': timestamp.encode()
-        })
-    finally:
-        if conn: conn.close()
-
-# --- MATH LOGIC (UPDATED) ---
-def get_grade_letter(score):
-    """Converts numeric score to Letter Grade."""
+        with get_db(TABLE_STATS) as table:
+            stats.record_changes(table, [(as_pair(old), as_pair(new)) for _, old, new in changes])
+    except Exception as e:
+        print(f"⚠️ Stats Update Error: {e}")
     try:
-        s = float(score)
-        if s >= 70: return 'A', 5
-        if s >= 60: return 'B', 4
-        if s >= 50: return 'C', 3
-        if s >= 45: return 'D', 2
-        return 'F', 0
-    except:
-        return 'F', 0
+        with get_db(TABLE_INDEX) as table:
+            indexes.record_changes(table, changes)
+    except Exception as e:
+        print(f"⚠️ Index Update Error: {e}")
+
+# --- MATH LOGIC ---
+# One threshold table grades every path (API, bulk, migration, Spark); see grading.py.
+GRADING = grading.GradingScale.from_env()
 
 def calculate_gpa_data(courses):
     """Calculates GPA and populates Letter Grades."""
-    total_points = 0
-    total_units = 0
-    processed_courses = []
-
-    for course in courses:
-        # Get score and unit
-        score = course.get('score', 0)
-        unit = int(course.get('unit', 3))
-        
-        # Calculate Grade & Point
-        letter, point = get_grade_letter(score)
-        
-        # Inject Letter Grade into the course object!
-        course['grade'] = letter 
-        
-        total_points += (point * unit)
-        total_units += unit
-        processed_courses.append(course)
-
-    if total_units == 0:
-        return "0.00", processed_courses
-    
-    gpa = total_points / total_units
-    return "{:.2f}".format(gpa), processed_courses
-
-def calculate_cumulative(history):
-    total_points = 0
-    total_units = 0
-    for semester in history:
-        for course in semester.get('courses', []):
-            try:
-                score = course.get('score', 0)
-                unit = int(course.get('unit', 3))
-                _, point = get_grade_letter(score)
-                
-                total_points += (point * unit)
-                total_units += unit
-            except: continue
-
-    if total_units == 0: return "0.00"
-    return "{:.2f}".format(total_points / total_units)
+    return GRADING.gpa_data(courses)
+
+# --- INSTRUMENTATION ---
+# Per-route latency and status counts for every request; UNISEMI_SERVER_TIMING=1 also
+# reports the request's storage and processing phases in a Server-Timing header.
+SERVER_TIMING = os.environ.get('UNISEMI_SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+metrics.REGISTRY.register(metrics.StatsGauges('unisemi_pool', "Storage connection pool", lambda: storage.stats()))
+metrics.REGISTRY.register(metrics.StatsGauges('unisemi_audit', "Audit log writer", AUDIT.stats))
+metrics.REGISTRY.register(metrics.StatsGauges('unisemi_cache', "Transcript cache", TRANSCRIPTS.stats))
+metrics.REGISTRY.register(metrics.StatsGauges('unisemi_breaker', "Storage circuit breaker", BREAKER.stats))
+metrics.REGISTRY.register(metrics.StatsGauges('unisemi_search', "Name / matric search index", SEARCH.stats))
+metrics.REGISTRY.register(metrics.StatsGauges('unisemi_log_archive', "Archived audit log segments", LOG_ARCHIVE.stats))
+metrics.REGISTRY.register(metrics.StatsGauges('unisemi_writes', "Result upload coalescing and write conflicts", write_stats))
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    g.phases = metrics.begin_request()
+
+@app.after_request
+def record_request(response):
+    if 'started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.started
+    phases = metrics.end_request(g.pop('phases'))
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUESTS.observe(elapsed, route, request.method)
+    metrics.RESPONSES.inc(route, request.method, str(response.status_code))
+    if SERVER_TIMING:
+        response.headers['Server-Timing'] = metrics.server_timing(phases, elapsed)
+    return response
 
 # --- ROUTES ---
 
@@ -121,75 +241,387 @@ def login():
         return jsonify({'success': True})
     return jsonify({'success': False, 'error': 'Invalid Passcode'}), 401
 
+def student_summary(key, data):
+    return {
+        'matricNumber': key.decode('utf-8'),
+        'name': data.get(b'info:name', b'').decode('utf-8'),
+        'department': data.get(b'info:dept', b'').decode('utf-8'),
+        'cgpa': data.get(b'info:cgpa', b'0.00').decode('utf-8')
+    }
+
+def page_size_arg(default=DEFAULT_PAGE_SIZE):
+    """The ?limit= page size clamped to 1..MAX_PAGE_SIZE; raises ValueError if not a number."""
+    return min(max(int(request.args.get('limit', default)), 1), MAX_PAGE_SIZE)
+
+def cgpa_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''): return None
+    float(value)  # raises ValueError for junk
+    return value
+
+def time_arg(name):
+    """?from= / ?to= as epoch milliseconds; also accepts ISO dates ('to' dates cover the whole day)."""
+    value = request.args.get(name)
+    if value in (None, ''): return None
+    if value.isdigit(): return int(value)
+    moment = datetime.datetime.fromisoformat(value)  # raises ValueError for junk
+    if name == 'to' and len(value) == 10:
+        moment += datetime.timedelta(days=1, milliseconds=-1)
+    return int(moment.timestamp() * 1000)
+
+def after_cursor(row_start, start_after):
+    """Moves a scan start past the previous page's last row key."""
+    if not start_after: return row_start
+    after = start_after.encode() + b'\x00'  # smallest key sorting after the cursor
+    return after if row_start is None or after > row_start else row_start
+
+def streamed(first, body, **kwargs):
+    """
+    Response sending `first`, then the rest of the generator `body`. A client
+    that hangs up closes `body` at once, so its get_db exits (and any
+    half-open breaker trial is handed back) without waiting for the GC.
+    """
+    response = Response(chain([first], body), **kwargs)
+    response.call_on_close(body.close)
+    return response
+
+def stream_page(table_name, page_size, decode, keep=None, **scan_kwargs):
+    """
+    Streams {"data": [...], "next": cursor} for one page of a range scan.
+    `next` is the last row key returned (pass it back as start_after), or
+    null when the range is exhausted.
+    """
+    def generate():
+        with get_db(table_name) as table:
+            yield '{"data":['
+            count, last, has_more = 0, None, False
+            for key, data in table.scan(**scan_kwargs):
+                item = decode(key, data)
+                if keep and not keep(item): continue
+                if count == page_size:
+                    has_more = True
+                    break
+                yield (',' if count else '') + json.dumps(item)
+                count, last = count + 1, key.decode('utf-8')
+            yield '],"next":' + json.dumps(last if has_more else None) + '}'
+
+    body = generate()
+    try:
+        first = next(body)  # connect before committing to a 200
+    except breaker.CircuitOpen:
+        raise
+    except Exception:
+        return jsonify({'data': [], 'next': None, 'error': 'Database unavailable'}), 500
+    return streamed(first, body, mimetype='application/json')
+
 @app.route('/api/students', methods=['GET'])
 def get_all_students():
-    conn, table = get_db(TABLE_STUDENTS)
-    if not table: return jsonify([]), 500
-    students = []
+    """
+    One page of students in matric order: {"data": [...], "next": cursor}.
+
+    Query params: limit (page size), start_after (the previous page's
+    "next"), prefix (matric prefix) and department. Only info: columns are
+    scanned and the JSON body is streamed as rows arrive.
+    """
+    try:
+        page_size = page_size_arg()
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    prefix = request.args.get('prefix', '').encode()
+    department = request.args.get('department', '').strip().lower()
+
+    row_start = after_cursor(prefix or None, request.args.get('start_after'))
+    row_stop = row_prefix_stop(prefix) if prefix else None
+    keep = (lambda s: s['department'].lower() == department) if department else None
+    # Unfiltered pages come back in one scanner batch; filtered ones may skip many rows.
+    batch_size = FILTERED_SCAN_BATCH if department else page_size + 1
+    return stream_page(TABLE_STUDENTS, page_size, student_summary, keep,
+                       row_start=row_start, row_stop=row_stop,
+                       columns=STUDENT_LIST_COLUMNS, batch_size=batch_size)
+
+@app.route('/api/export', methods=['GET'])
+def export_registry():
+    """
+    Streams every student's transcript as flat per-course rows (see
+    export.py). Query params: format (csv or ndjson), prefix (matric prefix)
+    and start_after (resume after this matric).
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.STREAMS:
+        return jsonify({'error': 'format must be csv or ndjson (parquet: python export.py)'}), 400
+    prefix = request.args.get('prefix', '').encode()
+    row_start = after_cursor(prefix or None, request.args.get('start_after'))
+    row_stop = row_prefix_stop(prefix) if prefix else None
+
+    def generate():
+        with get_db(TABLE_STUDENTS) as table:
+            yield from export.STREAMS[fmt](export.students(table, row_start, row_stop, EXPORT_SCAN_BATCH))
+
+    body = generate()
+    try:
+        first = next(body, '')  # connect before committing to a 200
+    except breaker.CircuitOpen:
+        raise
+    except Exception:
+        return jsonify({'error': 'Database unavailable'}), 500
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return streamed(first, body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=students.{fmt}'})
+
+@app.route('/api/search', methods=['GET'])
+def search_students():
+    """
+    Students whose name or matric number matches ?q= (exact, prefix or one
+    typo away), best first; ?limit= defaults to 20, at most 100.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
     try:
-        for key, data in table.scan(limit=100):
-            students.append({
-                'matricNumber': key.decode('utf-8'),
-                'name': data.get(b'info:name', b'').decode('utf-8'),
-                'department': data.get(b'info:dept', b'').decode('utf-8'),
-                'cgpa': data.get(b'info:cgpa', b'0.00').decode('utf-8')
-            })
-    finally:
-        if conn: conn.close()
-    return jsonify(students)
+        limit = min(max(int(request.args.get('limit', search.DEFAULT_LIMIT)), 1), search.MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    try:
+        SEARCH.ensure()
+    except breaker.CircuitOpen:
+        raise
+    except Exception:
+        return jsonify({'error': 'Database unavailable'}), 500
+    found = SEARCH.search(query, limit)
+    return jsonify({'query': query, 'data': found, 'count': len(found)})
+
+# --- INDEXED QUERIES (student_index) ---
+def index_page(bounds, page_size):
+    row_start, row_stop = bounds
+    return stream_page(TABLE_INDEX, page_size, indexes.decode_entry,
+                       row_start=after_cursor(row_start, request.args.get('start_after')),
+                       row_stop=row_stop, batch_size=page_size + 1)
+
+@app.route('/api/departments/<department>/students', methods=['GET'])
+def get_department_students(department):
+    """A department's students, best CGPA first; optional min_cgpa/max_cgpa, limit, start_after."""
+    try:
+        bounds = indexes.department_bounds(department, cgpa_arg('min_cgpa'), cgpa_arg('max_cgpa'))
+        return index_page(bounds, page_size_arg())
+    except ValueError:
+        return jsonify({'error': 'limit, min_cgpa and max_cgpa must be numbers'}), 400
+
+@app.route('/api/students/cgpa', methods=['GET'])
+def get_students_by_cgpa():
+    """Students with min_cgpa <= CGPA <= max_cgpa across the registry, best first."""
+    try:
+        bounds = indexes.registry_bounds(cgpa_arg('min_cgpa'), cgpa_arg('max_cgpa'))
+        return index_page(bounds, page_size_arg())
+    except ValueError:
+        return jsonify({'error': 'limit, min_cgpa and max_cgpa must be numbers'}), 400
+
+@app.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """Top-N students by CGPA (?limit=, default 50), optionally within ?department=."""
+    try:
+        page_size = page_size_arg(DEFAULT_LEADERBOARD_SIZE)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    department = request.args.get('department', '').strip()
+    bounds = indexes.department_bounds(department) if department else indexes.registry_bounds()
+    return index_page(bounds, page_size)
+
+@app.route('/api/index/rebuild', methods=['POST'])
+def rebuild_index():
+    with get_dbs(TABLE_STUDENTS, TABLE_INDEX) as (students, table):
+        report = indexes.rebuild(students, table, dry_run=request.args.get('dry_run') == 'true')
+    log_action("INDEX_REBUILD", f"Index reconciled: {report}")
+    return jsonify({'success': True, **report})
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Registry totals, average and highest CGPA, overall and per department."""
+    with get_db(TABLE_STATS) as table:
+        return jsonify(stats.read_stats(table))
+
+@app.route('/api/stats/rebuild', methods=['POST'])
+def rebuild_stats():
+    with get_dbs(TABLE_STUDENTS, TABLE_STATS) as (students, table):
+        count = stats.rebuild(students, table)
+    log_action("STATS_REBUILD", f"Recomputed statistics from {count} students")
+    return jsonify({'success': True, 'students': count})
 
 @app.route('/api/results/<matric>', methods=['GET'])
 def get_student(matric):
     if matric == 'SEED001': return jsonify({'matricNumber': 'SEED001', 'name': 'System Check', 'cgpa': '5.00'})
-    conn, table = get_db(TABLE_STUDENTS)
-    try:
-        row = table.row(matric.encode())
-        if not row: return jsonify({'error': 'Student not found'}), 404
-        academic_json = row.get(b'academic:history', b'[]').decode('utf-8')
-        return jsonify({
+    cached = TRANSCRIPTS.get(matric)
+    if cached is not None:
+        return transcript_response(*cached)
+
+    token = TRANSCRIPTS.begin()
+    with get_db(TABLE_STUDENTS) as table:
+        row = table.row(matric.encode(), include_timestamp=True)
+    if not row: return jsonify({'error': 'Student not found'}), 404
+    body, etag = render_transcript(matric, row, token)
+    return transcript_response(body, etag)
+
+def render_transcript(matric, row, token):
+    """JSON body and ETag for a row read with include_timestamp=True; cached under `token`."""
+    newest = max(timestamp for _, timestamp in row.values())
+    row = {column: value for column, (value, _) in row.items()}
+    metrics.PAYLOADS.observe(sum(len(v) for c, v in row.items() if c.startswith(b'academic:')
+                                and c != records.COL_SUMMARY), 'transcript')
+    with metrics.timed('decode_history'):
+        history = records.assemble_history(row)
+    with metrics.timed('serialize'):
+        body = app.json.response({
             'matricNumber': matric,
             'name': row.get(b'info:name', b'').decode('utf-8'),
             'department': row.get(b'info:dept', b'').decode('utf-8'),
             'cgpa': row.get(b'info:cgpa', b'0.00').decode('utf-8'),
-            'academicHistory': json.loads(academic_json)
-        })
-    finally:
-        if conn: conn.close()
+            'academicHistory': history
+        }).get_data()
+    etag = cache.make_etag(newest, body)
+    TRANSCRIPTS.put(matric, body, etag, token)
+    return body, etag
+
+def transcript_response(body, etag):
+    """200 with the body, or 304 when the client's If-None-Match already has this version."""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # always revalidate; 304s are cheap
+    response.make_conditional(request)
+    if response.status_code == 304:
+        TRANSCRIPTS.count_not_modified()
+    return response
+
+def project_student(matric, row, fields):
+    """The requested `fields` of a row read with their BATCH_FIELDS columns."""
+    entry = {'matricNumber': matric}
+    for field in fields:
+        if field == 'academicHistory':
+            entry[field] = records.assemble_history(row)
+        elif field == 'semesters':
+            entry[field] = int(row[records.COL_SEMESTERS]) if records.COL_SEMESTERS in row else None
+        else:
+            entry[field] = row.get(BATCH_FIELDS[field][0], b'').decode('utf-8') or None
+    return entry
+
+def compact_json(value):
+    return app.json.dumps(value, separators=(',', ':'))
+
+def batch_entries(table, matrics, fields):
+    """
+    One list of (JSON entry, found) per BATCH_ROWS_CHUNK matrics, in request
+    order, each from a single table.rows(). Full transcripts come from (and
+    fill) the transcript cache; a missing student gets a not-found entry.
+    """
+    for start in range(0, len(matrics), BATCH_ROWS_CHUNK):
+        chunk = matrics[start:start + BATCH_ROWS_CHUNK]
+        found = {}
+        if fields is None:
+            for matric in chunk:
+                cached = TRANSCRIPTS.get(matric)
+                if cached is not None:
+                    found[matric] = cached[0]
+            wanted = [matric.encode() for matric in chunk if matric not in found]
+            if wanted:
+                token = TRANSCRIPTS.begin()
+                for key, row in table.rows(wanted, include_timestamp=True):
+                    matric = key.decode('utf-8')
+                    found[matric] = render_transcript(matric, row, token)[0]
+            found = {matric: body.decode('utf-8').rstrip('\n') for matric, body in found.items()}
+        else:
+            # info:name too, so a student whose requested columns are all empty still comes back.
+            columns = list(dict.fromkeys([b'info:name'] + [c for field in fields for c in BATCH_FIELDS[field]]))
+            for key, row in table.rows([matric.encode() for matric in chunk], columns=columns):
+                matric = key.decode('utf-8')
+                found[matric] = compact_json(project_student(matric, row, fields))
+        yield [(found[matric], True) if matric in found else
+               (compact_json({'matricNumber': matric, 'error': 'Student not found'}), False)
+               for matric in chunk]
+
+@app.route('/api/results/batch', methods=['POST'])
+def get_students_batch():
+    """
+    Several students in one request: {"matrics": [...], "fields": [...]}.
+    Without fields each entry is the GET /api/results/<matric> body; with
+    them only those fields (name, department, cgpa, gpa, semesters,
+    academicHistory) are read. Streams {"data": [...], "found", "missing"}
+    in request order, with {matricNumber, error} for unknown students.
+    """
+    data = request.get_json(silent=True) or {}
+    matrics, fields = data.get('matrics'), data.get('fields')
+    if not isinstance(matrics, list) or not matrics or not all(isinstance(m, str) and m.strip() for m in matrics):
+        return jsonify({'error': 'matrics must be a non-empty list of matric numbers'}), 400
+    matrics = list(dict.fromkeys(m.strip() for m in matrics))
+    if len(matrics) > MAX_BATCH_MATRICS:
+        return jsonify({'error': f'at most {MAX_BATCH_MATRICS} matrics per request'}), 400
+    if fields is not None and (not isinstance(fields, list) or not fields or set(fields) - BATCH_FIELDS.keys()):
+        return jsonify({'error': f'fields must be a list drawn from {", ".join(BATCH_FIELDS)}'}), 400
+
+    def generate():
+        found = 0
+        with get_db(TABLE_STUDENTS) as table:
+            for i, chunk in enumerate(batch_entries(table, matrics, fields)):
+                found += sum(ok for _, ok in chunk)
+                yield ('{"data":[' if i == 0 else ',') + ','.join(entry for entry, _ in chunk)
+        yield f'],"found":{found},"missing":{len(matrics) - found}}}'
+
+    body = generate()
+    try:
+        first = next(body)  # connect and read the first chunk before committing to a 200
+    except breaker.CircuitOpen:
+        raise
+    except Exception:
+        return jsonify({'error': 'Database unavailable'}), 500
+    return streamed(first, body, mimetype='application/json')
 
 @app.route('/api/history/<matric>', methods=['GET'])
 def get_student_history(matric):
-    conn, table = get_db(TABLE_STUDENTS)
+    """The last versions of a student's results, read from the per-write summary cells."""
     try:
-        cells = table.cells(matric.encode(), b'academic:history', versions=5)
-        history_log = []
-        for value, timestamp in cells:
-            dt_object = datetime.datetime.fromtimestamp(timestamp / 1000)
-            date_str = dt_object.strftime('%Y-%m-%d %H:%M:%S')
-            data = json.loads(value.decode('utf-8'))
-            last_action = "Result Update"
-            if data:
-                last_sem = data[-1]
-                last_action = f"Uploaded {last_sem.get('level')} Lvl {last_sem.get('semester')} Sem"
-            history_log.append({'timestamp': date_str, 'action': last_action, 'total_semesters': len(data)})
-        return jsonify(history_log)
+        with get_db(TABLE_STUDENTS) as table:
+            return jsonify(versions.history(table, matric.encode()))
+    except breaker.CircuitOpen:
+        raise
     except Exception as e:
         return jsonify([])
-    finally:
-        if conn: conn.close()
+
+def version_arg(name, default=None):
+    value = request.args.get(name)
+    return default if value in (None, '') else int(value)
+
+@app.route('/api/history/<matric>/<int:version>', methods=['GET'])
+def get_student_version(matric, version):
+    """The full academic history as it stood after the write at `version`."""
+    with get_db(TABLE_STUDENTS) as table:
+        if version not in {e['version'] for e in versions.history(table, matric.encode())}:
+            return jsonify({'error': 'Version not found'}), 404
+        summary, history = versions.snapshot(table, matric.encode(), version)
+    return jsonify({'matricNumber': matric, **summary, 'academicHistory': history})
+
+@app.route('/api/history/<matric>/diff', methods=['GET'])
+def diff_student_versions(matric):
+    """?from=&to= versions (default: the latest write against the one before it)."""
+    with get_db(TABLE_STUDENTS) as table:
+        known = [e['version'] for e in versions.history(table, matric.encode())]
+        try:
+            new = version_arg('to', known[0] if known else None)
+            old = version_arg('from', known[1] if len(known) > 1 else None)
+        except ValueError:
+            return jsonify({'error': 'from and to must be version numbers'}), 400
+        if old is None or new is None:
+            return jsonify({'error': 'Need two versions to compare'}), 404
+        if old not in known or new not in known:
+            return jsonify({'error': 'Version not found'}), 404
+        result = versions.diff(table, matric.encode(), old, new)
+    return jsonify({'matricNumber': matric, **result})
 
 @app.route('/api/results', methods=['POST'])
 def save_result():
     data = request.json
     matric = data.get('matricNumber')
-    conn, table = get_db(TABLE_STUDENTS)
     try:
-        row = table.row(matric.encode())
-        existing_json = row.get(b'academic:history', b'[]').decode('utf-8')
-        history = json.loads(existing_json) if existing_json else []
-
         # 1. Calculate GPA & Inject Letter Grades into Courses
         raw_courses = data.get('courses', [])
-        semester_gpa, processed_courses = calculate_gpa_data(raw_courses)
+        with metrics.timed('grade'):
+            semester_gpa, processed_courses = calculate_gpa_data(raw_courses)
 
         new_sem = {
             'semester': data.get('semester', 'First'),
@@ -197,79 +629,196 @@ def save_result():
             'courses': processed_courses, # Now contains 'grade': 'A'
             'gpa': semester_gpa           # Explicitly save Semester GPA
         }
-        
-        # 2. Update History
-        history = [h for h in history if not (h['level'] == new_sem['level'] and h['semester'] == new_sem['semester'])]
-        history.append(new_sem)
-        
-        # 3. Calculate CGPA
-        new_cgpa = calculate_cumulative(history)
-
-        # 4. Save
-        table.put(matric.encode(), {
-            b'info:name': data.get('name', '').encode(),
-            b'info:dept': data.get('department', '').encode(),
-            b'info:gpa': semester_gpa.encode(), # Save current GPA
-            b'info:cgpa': new_cgpa.encode(),    # Save Cumulative
-            b'academic:history': json.dumps(history).encode()
-        })
-        
-        log_action("RESULT_UPLOAD", f"Updated result for {matric}")
+        # 2. Queue behind any upload in flight for this matric; one write covers the lot
+        upload = {'sem': new_sem, 'name': data.get('name', ''), 'department': data.get('department', '')}
+        new_cgpa = UPLOADS.submit(matric, upload)
+
+        log_action("RESULT_UPLOAD", f"Updated result for {matric}", matric)
         return jsonify({'success': True, 'gpa': semester_gpa, 'cgpa': new_cgpa})
+    except writes.WriteConflict as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 409
+    except breaker.CircuitOpen:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if conn: conn.close()
+
+def apply_uploads(matric, uploads):
+    """
+    Applies a matric's queued uploads, in order, with one read, recompute and
+    version-checked write; returns the CGPA each upload left behind.
+    """
+    key = matric.encode()
+    columns = list(dict.fromkeys([b'info'] + [
+        records.semester_column(u['sem']['level'], u['sem']['semester']) for u in uploads]))
+
+    with get_db(TABLE_STUDENTS) as table:
+        # 1. Read only the totals and the semesters being replaced
+        def read():
+            row = table.row(key, columns=columns)
+            if records.needs_full_row(row):
+                row = table.row(key)  # one-time conversion / semester count needs every cell
+            return row
+
+        # 2. Adjust CGPA by each semester's delta, on top of the uploads before it
+        def build(row):
+            current, cells, cgpas, drop_legacy = dict(row), {}, [], False
+            for upload in uploads:
+                with metrics.timed('grade'):
+                    changed, cgpa, legacy = records.upsert_semester(current, upload['sem'], GRADING)
+                changed.update({
+                    b'info:name': upload['name'].encode(),
+                    b'info:dept': upload['department'].encode(),
+                    b'info:gpa': upload['sem']['gpa'].encode(), # Save current GPA
+                    b'info:cgpa': cgpa.encode(),                # Save Cumulative
+                })
+                current.update(changed)
+                cells.update(changed)
+                cgpas.append(cgpa)
+                drop_legacy = drop_legacy or legacy
+            return records.summarise(cells, 'upload', uploads[-1]['sem']), (cgpas, drop_legacy)
+
+        # 3. Save, unless another process wrote the row since the read
+        row, (cgpas, drop_legacy) = WRITES.write(table, key, read, build)
+        if drop_legacy:
+            table.delete(key, columns=[records.LEGACY_HISTORY])
+
+    last = uploads[-1]
+    record_student_change(matric, records.student_state(row), {
+        'name': last['name'], 'department': last['department'], 'cgpa': cgpas[-1]
+    })
+    return cgpas
+
+@app.route('/api/results/bulk', methods=['POST'])
+def bulk_upload_results():
+    """
+    Streams a CSV (text/csv) or NDJSON (application/x-ndjson) upload of one
+    course result per record; ?format= overrides the content type and
+    ?batch_size= / ?chunk= tune the write batches. Courses are merged into
+    their semester by course code. Returns counts and per-line errors.
+    """
+    fmt = request.args.get('format') or ('csv' if 'csv' in (request.mimetype or '') else 'ndjson')
+    if fmt not in ingest.PARSERS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    try:
+        batch_size = max(int(request.args.get('batch_size', BULK_BATCH_SIZE)), 1)
+        chunk_records = max(int(request.args.get('chunk', BULK_CHUNK_RECORDS)), 1)
+    except ValueError:
+        return jsonify({'error': 'batch_size and chunk must be integers'}), 400
+
+    started = time.time()
+    result = ingest.ingest(request.stream, fmt, lambda: get_db(TABLE_STUDENTS), GRADING, record_student_changes,
+                           WRITES, chunk_records=chunk_records, batch_size=batch_size)
+    result['seconds'] = round(time.time() - started, 3)
+    log_action("BULK_UPLOAD", f"Ingested {result['records']} course results for {result['students']} "
+                              f"student updates ({result['errorCount']} rejected)")
+    return jsonify({'success': result['errorCount'] == 0, **result})
 
 @app.route('/api/results/<matric>', methods=['DELETE'])
 def delete_student(matric):
     if not matric or matric == 'undefined': return jsonify({'error': 'Invalid ID'}), 400
-    conn, table = get_db(TABLE_STUDENTS)
-    try:
+    with get_db(TABLE_STUDENTS) as table:
+        row = table.row(matric.encode(), columns=STUDENT_LIST_COLUMNS)
         table.delete(matric.encode())
-        log_action("DELETE_STUDENT", f"Deleted record: {matric}")
-        return jsonify({'success': True})
-    finally:
-        if conn: conn.close()
+    if row: record_student_change(matric, records.student_state(row), None)
+    log_action("DELETE_STUDENT", f"Deleted record: {matric}", matric)
+    return jsonify({'success': True})
 
 @app.route('/api/logs', methods=['GET'])
 def get_logs_route():
-    conn, table = get_db(TABLE_LOGS)
-    logs = []
+    """
+    Newest-first audit events as {data, next}, archived ones included.
+    Optional: from / to (epoch ms or ISO date), action (comma-separated),
+    matric, limit, start_after (the previous page's `next`),
+    archived=false (live table only) and flush=true (wait for queued events
+    to be written first; otherwise the page shows what is already stored).
+    """
     try:
-        for key, data in table.scan(limit=50, reverse=True):
-            logs.append({
-                'id': key.decode('utf-8'),
-                'action': data.get(b'details:action', b'').decode('utf-8'),
-                'details': data.get(b'details:info', b'').decode('utf-8'),
-                'timestamp': int(data.get(b'details:time', b'0').decode('utf-8'))
-            })
-    finally:
-        if conn: conn.close()
-    return jsonify(logs)
+        page_size = page_size_arg(DEFAULT_LOG_PAGE_SIZE)
+        from_ms, to_ms = time_arg('from'), time_arg('to')
+    except ValueError:
+        return jsonify({'error': 'limit must be a number and from/to epoch milliseconds or ISO dates'}), 400
+    actions = [a.strip() for a in request.args.get('action', '').split(',') if a.strip()]
+    start_after = request.args.get('start_after', '')
+    include_archive = request.args.get('archived', 'true').lower() not in ('false', '0', 'no')
+
+    if request.args.get('flush', '').lower() in ('true', '1', 'yes'):
+        AUDIT.flush(timeout=AUDIT.flush_interval)
+    logs, cursor = audit.query_logs(
+        lambda: get_db(TABLE_LOGS), page_size, from_ms=from_ms, to_ms=to_ms,
+        actions=actions, matric=request.args.get('matric') or None, after=start_after.encode() or None,
+        archive=LOG_ARCHIVE if include_archive else None,
+    )
+    return jsonify({'data': logs, 'next': cursor})
 
 @app.route('/api/logs', methods=['DELETE'])
 def clear_logs():
-    conn, table = get_db(TABLE_LOGS)
+    """
+    Starts archiving events older than ?before= (epoch ms or ISO date;
+    default: all of them) to segment files, deleting them from system_logs.
+    Answers 202 at once; GET /api/logs/archive reports progress. They stay
+    readable through GET /api/logs throughout.
+    """
     try:
-        admin_conn = happybase.Connection(HBASE_HOST, port=HBASE_PORT)
-        admin_conn.open()
-        admin_conn.disable_table(TABLE_LOGS)
-        admin_conn.delete_table(TABLE_LOGS)
-        admin_conn.create_table(TABLE_LOGS, {'details': dict()})
-        admin_conn.close()
-        return jsonify({'success': True})
-    finally:
-        if conn: conn.close()
-        
+        cutoff_ms = time_arg('before')
+    except ValueError:
+        return jsonify({'error': 'before must be epoch milliseconds or an ISO date'}), 400
+    if cutoff_ms is None:
+        cutoff_ms = int(time.time() * 1000) + 1
+    started, status = LOG_ARCHIVER.start(LOG_ARCHIVE.directory, cutoff_ms)
+    response = jsonify({'success': True, 'started': started, **status})
+    response.headers['Location'] = '/api/logs/archive'
+    return response, 202
+
+@app.route('/api/logs/archive', methods=['GET'])
+def archive_status():
+    """The last (or running) archive run, and what the archive holds."""
+    return jsonify({**LOG_ARCHIVER.status(), 'archive': LOG_ARCHIVE.stats()})
+
+@app.route('/api/logs/stats', methods=['GET'])
+def audit_stats():
+    return jsonify(AUDIT.stats())
+
+@app.route('/api/writes', methods=['GET'])
+def upload_write_stats():
+    return jsonify(write_stats())
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(TRANSCRIPTS.stats())
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    conn, table = get_db(TABLE_STUDENTS, retry=False) 
-    if conn:
-        conn.close()
-        return jsonify({'status': 'online'}), 200
-    return jsonify({'status': 'offline'}), 503
+    """Last background probe result; never touches HBase on the request thread."""
+    status = HEALTH.status()
+    return jsonify(status), 200 if status['status'] == 'online' else 503
+
+@app.route('/api/breaker', methods=['GET'])
+def breaker_stats():
+    return jsonify({**BREAKER.stats(), 'health': HEALTH.stats()})
+
+@app.errorhandler(breaker.CircuitOpen)
+def storage_unavailable(e):
+    response = jsonify({'error': 'Database unavailable', 'circuit': BREAKER.state})
+    response.headers['Retry-After'] = str(max(int(e.retry_after + 0.999), 1))
+    return response, 503
+
+@app.route('/api/pool', methods=['GET'])
+def pool_stats():
+    return jsonify(storage.stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    print("🚀 Flask Server is running on port 5000...")
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    if os.environ.get('UNISEMI_STORAGE') == 'memory':
+        print("🧪 Using in-memory storage (data is lost on exit)")
+    try:
+        ensure_schema()
+    except Exception as e:
+        print(f"⚠️ Schema bootstrap deferred until HBase is reachable: {e}")
+    HEALTH.status()  # first probe + start the background prober
+    print("🚀 Flask Server is running on port 5000 (development; use serve.py in production)...")
+    app.run(port=5000, debug=True, threaded=True)
\ No newline at end of file
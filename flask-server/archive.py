@@ -0,0 +1,364 @@
+"""
+Audit log retention: rows older than a cutoff move out of `system_logs` into
+compressed segment files on local disk, instead of the table being dropped.
+
+    python archive.py run [--days 30 | --before 2026-01-01] [--dir DIR]
+    python archive.py stats [--dir DIR]
+
+A run merges the bucket scans below the cutoff into one newest-first stream
+(the order /api/logs pages in) and writes it out as segments, one per UTC
+day of the events, rolling over every SEGMENT_ROWS rows:
+
+    logs-<YYYYMMDD>-<id8>.seg
+    MAGIC | zlib block | zlib block | ... | index JSON | index offset (8 bytes) | MAGIC
+
+A block is up to BLOCK_ROWS rows as JSON lines. The index is sparse: the
+first sort key, offset and length of each block, plus the segment's first
+and last sort keys. A segment is written to a temp file, fsynced and renamed
+into place; only then are its rows deleted from HBase, in table.batch()
+sends, with the keys read back from the segment. A `<segment>.pending`
+marker spans the rename and the deletes, so a run that died in between
+finishes the deletes before archiving anything else. DELETE /api/logs hands
+the run to an ArchiveRunner thread and answers 202 straight away.
+
+Reads map each segment with mmap and decompress only the blocks a page
+touches: the sparse index finds the first block at the cursor, and a
+segment is opened only once the merge reaches its newest row.
+audit.query_logs merges the archive with the live bucket scans; a row that
+is in both (archived but not yet deleted) is returned once.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from bisect import bisect_right
+from collections import deque
+
+import audit
+
+MAGIC = b'ULOGSEG1'
+TRAILER = struct.Struct('<Q')
+BLOCK_ROWS = 512
+SEGMENT_ROWS = 500000
+DELETE_BATCH_SIZE = 1000
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'log_archive')
+DAY_MS = 86400 * 1000
+
+
+# --- ROWS ---
+def encode_row(key, data):
+    matric = data.get(audit.COL_MATRIC, b'').decode('utf-8') or None
+    return json.dumps([key.decode('utf-8'), data.get(audit.COL_ACTION, b'').decode('utf-8'),
+                       data.get(audit.COL_INFO, b'').decode('utf-8'),
+                       int(data.get(audit.COL_TIME, b'0').decode('utf-8')), matric],
+                      ensure_ascii=False, separators=(',', ':'))
+
+def decode_row(line):
+    """(row key, cells) as the live table would return them."""
+    key, action, info, timestamp, matric = json.loads(line)
+    data = {audit.COL_ACTION: action.encode(), audit.COL_INFO: info.encode(),
+            audit.COL_TIME: str(timestamp).encode()}
+    if matric:
+        data[audit.COL_MATRIC] = matric.encode()
+    return key.encode(), data
+
+def event_day(sort_key):
+    """UTC day ('YYYYMMDD') of the event behind an unsalted sort key."""
+    timestamp = audit.MAX_TS - int(sort_key[:13])
+    return time.strftime('%Y%m%d', time.gmtime(timestamp / 1000))
+
+
+# --- SEGMENT FILES ---
+class SegmentWriter:
+    """Builds one segment in a temp file; close() renames it into place."""
+
+    def __init__(self, directory, day):
+        self.day = day
+        self.path = os.path.join(directory, f'logs-{day}-{uuid.uuid4().hex[:8]}.seg')
+        self.file = open(self.path + '.tmp', 'wb')
+        self.file.write(MAGIC)
+        self.blocks, self.lines = [], []
+        self.rows = 0
+        self.first = self.last = None
+
+    def add(self, sort_key, key, data):
+        if not self.lines:
+            self.blocks.append([sort_key.decode('utf-8'), None, None])
+        self.lines.append(encode_row(key, data))
+        self.first = self.first or sort_key
+        self.last = sort_key
+        self.rows += 1
+        if len(self.lines) >= BLOCK_ROWS:
+            self._write_block()
+
+    def _write_block(self):
+        body = zlib.compress('\n'.join(self.lines).encode('utf-8'))
+        self.blocks[-1][1:] = [self.file.tell(), len(body)]
+        self.file.write(body)
+        self.lines = []
+
+    def close(self):
+        if self.lines:
+            self._write_block()
+        offset = self.file.tell()
+        self.file.write(json.dumps({'rows': self.rows, 'first': self.first.decode('utf-8'),
+                                    'last': self.last.decode('utf-8'), 'blocks': self.blocks}).encode())
+        self.file.write(TRAILER.pack(offset) + MAGIC)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.path + '.tmp', self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.path + '.tmp')
+
+
+class Segment:
+    """A sealed segment, memory-mapped read-only."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end = len(self.map) - len(MAGIC)
+        if self.map[:len(MAGIC)] != MAGIC or self.map[end:] != MAGIC:
+            raise ValueError("not a log segment")
+        (offset,) = TRAILER.unpack_from(self.map, end - TRAILER.size)
+        index = json.loads(self.map[offset:end - TRAILER.size])
+        self.rows = index['rows']
+        self.first, self.last = index['first'].encode(), index['last'].encode()
+        self.blocks = [(first.encode(), start, length) for first, start, length in index['blocks']]
+        self.block_keys = [first for first, _, _ in self.blocks]
+        self.size = len(self.map)
+
+    def rows_from(self, start=None, stop=None):
+        """(sort key, row key, cells) for start <= sort key < stop, in sort key order."""
+        first_block = max(bisect_right(self.block_keys, start) - 1, 0) if start else 0
+        view = memoryview(self.map)
+        for block_key, offset, length in self.blocks[first_block:]:
+            if stop is not None and block_key >= stop:
+                return
+            for line in zlib.decompress(view[offset:offset + length]).split(b'\n'):
+                key, data = decode_row(line)
+                sort_key = audit.sort_key(key)
+                if start is not None and sort_key < start:
+                    continue
+                if stop is not None and sort_key >= stop:
+                    return
+                yield sort_key, key, data
+
+
+# --- READS ---
+class LogArchive:
+    """The segments in one directory; the listing is reloaded when the directory changes."""
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._segments = {}   # file name -> Segment
+        self._listed = None   # directory mtime at the last listing
+
+    def segments(self):
+        """Sealed segments, newest rows first."""
+        try:
+            changed = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            if changed != self._listed:
+                names = {name for name in os.listdir(self.directory) if name.endswith('.seg')}
+                for name in names - self._segments.keys():
+                    try:
+                        self._segments[name] = Segment(os.path.join(self.directory, name))
+                    except (OSError, ValueError) as e:
+                        print(f"⚠️ Skipping log segment {name}: {e}")
+                for name in self._segments.keys() - names:
+                    del self._segments[name]
+                self._listed = changed
+            return sorted(self._segments.values(), key=lambda s: s.first)
+
+    def scan(self, start=None, stop=None):
+        """
+        Archived (sort key, row key, cells) for start <= sort key < stop,
+        newest first. A segment joins the merge only when the merge reaches
+        its first row, so a page touches only the segments it spans.
+        """
+        waiting = deque(s for s in self.segments()
+                        if (stop is None or s.first < stop) and (start is None or s.last >= start))
+        heap, order = [], itertools.count()
+
+        def push(rows):
+            for sort_key, key, data in rows:
+                heapq.heappush(heap, (sort_key, next(order), key, data, rows))
+                return
+
+        while heap or waiting:
+            if waiting and (not heap or waiting[0].first <= heap[0][0]):
+                push(waiting.popleft().rows_from(start, stop))
+                continue
+            sort_key, _, key, data, rows = heapq.heappop(heap)
+            yield sort_key, key, data
+            push(rows)
+
+    def stats(self):
+        segments = self.segments()
+        return {
+            'segments': len(segments),
+            'rows': sum(s.rows for s in segments),
+            'bytes': sum(s.size for s in segments),
+        }
+
+
+# --- RETENTION ---
+def delete_segment_rows(table, path, batch_size=DELETE_BATCH_SIZE):
+    """Deletes a sealed segment's rows from the live table; returns how many."""
+    deleted = 0
+    with table.batch(batch_size=batch_size) as batch:
+        for _, key, _ in Segment(path).rows_from():
+            batch.delete(key)
+            deleted += 1
+    return deleted
+
+def finish_pending(table, directory, batch_size=DELETE_BATCH_SIZE):
+    """Completes deletes a previous run left behind and drops unsealed temp files."""
+    deleted = 0
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith('.seg.tmp'):
+            os.remove(path)
+        elif name.endswith('.seg.pending'):
+            segment = path[:-len('.pending')]
+            if os.path.exists(segment):
+                deleted += delete_segment_rows(table, segment, batch_size)
+            os.remove(path)
+    return deleted
+
+def archive_logs(table, directory, cutoff_ms, batch_size=DELETE_BATCH_SIZE):
+    """Moves every event older than cutoff_ms into segments; returns counts."""
+    os.makedirs(directory, exist_ok=True)
+    report = {'segments': 0, 'archived': 0, 'deleted': finish_pending(table, directory, batch_size)}
+
+    def bucket_rows(bucket):
+        row_start, row_stop = audit.bucket_bounds(bucket, to_ms=cutoff_ms - 1)
+        for key, data in table.scan(row_start=row_start, row_stop=row_stop, batch_size=batch_size):
+            yield audit.sort_key(key), key, data
+
+    def seal(writer):
+        marker = writer.path + '.pending'
+        open(marker, 'w').close()
+        writer.close()
+        report['segments'] += 1
+        report['archived'] += writer.rows
+        report['deleted'] += delete_segment_rows(table, writer.path, batch_size)
+        os.remove(marker)
+
+    writer = None
+    try:
+        merged = heapq.merge(*(bucket_rows(b) for b in range(audit.LOG_BUCKETS)), key=lambda row: row[0])
+        for sort_key, key, data in merged:
+            day = event_day(sort_key)
+            if writer is None or writer.day != day or writer.rows >= SEGMENT_ROWS:
+                if writer is not None:
+                    seal(writer)
+                writer = SegmentWriter(directory, day)
+            writer.add(sort_key, key, data)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None:
+        seal(writer)
+    return report
+
+
+class ArchiveRunner:
+    """
+    Runs archive_logs on a background thread, one run at a time, for
+    DELETE /api/logs; a request only starts it. A run cut short by a restart
+    leaves at most a .pending marker, which the next run finishes.
+    """
+
+    def __init__(self, open_table, flush=None):
+        self.open_table = open_table
+        self.flush = flush  # called first, so events still queued are archived too
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {'state': 'idle'}
+
+    def start(self, directory, cutoff_ms):
+        """Starts a run unless one is going; returns (started, status)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False, dict(self._status)
+            self._status = {'state': 'running', 'cutoff_ms': cutoff_ms, 'started_at': int(time.time() * 1000)}
+            self._thread = threading.Thread(target=self._run, args=(directory, cutoff_ms),
+                                            name='log-archiver', daemon=True)
+            self._thread.start()
+            return True, dict(self._status)
+
+    def _run(self, directory, cutoff_ms):
+        try:
+            if self.flush is not None:
+                self.flush()
+            with self.open_table() as table:
+                outcome = {'state': 'done', **archive_logs(table, directory, cutoff_ms)}
+        except Exception as e:
+            print(f"⚠️ Log archiving failed: {e}")
+            outcome = {'state': 'failed', 'error': str(e)}
+        with self._lock:
+            self._status.update(outcome, finished_at=int(time.time() * 1000))
+
+    def wait(self, timeout=None):
+        """True once no run is going (tests and shutdown)."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return thread is None or not thread.is_alive()
+
+    def status(self):
+        with self._lock:
+            return dict(self._status)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old audit events to local segment files.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help="archive events older than the cutoff and delete them from HBase")
+    cutoff = run.add_mutually_exclusive_group()
+    cutoff.add_argument('--days', type=float, default=30, help="keep this many days in HBase (default 30)")
+    cutoff.add_argument('--before', help="archive events before this ISO date or epoch ms instead")
+    run.add_argument('--batch-size', type=int, default=DELETE_BATCH_SIZE, help="rows per scanner batch and delete send")
+    show = sub.add_parser('stats', help="summarise the archive")
+    for command in (run, show):
+        command.add_argument('--dir', default=os.environ.get('UNISEMI_LOG_ARCHIVE_DIR', DEFAULT_DIR))
+    args = parser.parse_args(argv)
+
+    if args.command == 'stats':
+        print(f"✅ Log archive {args.dir}: {LogArchive(args.dir).stats()}")
+        return
+    if args.before:
+        import datetime
+        cutoff_ms = int(args.before) if args.before.isdigit() else \
+            int(datetime.datetime.fromisoformat(args.before).timestamp() * 1000)
+    else:
+        cutoff_ms = int(time.time() * 1000 - args.days * DAY_MS)
+
+    import app as server
+    server.AUDIT.flush(timeout=server.AUDIT.flush_interval)
+    started = time.time()
+    with server.get_db(server.TABLE_LOGS) as logs:
+        report = archive_logs(logs, args.dir, cutoff_ms, args.batch_size)
+    print(f"✅ Archived {report['archived']} events into {report['segments']} segments, "
+          f"deleted {report['deleted']} rows in {time.time() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
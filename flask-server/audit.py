@@ -0,0 +1,321 @@
+"""
+Audit log: row-key layout, time-range queries and the buffered writer.
+
+Row keys are salted so writes spread across regions instead of piling onto
+the tail one, and the timestamp is inverted so each bucket lists newest
+first with a forward scan:
+
+    <bucket:2 hex>|<9999999999999 - ms timestamp:13 digits>|<uuid8>
+
+A time-range query runs one bounded range scan per bucket, all on a single
+pooled connection, and merges them by the unsalted part of the key, which is
+also the page cursor.
+Events older than the retention cutoff are moved to local segment files by
+archive.py, and query_logs merges those in as one more sorted stream.
+Rows written before this layout (`<ms>_<uuid8>`) are rewritten by
+`python audit.py migrate`.
+
+Routes call `AuditLog.submit()`, which stamps the event and appends it to a
+bounded in-process queue; a background thread drains the queue into
+`system_logs` with `table.batch()` once `batch_size` events are waiting or
+the oldest one has waited `flush_interval` seconds. Request latency no longer
+includes the audit write.
+
+When the queue is full the `policy` decides: 'block' waits (up to
+`block_timeout` seconds, then drops) and 'drop' discards immediately. Either
+way dropped events are counted. `close()` (registered with atexit by app.py)
+writes out whatever is still queued.
+"""
+import heapq
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+from storage import row_prefix_stop
+
+POLICIES = ('block', 'drop')
+
+LOG_BUCKETS = 8
+MAX_TS = 10 ** 13 - 1  # 13-digit millisecond timestamps last until the year 2286
+SEP = b'|'
+COL_ACTION = b'details:action'
+COL_INFO = b'details:info'
+COL_TIME = b'details:time'
+COL_MATRIC = b'details:matric'
+
+
+# --- ROW KEYS ---
+def log_key(timestamp_ms, token):
+    """Salted row key; `token` is the event's 8 hex-digit id and picks the bucket."""
+    return b'%02x|%013d|%s' % (int(token, 16) % LOG_BUCKETS, MAX_TS - timestamp_ms, token.encode())
+
+def bucket_prefix(bucket):
+    return b'%02x|' % bucket
+
+def sort_key(row_key):
+    """The unsalted '<inverted ts>|<uuid8>' part: global newest-first order and the page cursor."""
+    return row_key[3:]
+
+def sort_bounds(from_ms=None, to_ms=None, after=None):
+    """(start, stop) over sort keys for from_ms <= time <= to_ms, strictly after cursor `after`; None is open."""
+    start = b'%013d' % (MAX_TS - to_ms) if to_ms is not None else None
+    if after:
+        start = max(start or b'', after + b'\x00')
+    stop = b'%013d' % (MAX_TS - from_ms + 1) if from_ms is not None and from_ms > 0 else None
+    return start, stop
+
+def bucket_bounds(bucket, from_ms=None, to_ms=None, after=None):
+    """(row_start, row_stop) in one bucket for from_ms <= time <= to_ms, strictly after cursor `after`."""
+    prefix = bucket_prefix(bucket)
+    start, stop = sort_bounds(from_ms, to_ms, after)
+    return prefix + (start or b''), prefix + stop if stop is not None else row_prefix_stop(prefix)
+
+def log_entry(action, details, matric=None, timestamp_ms=None):
+    """(row key, cells) for one audit event."""
+    timestamp = timestamp_ms if timestamp_ms is not None else int(time.time() * 1000)
+    cells = {COL_ACTION: action.encode(), COL_INFO: details.encode(), COL_TIME: str(timestamp).encode()}
+    if matric:
+        cells[COL_MATRIC] = matric.encode()
+    return log_key(timestamp, uuid.uuid4().hex[:8]), cells
+
+def decode_log(key, data):
+    return {
+        'id': key.decode('utf-8'),
+        'action': data.get(COL_ACTION, b'').decode('utf-8'),
+        'details': data.get(COL_INFO, b'').decode('utf-8'),
+        'matricNumber': data.get(COL_MATRIC, b'').decode('utf-8') or None,
+        'timestamp': int(data.get(COL_TIME, b'0').decode('utf-8')),
+    }
+
+
+# --- QUERIES ---
+def query_logs(open_table, limit, from_ms=None, to_ms=None, actions=None, matric=None,
+               after=None, batch_size=1000, archive=None):
+    """
+    One page of events, newest first, as (entries, next cursor). Each bucket
+    is range-scanned for at most limit+1 matches, one after the other on a
+    single checkout (a page costs one pool connection, not LOG_BUCKETS); the
+    global page is the first `limit` of their merge, so a query reads what
+    falls in [from_ms, to_ms] rather than the whole table. With an `archive`
+    (archive.LogArchive) its segments join the merge too.
+    """
+    actions = {a.encode() for a in actions} if actions else None
+    matric = matric.encode() if matric else None
+    want = limit + 1
+    filtered = actions is not None or matric is not None
+
+    def matches(data):
+        if actions is not None and data.get(COL_ACTION) not in actions: return False
+        return matric is None or data.get(COL_MATRIC) == matric
+
+    def scan_bucket(table, bucket):
+        row_start, row_stop = bucket_bounds(bucket, from_ms, to_ms, after)
+        found = []
+        rows = table.scan(row_start=row_start, row_stop=row_stop,
+                          limit=None if filtered else want,
+                          batch_size=batch_size if filtered else min(want, batch_size))
+        for key, data in rows:
+            if not matches(data): continue
+            found.append((sort_key(key), key, data))
+            if len(found) >= want:
+                break
+        return found
+
+    with open_table() as table:
+        streams = [scan_bucket(table, bucket) for bucket in range(LOG_BUCKETS)]
+    if archive is not None:
+        streams.append(row for row in archive.scan(*sort_bounds(from_ms, to_ms, after)) if matches(row[2]))
+    merged = []
+    for row in heapq.merge(*streams, key=lambda row: row[0]):
+        if merged and merged[-1][0] == row[0]:
+            continue  # archived, but its delete from the table hasn't landed yet
+        merged.append(row)
+        if len(merged) >= want:
+            break
+    page = merged[:limit]
+    cursor = page[-1][0].decode('utf-8') if len(merged) > limit else None
+    return [decode_log(key, data) for _, key, data in page], cursor
+
+
+class AuditLog:
+    """
+    `open_table` is a zero-argument callable returning a context manager that
+    yields the logs table (app.py passes `lambda: get_db(TABLE_LOGS)`), so
+    every flush checks a pooled connection out of whatever backend is current.
+    """
+
+    def __init__(self, open_table, max_queue=10000, batch_size=500, flush_interval=1.0,
+                 policy='block', block_timeout=5.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown audit queue policy {policy!r}")
+        if max_queue < 1 or batch_size < 1:
+            raise ValueError("max_queue and batch_size must be at least 1")
+        self._open_table = open_table
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._queue = deque()  # (enqueued_at, row key, cells)
+        self._cond = threading.Condition()
+        self._worker = None
+        self._closed = False
+        self._in_flight = 0
+        self._flush_target = 0  # queued count a flush() caller is waiting on
+
+        self._queued = 0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+
+    # --- PRODUCERS ---
+    def submit(self, action, details, matric=None):
+        """Queues one event; returns False if it was dropped."""
+        row_key, cells = log_entry(action, details, matric)
+        with self._cond:
+            if self._closed:
+                self._dropped += 1
+                return False
+            if len(self._queue) >= self.max_queue:
+                if self.policy == 'drop' or not self._cond.wait_for(
+                        lambda: len(self._queue) < self.max_queue or self._closed, self.block_timeout) \
+                        or self._closed:
+                    self._dropped += 1
+                    return False
+            self._queue.append((time.monotonic(), row_key, cells))
+            self._queued += 1
+            self._ensure_worker()
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                self._cond.notify_all()  # start the flush timer / flush a full batch
+        return True
+
+    def flush(self, timeout=None):
+        """Waits until every event queued before the call is written (or failed)."""
+        with self._cond:
+            target = self._queued
+            self._flush_target = max(self._flush_target, target)
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._done() >= target, timeout)
+
+    def close(self, timeout=10.0):
+        """Stops accepting events, writes out the queue and stops the worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    # --- WORKER ---
+    def _done(self):
+        """Queued events that have left the writer, successfully or not."""
+        return self._written + self._failed
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._worker.start()
+
+    def _next_batch(self):
+        """Blocks until a batch is due; returns [] once closed and drained."""
+        with self._cond:
+            while True:
+                if self._queue:
+                    due = self._queue[0][0] + self.flush_interval
+                    if len(self._queue) >= self.batch_size or self._closed or time.monotonic() >= due \
+                            or self._done() < self._flush_target:
+                        count = min(len(self._queue), self.batch_size)
+                        batch = [self._queue.popleft() for _ in range(count)]
+                        self._in_flight = count
+                        self._cond.notify_all()  # room for blocked producers
+                        return batch
+                    self._cond.wait(max(due - time.monotonic(), 0))
+                elif self._closed:
+                    return []
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            try:
+                with self._open_table() as table:
+                    with table.batch(batch_size=self.batch_size) as writer:
+                        for _, row_key, cells in batch:
+                            writer.put(row_key, cells)
+                ok = True
+            except Exception as e:
+                print(f"⚠️ Audit Log Error: {e}")
+                ok = False
+            with self._cond:
+                if ok:
+                    self._written += len(batch)
+                    self._batches += 1
+                else:
+                    self._failed += len(batch)
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'policy': self.policy,
+                'max_queue': self.max_queue,
+                'pending': len(self._queue) + self._in_flight,
+                'queued': self._queued,
+                'written': self._written,
+                'dropped': self._dropped,
+                'failed': self._failed,
+                'batches': self._batches,
+            }
+
+
+def make_audit_log(open_table):
+    """Builds the writer from UNISEMI_AUDIT_* environment settings."""
+    return AuditLog(
+        open_table,
+        max_queue=int(os.environ.get('UNISEMI_AUDIT_QUEUE_SIZE', 10000)),
+        batch_size=int(os.environ.get('UNISEMI_AUDIT_BATCH_SIZE', 500)),
+        flush_interval=float(os.environ.get('UNISEMI_AUDIT_FLUSH_INTERVAL', 1.0)),
+        policy=os.environ.get('UNISEMI_AUDIT_QUEUE_POLICY', 'block'),
+    )
+
+
+# --- MIGRATION ---
+def migrate(table, batch_size=1000, dry_run=False):
+    """Rewrites legacy '<ms>_<uuid8>' rows under salted keys."""
+    scanned = migrated = 0
+    with table.batch(batch_size=batch_size) as batch:
+        for key, data in table.scan(batch_size=batch_size):
+            scanned += 1
+            if key[2:3] == SEP:
+                continue
+            migrated += 1
+            if dry_run:
+                continue
+            timestamp, _, token = key.decode('utf-8').partition('_')
+            try:
+                new_key = log_key(int(data.get(COL_TIME, timestamp)), token[:8])
+            except ValueError:  # not a key this app wrote; salt it with a fresh id
+                new_key = log_key(int(data.get(COL_TIME, b'0')), uuid.uuid4().hex[:8])
+            batch.put(new_key, data)
+            batch.delete(key)
+    return {'scanned': scanned, 'migrated': migrated}
+
+
+if __name__ == '__main__':
+    # Usage: python audit.py migrate [--dry-run]
+    args = sys.argv[1:]
+    if not args or args[0] != 'migrate' or set(args[1:]) - {'--dry-run'}:
+        sys.exit("Usage: python audit.py migrate [--dry-run]")
+    import app as server
+    with server.get_db(server.TABLE_LOGS) as logs:
+        report = migrate(logs, dry_run='--dry-run' in args)
+    print(f"✅ Log key migration: {report}")
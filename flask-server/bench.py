@@ -0,0 +1,252 @@
+"""
+Endpoint benchmark suite.
+
+Seeds an in-memory registry (storage.MemoryStorage) and drives every /api/*
+route through the Flask test client, reporting throughput and p50/p99
+latency per route. No HBase or ZooKeeper needed, so runs are repeatable and
+can be profiled (e.g. `python -m cProfile -s cumtime bench.py ...`).
+
+    python bench.py --students 100000 --requests 2000
+    python bench.py --students 1000000 --semesters 2 --json baseline.json
+    python bench.py --routes "GET /api/students" "POST /api/results"
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+
+import app as server
+import archive
+import indexes
+import records
+import stats
+import versions
+from storage import MemoryStorage
+
+DEPARTMENTS = [
+    ('CSC', 'Computer Science'), ('MTH', 'Mathematics'), ('PHY', 'Physics'),
+    ('CHM', 'Chemistry'), ('ECO', 'Economics'), ('MEE', 'Mechanical Engineering'),
+    ('EEE', 'Electrical Engineering'), ('LAW', 'Law'), ('MED', 'Medicine'), ('ACC', 'Accounting'),
+]
+LEVELS = ['100', '200', '300', '400', '500']
+SEMESTERS = ['First', 'Second']
+
+
+# --- DATA GENERATION ---
+def make_matric(i):
+    code, _ = DEPARTMENTS[i % len(DEPARTMENTS)]
+    return f"{code}{2015 + i % 8}{i:07d}"
+
+def make_courses(rng, code, level, count):
+    return [{
+        'code': f"{code}{level[0]}{n:02d}",
+        'score': rng.randint(30, 95),
+        'unit': rng.choice([2, 3, 3, 4]),
+    } for n in range(1, count + 1)]
+
+def make_history(rng, code, semesters, courses):
+    history = []
+    for s in range(semesters):
+        level, semester = LEVELS[(s // 2) % len(LEVELS)], SEMESTERS[s % 2]
+        gpa, processed = server.calculate_gpa_data(make_courses(rng, code, level, courses))
+        history.append({'semester': semester, 'level': level, 'courses': processed, 'gpa': gpa})
+    return history
+
+def seed(students, semesters, courses, rng):
+    """Bulk-loads the registry straight into storage (bypassing the API)."""
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        with table.batch(batch_size=5000) as batch:
+            for i in range(students):
+                code, dept = DEPARTMENTS[i % len(DEPARTMENTS)]
+                history = make_history(rng, code, semesters, courses)
+                cells, cgpa = records.history_cells(history, server.GRADING)
+                cells.update({
+                    b'info:name': f"Student {i}".encode(),
+                    b'info:dept': dept.encode(),
+                    b'info:gpa': history[-1]['gpa'].encode() if history else b'0.00',
+                    b'info:cgpa': cgpa.encode(),
+                })
+                batch.put(make_matric(i).encode(), records.summarise(cells, 'upload', history[-1] if history else None))
+        with server.get_db(server.TABLE_STATS) as stats_table:
+            stats.rebuild(table, stats_table)
+        with server.get_db(server.TABLE_INDEX) as index_table:
+            indexes.rebuild(table, index_table)
+
+
+# --- SCENARIOS ---
+VERSIONED_STUDENTS = 50
+
+def add_versions(students, courses, rng):
+    """Uploads twice more to a few students so the version routes have history to walk; returns [(matric, version)]."""
+    written = []
+    for i in range(min(VERSIONED_STUDENTS, students)):
+        code, dept = DEPARTMENTS[i % len(DEPARTMENTS)]
+        for level in rng.sample(LEVELS, 2):
+            gpa, processed = server.calculate_gpa_data(make_courses(rng, code, level, courses))
+            semester = {'semester': rng.choice(SEMESTERS), 'level': level, 'courses': processed, 'gpa': gpa}
+            server.UPLOADS.submit(make_matric(i), {'sem': semester, 'name': f"Student {i}", 'department': dept})
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        for i in range(min(VERSIONED_STUDENTS, students)):
+            matric = make_matric(i)
+            written.extend((matric, e['version']) for e in versions.history(table, matric.encode()))
+    return written
+
+def build_scenarios(students, semesters, courses, rng):
+    """
+    Returns [(route name, callable(client) -> response[, expected statuses])];
+    each callable issues one request. Any other status >= 400 counts as an error.
+    """
+    doomed = iter(range(students - 1, -1, -1))  # DELETE consumes distinct students from the tail
+    versioned = add_versions(students, courses, rng)  # from the head, clear of DELETE
+
+    def any_matric():
+        return make_matric(rng.randrange(students))
+
+    def upload(client):
+        i = rng.randrange(students)
+        code, dept = DEPARTMENTS[i % len(DEPARTMENTS)]
+        level, semester = rng.choice(LEVELS), rng.choice(SEMESTERS)
+        return client.post('/api/results', json={
+            'matricNumber': make_matric(i), 'name': f"Student {i}", 'department': dept,
+            'level': level, 'semester': semester,
+            'courses': make_courses(rng, code, level, courses),
+        })
+
+    def bulk(client, records=200):
+        lines = []
+        for _ in range(records):
+            i = rng.randrange(students)
+            code, dept = DEPARTMENTS[i % len(DEPARTMENTS)]
+            lines.append(json.dumps({
+                'matricNumber': make_matric(i), 'department': dept, 'level': rng.choice(LEVELS),
+                'semester': rng.choice(SEMESTERS), 'courseCode': f"{code}{rng.randint(100, 599)}",
+                'score': rng.randint(30, 95), 'unit': rng.choice([2, 3, 4]),
+            }))
+        return client.post('/api/results/bulk', data='\n'.join(lines), content_type='application/x-ndjson')
+
+    return [
+        ('POST /api/login', lambda c: c.post('/api/login', json={'passcode': 'admin123'})),
+        ('GET /api/health', lambda c: c.get('/api/health')),
+        ('GET /api/pool', lambda c: c.get('/api/pool')),
+        ('GET /api/stats', lambda c: c.get('/api/stats')),
+        ('GET /api/students', lambda c: c.get('/api/students')),
+        ('GET /api/students?department', lambda c: c.get(
+            f'/api/students?department={rng.choice(DEPARTMENTS)[1]}')),
+        ('GET /api/leaderboard', lambda c: c.get('/api/leaderboard')),
+        ('GET /api/departments/<dept>/students', lambda c: c.get(
+            f'/api/departments/{rng.choice(DEPARTMENTS)[1]}/students?min_cgpa=3.5')),
+        ('GET /api/students/cgpa', lambda c: c.get('/api/students/cgpa?min_cgpa=2.0&max_cgpa=2.5')),
+        ('GET /api/results/<matric>', lambda c: c.get(f'/api/results/{any_matric()}')),
+        ('GET /api/results/<matric> (missing)', lambda c: c.get(f'/api/results/NOPE{rng.randrange(10 ** 6)}'), {404}),
+        ('GET /api/search', lambda c: c.get(f'/api/search?q=Student+{rng.randrange(students)}')),
+        ('GET /api/search (matric prefix)', lambda c: c.get(f'/api/search?q={any_matric()[:9]}')),
+        ('GET /api/export?prefix', lambda c: c.get(f'/api/export?format=ndjson&prefix={any_matric()[:7]}')),
+        ('GET /api/history/<matric>', lambda c: c.get(f'/api/history/{any_matric()}')),
+        ('GET /api/history/<matric>/<version>', lambda c: c.get('/api/history/%s/%d' % rng.choice(versioned))),
+        ('GET /api/history/<matric>/diff', lambda c: c.get(f'/api/history/{rng.choice(versioned)[0]}/diff')),
+        ('POST /api/results/batch (200)', lambda c: c.post(
+            '/api/results/batch', json={'matrics': [any_matric() for _ in range(200)]})),
+        ('POST /api/results', upload),
+        ('POST /api/results/bulk (200 rows)', bulk),
+        ('GET /api/logs', lambda c: c.get('/api/logs')),
+        ('GET /api/logs/stats', lambda c: c.get('/api/logs/stats')),
+        ('GET /api/logs/archive', lambda c: c.get('/api/logs/archive')),
+        ('GET /api/writes', lambda c: c.get('/api/writes')),
+        ('GET /api/cache', lambda c: c.get('/api/cache')),
+        ('GET /api/breaker', lambda c: c.get('/api/breaker')),
+        ('GET /api/metrics', lambda c: c.get('/api/metrics')),
+        ('DELETE /api/results/<matric>', lambda c: c.delete(f'/api/results/{make_matric(next(doomed))}')),
+        ('DELETE /api/logs', lambda c: c.delete('/api/logs')),
+    ]
+
+
+# --- MEASUREMENT ---
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values), math.ceil(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[k]
+
+def run_scenario(client, fn, requests, warmup, expected=()):
+    for _ in range(warmup):
+        fn(client).close()
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        response = fn(client)
+        response.get_data()  # drain streamed bodies inside the timed region
+        response.close()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if response.status_code >= 400 and response.status_code not in expected:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+def print_report(results):
+    print(f"\n{'ROUTE':<38}{'REQ':>8}{'ERR':>6}{'REQ/S':>11}{'P50 ms':>10}{'P99 ms':>10}")
+    print('-' * 83)
+    for name, r in results.items():
+        print(f"{name:<38}{r['requests']:>8}{r['errors']:>6}{r['throughput_rps']:>11}"
+              f"{r['p50_ms']:>10}{r['p99_ms']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every /api route against in-memory storage.")
+    parser.add_argument('--students', type=int, default=100000, help="registry size to seed (default 100000)")
+    parser.add_argument('--semesters', type=int, default=4, help="semesters of history per seeded student")
+    parser.add_argument('--courses', type=int, default=6, help="courses per semester")
+    parser.add_argument('--requests', type=int, default=1000, help="timed requests per route")
+    parser.add_argument('--warmup', type=int, default=50, help="untimed requests per route")
+    parser.add_argument('--routes', nargs='*', help="only run these routes (names as printed)")
+    parser.add_argument('--seed', type=int, default=42, help="RNG seed for repeatable runs")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    needed = args.requests + args.warmup
+    if args.students < needed:
+        sys.exit(f"❌ --students must be at least {needed} so DELETE has distinct rows to remove")
+
+    rng = random.Random(args.seed)
+    server.use_storage(MemoryStorage())
+    server.ensure_schema()
+    # DELETE /api/logs archives to disk; keep those segments out of the real archive.
+    archive_dir = tempfile.TemporaryDirectory(prefix='bench-log-archive-')
+    server.LOG_ARCHIVE = archive.LogArchive(archive_dir.name)
+
+    print(f"🌱 Seeding {args.students} students ({args.semesters} semesters x {args.courses} courses)...")
+    t0 = time.perf_counter()
+    seed(args.students, args.semesters, args.courses, rng)
+    seed_seconds = time.perf_counter() - t0
+    print(f"   done in {seed_seconds:.1f}s")
+
+    client = server.app.test_client()
+    results = {}
+    for name, fn, *expected in build_scenarios(args.students, args.semesters, args.courses, rng):
+        if args.routes and name not in args.routes:
+            continue
+        print(f"⏱️  {name}", flush=True)
+        results[name] = run_scenario(client, fn, args.requests, args.warmup, *expected)
+    server.LOG_ARCHIVER.wait()  # DELETE /api/logs only starts the run; let it finish before cleanup
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'seed_seconds': round(seed_seconds, 2), 'routes': results}, f, indent=2)
+        print(f"\n📝 Wrote {args.json}")
+
+
+if __name__ == '__main__':
+    main()
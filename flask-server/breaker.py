@@ -0,0 +1,227 @@
+"""
+Circuit breaker and cached health probing for the storage backend.
+
+    closed     calls go through; `failure_threshold` consecutive storage
+               failures open the circuit
+    open       calls fail fast with CircuitOpen (the app answers 503) until
+               `reset_timeout` seconds have passed
+    half-open  up to `half_open_max` trial calls go through; a success
+               closes the circuit, a failure opens it again
+
+Only transport-level errors count as failures (hbase_pool's
+BROKEN_CONNECTION_ERRORS); application errors raised inside a guarded block
+still prove the backend answered. A block abandoned by a BaseException
+(GeneratorExit from a closed streaming response, KeyboardInterrupt) records
+nothing and hands its half-open trial back.
+
+`HealthProber` pings the backend from a background thread every `interval`
+seconds and caches the result, so /api/health costs a dict copy instead of
+an RPC per browser tab. Probe results also feed the breaker, so a recovered
+HBase closes the circuit even when no traffic is arriving.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from hbase_pool import BROKEN_CONNECTION_ERRORS
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling storage while the circuit is open."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Storage unavailable; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, half_open_max=1,
+                 failure_errors=BROKEN_CONNECTION_ERRORS, history=50):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.failure_errors = failure_errors
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._period = 0  # bumped on every transition, so a late release can't free a newer trial
+        self._transitions = deque(maxlen=history)  # newest last
+
+        self._successes = 0
+        self._failures = 0
+        self._rejected = 0
+        self._opens = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    # --- GUARDING ---
+    def before_call(self):
+        """
+        Raises CircuitOpen unless a call may go through now. Returns a token
+        for release_trial() when the call is a half-open trial, else None.
+        """
+        with self._lock:
+            if self._state == OPEN:
+                waited = time.monotonic() - self._opened_at
+                if waited < self.reset_timeout:
+                    self._rejected += 1
+                    raise CircuitOpen(self.reset_timeout - waited)
+                self._transition(HALF_OPEN, "reset timeout elapsed")
+            if self._state == HALF_OPEN:
+                if self._trials >= self.half_open_max:
+                    self._rejected += 1
+                    raise CircuitOpen(self.reset_timeout)
+                self._trials += 1
+                return self._period
+        return None
+
+    def release_trial(self, token):
+        """Gives back a trial slot whose call ended without a verdict (e.g. an abandoned generator)."""
+        with self._lock:
+            if token is not None and token == self._period and self._trials > 0:
+                self._trials -= 1
+
+    def record_success(self, reason="call succeeded"):
+        with self._lock:
+            self._successes += 1
+            self._consecutive = 0
+            if self._state != CLOSED:
+                self._transition(CLOSED, reason)
+
+    def record_failure(self, error, reason="call failed"):
+        with self._lock:
+            self._failures += 1
+            self._consecutive += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._consecutive >= self.failure_threshold):
+                self._opens += 1
+                self._opened_at = time.monotonic()
+                self._transition(OPEN, f"{reason}: {error}")
+            elif self._state == OPEN:
+                self._opened_at = time.monotonic()  # still down; restart the wait
+
+    @contextmanager
+    def guard(self):
+        """Runs the block if the circuit allows it and records how storage behaved."""
+        trial = self.before_call()
+        try:
+            yield
+        except self.failure_errors as e:
+            self.record_failure(e)
+            raise
+        except Exception:
+            self.record_success()  # the backend answered; the error is the caller's
+            raise
+        except BaseException:
+            self.release_trial(trial)  # GeneratorExit, KeyboardInterrupt: storage gave no answer either way
+            raise
+        else:
+            self.record_success()
+
+    def _transition(self, state, reason):
+        if state == self._state:
+            return
+        self._transitions.append({'from': self._state, 'to': state, 'at': time.time(), 'reason': reason})
+        print(f"{'🔴' if state == OPEN else '🟡' if state == HALF_OPEN else '🟢'} Storage circuit {state}: {reason}")
+        self._state = state
+        self._trials = 0
+        self._period += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'successes': self._successes,
+                'failures': self._failures,
+                'rejected': self._rejected,
+                'opens': self._opens,
+                'transitions': list(self._transitions),
+            }
+
+
+class HealthProber:
+    """
+    `probe` is a zero-argument callable that raises if the backend is down
+    (app.py lists tables over a pooled connection).
+    """
+
+    def __init__(self, probe, breaker=None, interval=5.0):
+        self._probe = probe
+        self._breaker = breaker
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stop = threading.Event()
+        self._result = None
+        self._probes = 0
+        self._probe_failures = 0
+
+    def check(self):
+        """Probes once, caches and returns the result."""
+        started = time.perf_counter()
+        try:
+            self._probe()
+            error = None
+        except Exception as e:
+            error = e
+        result = {
+            'status': 'offline' if error else 'online',
+            'checkedAt': time.time(),
+            'latencyMs': round((time.perf_counter() - started) * 1000, 3),
+            'error': str(error) if error else None,
+        }
+        if self._breaker is not None:
+            if error is None:
+                self._breaker.record_success("health probe succeeded")
+            elif isinstance(error, self._breaker.failure_errors):
+                self._breaker.record_failure(error, "health probe failed")
+        with self._lock:
+            self._probes += 1
+            self._probe_failures += error is not None
+            self._result = result
+        return result
+
+    def status(self):
+        """The cached result; the first call probes synchronously and starts the prober thread."""
+        with self._lock:
+            result = self._result
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='health-prober', daemon=True)
+                self._worker.start()
+        if result is None:
+            result = self.check()
+        status = dict(result, ageMs=round((time.time() - result['checkedAt']) * 1000, 1))
+        if self._breaker is not None:
+            status['circuit'] = self._breaker.state
+        return status
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def close(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {'interval': self.interval, 'probes': self._probes, 'failures': self._probe_failures}
+
+
+def make_breaker():
+    """Builds the breaker from UNISEMI_BREAKER_FAILURES / UNISEMI_BREAKER_RESET."""
+    return CircuitBreaker(
+        failure_threshold=int(os.environ.get('UNISEMI_BREAKER_FAILURES', 5)),
+        reset_timeout=float(os.environ.get('UNISEMI_BREAKER_RESET', 10.0)),
+    )
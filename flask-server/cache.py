@@ -0,0 +1,125 @@
+"""
+In-process cache of rendered transcript responses.
+
+`GET /api/results/<matric>` bodies are cached by matric in an LRU bounded
+by total bytes, and each entry expires after `ttl` seconds. Every entry
+carries a strong ETag built from the newest cell timestamp in the student's
+row, so a conditional GET whose If-None-Match matches a cached entry gets a
+304 without touching HBase.
+
+Writes in this process (save_result, delete_student, bulk ingestion)
+invalidate their matric. Writers in other processes are only picked up once
+the TTL runs out. A read that races a write cannot re-cache the old body:
+`put` is ignored if any invalidation happened since the read's `begin()`.
+"""
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Rough per-entry bookkeeping cost (dict slots, tuple, key) on top of the body.
+ENTRY_OVERHEAD = 200
+
+
+def make_etag(timestamp_ms, body):
+    """Strong validator (unquoted): the row's newest cell timestamp plus a CRC of the body."""
+    return '%x-%08x' % (timestamp_ms, zlib.crc32(body))
+
+
+class TranscriptCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=60.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (body, etag, expires_at, size); oldest first
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._generation = 0  # bumped by every invalidation
+
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._rejected = 0
+
+    # --- READS ---
+    def get(self, key):
+        """(body, etag) for a fresh entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry[2] <= time.monotonic():
+                self._drop(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0], entry[1]
+
+    def count_not_modified(self):
+        with self._lock:
+            self._not_modified += 1
+
+    # --- WRITES ---
+    def begin(self):
+        """Token to pass to `put` after reading from storage."""
+        with self._lock:
+            return self._generation
+
+    def put(self, key, body, etag, token):
+        with self._lock:
+            if token != self._generation:
+                self._rejected += 1  # an invalidation raced this read; don't cache what it saw
+                return
+            size = len(body) + len(key) + ENTRY_OVERHEAD
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (body, etag, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if key in self._entries:
+                    self._drop(key)
+                    self._invalidations += 1
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key)[3]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'not_modified': self._not_modified,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+                'rejected': self._rejected,
+            }
+
+
+def make_transcript_cache():
+    """Builds the cache from UNISEMI_CACHE_BYTES / UNISEMI_CACHE_TTL (0 bytes disables it)."""
+    return TranscriptCache(
+        max_bytes=int(os.environ.get('UNISEMI_CACHE_BYTES', 64 * 1024 * 1024)),
+        ttl=float(os.environ.get('UNISEMI_CACHE_TTL', 60.0)),
+    )
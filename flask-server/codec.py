@@ -0,0 +1,202 @@
+"""
+Compact binary encoding for semester cells.
+
+A semester cell used to be JSON, which repeats every key (`score`, `unit`,
+`grade`, ...) for every course and is kept in up to 5 versions per row. The
+binary form stores the semester column-wise:
+
+    0xB5 <version> <flags> <body>     flags: 1 = body is zlib-compressed, 2 = no 'courses' key
+
+    body    = <courses:u16> <schema len:u16> <schema> <payload len:u32>* <payload>*
+    schema  = <field columns:u8> (<type:u8> <key len:u8> <key>)*
+
+The first columns hold the semester's own fields (level, semester, gpa, ...)
+as a single row, and the rest hold the courses, one value per course.
+Column types keep JSON values exact: small non-negative ints as one byte
+each, other ints as int32/int64, floats as float64, strings joined with
+NUL, and strings that repeat (grade letters) interned as a table of
+distinct values plus one index byte per row. Anything else (bool, None,
+nested values, mixed types) falls back to a JSON list for that column. In
+the 'binary-zlib' format, bodies of COMPRESS_MIN bytes or more are also
+compressed when that makes them smaller.
+
+JSON cells start with '{' or '[', never with the marker, so `decode()`
+reads both; semesters that don't fit the layout (courses that aren't dicts
+sharing the same keys) are simply written as JSON. Decoding is one
+struct.unpack for the lengths plus a bytes.split / struct.unpack per column.
+The course count in the body header is what sizes the courses list, so
+courses with no keys at all still round-trip. The schema repeats across
+cells, so its parse and the closures building the row dicts are cached by
+the schema bytes.
+
+    UNISEMI_HISTORY_FORMAT=binary (default) | binary-zlib | json
+"""
+import json
+import os
+import struct
+import zlib
+
+MARKER = 0xB5
+VERSION = 1
+FLAG_ZLIB = 1
+FLAG_NO_COURSES = 2
+COMPRESS_MIN = 512
+FORMATS = ('binary', 'binary-zlib', 'json')
+MAX_CACHED_SCHEMAS = 1024
+
+# Column types
+T_STR, T_U8, T_I32, T_I64, T_F64, T_JSON, T_STR_INTERNED = range(7)
+
+_HEAD = struct.Struct('<HH')
+_schemas = {}  # schema bytes -> (field count, types, lengths struct, fields builder, courses builder)
+
+
+def is_binary(raw):
+    return bool(raw) and raw[0] == MARKER
+
+def default_format():
+    fmt = os.environ.get('UNISEMI_HISTORY_FORMAT', 'binary')
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown history format {fmt!r} (choose from {', '.join(FORMATS)})")
+    return fmt
+
+
+# --- ENCODING ---
+def _column(values):
+    """(type, payload) for one column of JSON values."""
+    kinds = {type(v) for v in values}
+    if kinds == {str}:
+        encoded = [v.encode('utf-8') for v in values]
+        if not any(b'\x00' in v for v in encoded):
+            distinct = list(dict.fromkeys(encoded))
+            if len(distinct) <= 255 and len(distinct) * 2 <= len(values):
+                index = {v: i for i, v in enumerate(distinct)}
+                return T_STR_INTERNED, (bytes([len(distinct)]) + b'\x00'.join(distinct)
+                                        + bytes(index[v] for v in encoded))
+            return T_STR, b'\x00'.join(encoded)
+    elif kinds == {int}:
+        low, high = min(values), max(values)
+        if 0 <= low and high <= 255:
+            return T_U8, bytes(values)
+        if -2 ** 31 <= low and high < 2 ** 31:
+            return T_I32, struct.pack(f'<{len(values)}i', *values)
+        if -2 ** 63 <= low and high < 2 ** 63:
+            return T_I64, struct.pack(f'<{len(values)}q', *values)
+    elif kinds == {float}:
+        return T_F64, struct.pack(f'<{len(values)}d', *values)
+    return T_JSON, json.dumps(values, separators=(',', ':')).encode()
+
+def _short_keys(keys):
+    return len(keys) <= 255 and all(isinstance(k, str) and len(k.encode('utf-8')) <= 255 for k in keys)
+
+def _fits(sem):
+    """True if `sem` round-trips through the column layout."""
+    if not isinstance(sem, dict) or not _short_keys(sem):
+        return False
+    courses = sem.get('courses', [])
+    if not isinstance(courses, list) or len(courses) > 65535 or not all(isinstance(c, dict) for c in courses):
+        return False
+    return not courses or (_short_keys(courses[0]) and all(c.keys() == courses[0].keys() for c in courses))
+
+def encode(sem, fmt=None):
+    """Cell bytes for one semester dict in `fmt` (default: UNISEMI_HISTORY_FORMAT)."""
+    fmt = fmt or default_format()
+    if fmt == 'json' or not _fits(sem):
+        return json.dumps(sem).encode()
+    fields = {k: v for k, v in sem.items() if k != 'courses'}
+    courses = sem.get('courses', [])
+    flags = 0 if 'courses' in sem else FLAG_NO_COURSES
+    schema, payloads = [bytes([len(fields)])], []
+    try:
+        for rows, keys in (([fields], list(fields)), (courses, list(courses[0]) if courses else [])):
+            for key in keys:
+                name = key.encode('utf-8')
+                kind, payload = _column([row[key] for row in rows])
+                schema += [bytes([kind, len(name)]), name]
+                payloads.append(payload)
+    except UnicodeEncodeError:  # lone surrogates: only JSON's escaping can carry them
+        return json.dumps(sem).encode()
+    schema = b''.join(schema)
+    body = b''.join([_HEAD.pack(len(courses), len(schema)), schema,
+                     struct.pack(f'<{len(payloads)}I', *map(len, payloads))] + payloads)
+    if fmt == 'binary-zlib' and len(body) >= COMPRESS_MIN:
+        packed = zlib.compress(body, 6)
+        if len(packed) < len(body):
+            body, flags = packed, flags | FLAG_ZLIB
+    return bytes([MARKER, VERSION, flags]) + body
+
+
+# --- DECODING ---
+def _values(kind, payload, rows):
+    if kind == T_STR:
+        return payload.decode('utf-8').split('\x00') if rows else []
+    if kind == T_U8:
+        return list(payload)
+    if kind == T_STR_INTERNED:
+        table_end = len(payload) - rows
+        distinct = payload[1:table_end].decode('utf-8').split('\x00')
+        return [distinct[i] for i in payload[table_end:]]
+    if kind == T_I32:
+        return list(struct.unpack(f'<{rows}i', payload))
+    if kind == T_I64:
+        return list(struct.unpack(f'<{rows}q', payload))
+    if kind == T_F64:
+        return list(struct.unpack(f'<{rows}d', payload))
+    if kind == T_JSON:
+        return json.loads(payload)
+    raise ValueError(f"Unknown column type {kind}")
+
+def _fields_builder(keys):
+    """Function turning single-row column lists into the semester's own fields."""
+    def build(*columns):
+        return {key: column[0] for key, column in zip(keys, columns)}
+    return build
+
+def _courses_builder(keys):
+    """Function turning course column lists into `rows` course dicts."""
+    def build(rows, *columns):
+        # Filled a column at a time; the count, not the columns, sizes the list,
+        # so courses without keys ([{}, {}]) come back too.
+        courses = [{} for _ in range(rows)]
+        for key, column in zip(keys, columns):
+            for course, value in zip(courses, column):
+                course[key] = value
+        return courses
+    return build
+
+def _schema(blob):
+    cached = _schemas.get(blob)
+    if cached is None:
+        field_count, keys, kinds, offset = blob[0], [], [], 1
+        while offset < len(blob):
+            kind, size = blob[offset], blob[offset + 1]
+            keys.append(blob[offset + 2:offset + 2 + size].decode('utf-8'))
+            kinds.append(kind)
+            offset += 2 + size
+        cached = (field_count, kinds, struct.Struct(f'<{len(kinds)}I'),
+                  _fields_builder(keys[:field_count]), _courses_builder(keys[field_count:]))
+        if len(_schemas) < MAX_CACHED_SCHEMAS:
+            _schemas[blob] = cached
+    return cached
+
+def decode(raw):
+    """Semester dict from a binary or JSON cell."""
+    if not is_binary(raw):
+        return json.loads(raw.decode('utf-8'))
+    version, flags = raw[1], raw[2]
+    if version != VERSION:
+        raise ValueError(f"Unsupported semester encoding version {version}")
+    body = zlib.decompress(raw[3:]) if flags & FLAG_ZLIB else raw[3:]
+    rows, schema_size = _HEAD.unpack_from(body)
+    offset = _HEAD.size + schema_size
+    field_count, kinds, lengths, build_fields, build_courses = _schema(body[_HEAD.size:offset])
+    sizes = lengths.unpack_from(body, offset)
+    offset += lengths.size
+    columns = []
+    for i, (kind, size) in enumerate(zip(kinds, sizes)):
+        columns.append(_values(kind, body[offset:offset + size], 1 if i < field_count else rows))
+        offset += size
+    sem = build_fields(*columns[:field_count])
+    if not flags & FLAG_NO_COURSES:
+        sem['courses'] = build_courses(rows, *columns[field_count:])
+    return sem
@@ -0,0 +1,80 @@
+"""
+Shared pytest setup: every test runs against storage.MemoryStorage, so no
+HBase is needed. Run from flask-server/ with `python -m pytest -q`.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+os.environ.setdefault('UNISEMI_STORAGE', 'memory')
+
+import pytest
+
+import archive
+import cache
+import search
+from storage import MemoryStorage
+
+# test_dp.py is the manual connection check against a live HBase (python test_dp.py).
+collect_ignore = ['test_dp.py']
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """app.py on a fresh in-memory registry, with its caches and log archive reset."""
+    import app as server
+    server.use_storage(MemoryStorage())
+    server.ensure_schema()
+    monkeypatch.setattr(server, 'TRANSCRIPTS', cache.make_transcript_cache())
+    monkeypatch.setattr(server, 'SEARCH', search.SearchIndex(lambda: server.get_db(server.TABLE_STUDENTS)))
+    monkeypatch.setattr(server, 'LOG_ARCHIVE', archive.LogArchive(str(tmp_path / 'log_archive')))
+    yield server
+    server.LOG_ARCHIVER.wait(5)
+    server.AUDIT.flush(timeout=5)
+
+
+class NestingStorage(MemoryStorage):
+    """MemoryStorage that records the most connections one thread held at once."""
+
+    def __init__(self):
+        super().__init__()
+        self._held = threading.local()
+        self.deepest = 0
+
+    @contextmanager
+    def connection(self):
+        depth = getattr(self._held, 'depth', 0) + 1
+        self._held.depth, self.deepest = depth, max(self.deepest, depth)
+        try:
+            with super().connection() as connection:
+                yield connection
+        finally:
+            self._held.depth = depth - 1
+
+
+@pytest.fixture
+def nesting(server):
+    """Swaps in a NestingStorage: with a bounded pool, a request holding 2+ connections can starve."""
+    storage = NestingStorage()
+    server.use_storage(storage)
+    server.ensure_schema()
+    return storage
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.fixture
+def upload(client):
+    """POSTs one semester (courses as (code, score, unit)) and returns the JSON reply."""
+    def post(matric, name='Student', department='Computer Science', level='100', semester='First',
+             courses=(('CSC101', 75, 3),)):
+        response = client.post('/api/results', json={
+            'matricNumber': matric, 'name': name, 'department': department, 'level': level,
+            'semester': semester, 'courses': [{'code': c, 'score': s, 'unit': u} for c, s, u in courses],
+        })
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()
+    return post
@@ -0,0 +1,306 @@
+"""
+Full-registry export: one flat row per course taken.
+
+    python export.py dump/ [--format csv|ndjson|parquet] [--prefix CSC]
+                           [--split-at CSC,EEE,MTH] [--processes 4] [--resume]
+
+Rows have the columns in FIELDS; a student with no results yet gets one row
+with the course columns empty. The CLI writes a directory of part files,
+`part-<range>-<seq>.<ext>`. `--split-at` cuts the key space (or the
+`--prefix` range) at the given matric prefixes, and each range is scanned
+by its own process.
+
+Every stage is a generator (scan -> flatten -> part writer), so memory stays
+at one scanner batch plus one Parquet row group, however big the table is.
+Parts roll over at student boundaries every `--part-rows` rows. Once a part
+is closed, `checkpoint-<range>.json` records the last row key in it, so
+`--resume` deletes any half-written part and carries on after that key.
+
+    GET /api/export?format=csv|ndjson[&prefix=][&start_after=]
+
+streams the same rows over HTTP; start_after resumes after a matric.
+Parquet needs pyarrow and is CLI-only, since a Parquet footer can't be
+streamed.
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import time
+
+import records
+from storage import row_prefix_stop
+
+TABLE_STUDENTS = 'students'
+FIELDS = ('matricNumber', 'name', 'department', 'cgpa', 'level', 'semester', 'gpa',
+          'courseCode', 'score', 'unit', 'grade')
+FORMATS = ('csv', 'ndjson', 'parquet')
+SCAN_COLUMNS = [b'info', b'academic']
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_PART_ROWS = 250000
+PARQUET_ROW_GROUP = 50000
+
+
+# --- PIPELINE ---
+def scan(table, row_start=None, row_stop=None, batch_size=DEFAULT_BATCH_SIZE):
+    return table.scan(row_start=row_start, row_stop=row_stop, columns=SCAN_COLUMNS, batch_size=batch_size)
+
+def flatten(key, row):
+    """One tuple (in FIELDS order) per course on the student's transcript."""
+    student = (key.decode('utf-8'), row.get(b'info:name', b'').decode('utf-8'),
+               row.get(b'info:dept', b'').decode('utf-8'), row.get(b'info:cgpa', b'0.00').decode('utf-8'))
+    rows = []
+    for sem in records.assemble_history(row):
+        semester = student + (sem.get('level'), sem.get('semester'), sem.get('gpa'))
+        for course in sem.get('courses', []):
+            rows.append(semester + (course.get('courseCode') or course.get('code'),
+                                    course.get('score'), course.get('unit'), course.get('grade')))
+    return rows or [student + (None,) * 7]
+
+def students(table, row_start=None, row_stop=None, batch_size=DEFAULT_BATCH_SIZE):
+    """(row key, [flat rows]) per student in key order."""
+    for key, row in scan(table, row_start, row_stop, batch_size):
+        yield key, flatten(key, row)
+
+
+# --- WRITERS ---
+class CsvPart:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(FIELDS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class NdjsonPart:
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        self.file.write(''.join(json.dumps(dict(zip(FIELDS, row))) + '\n' for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+def _number(kind):
+    def cast(value):
+        try:
+            return kind(value)
+        except (TypeError, ValueError):
+            return None
+    return cast
+
+def _text(value):
+    return None if value is None else str(value)
+
+class ParquetPart:
+    """Buffers up to PARQUET_ROW_GROUP rows per column, then writes them as one row group."""
+
+    NUMERIC = {'cgpa': float, 'gpa': float, 'score': float, 'unit': int}
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        self.pa = pa
+        types = {float: pa.float64(), int: pa.int64()}
+        self.schema = pa.schema([(name, types.get(self.NUMERIC.get(name), pa.string())) for name in FIELDS])
+        self.casts = [_number(self.NUMERIC[name]) if name in self.NUMERIC else _text for name in FIELDS]
+        self.writer = pq.ParquetWriter(path, self.schema, compression='snappy')
+        self.columns = [[] for _ in FIELDS]
+
+    def write(self, rows):
+        for column, cast, values in zip(self.columns, self.casts, zip(*rows)):
+            column.extend(map(cast, values))
+        if len(self.columns[0]) >= PARQUET_ROW_GROUP:
+            self.flush()
+
+    def flush(self):
+        if self.columns[0]:
+            self.writer.write_table(self.pa.Table.from_arrays(
+                [self.pa.array(values, type=field.type) for values, field in zip(self.columns, self.schema)],
+                schema=self.schema))
+            self.columns = [[] for _ in FIELDS]
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+WRITERS = {'csv': CsvPart, 'ndjson': NdjsonPart, 'parquet': ParquetPart}
+
+
+# --- HTTP STREAMING ---
+def stream_csv(student_rows):
+    """CSV text chunks (header first), one per student."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for _, rows in student_rows:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_ndjson(student_rows):
+    for _, rows in student_rows:
+        yield ''.join(json.dumps(dict(zip(FIELDS, row))) + '\n' for row in rows)
+
+STREAMS = {'csv': stream_csv, 'ndjson': stream_ndjson}
+
+
+# --- RANGES & CHECKPOINTS ---
+def key_ranges(prefix=None, split_at=()):
+    """[(row_start, row_stop)] covering `prefix` (or the whole table), cut at each `split_at` key."""
+    start = prefix.encode() if prefix else None
+    stop = row_prefix_stop(start) if prefix else None
+    cuts = sorted({s.encode() for s in split_at
+                   if (start is None or s.encode() > start) and (stop is None or s.encode() < stop)})
+    edges = [start] + cuts + [stop]
+    return list(zip(edges, edges[1:]))
+
+def _key_text(key):
+    return key.decode('utf-8') if key is not None else None
+
+def checkpoint_path(directory, index):
+    return os.path.join(directory, f'checkpoint-{index:02d}.json')
+
+def part_path(directory, index, seq, fmt):
+    return os.path.join(directory, f'part-{index:02d}-{seq:05d}.{fmt}')
+
+def load_checkpoint(directory, index, key_range, fmt):
+    path = checkpoint_path(directory, index)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        state = json.load(f)
+    if state['range'] != [_key_text(k) for k in key_range] or state['format'] != fmt:
+        raise RuntimeError(f"{path} was written for another range or format; export to a new directory")
+    return state
+
+def save_checkpoint(directory, index, state):
+    """Written to a temp file and renamed, so a crash never leaves a torn checkpoint."""
+    path = checkpoint_path(directory, index)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+# --- EXPORT ---
+def export_range(open_table, directory, index, key_range, fmt, batch_size=DEFAULT_BATCH_SIZE,
+                 part_rows=DEFAULT_PART_ROWS, resume=False):
+    """
+    Exports one key range into numbered part files, checkpointing after each
+    part. `open_table` is a context manager factory for the students table.
+    Returns the range's checkpoint state.
+    """
+    state = load_checkpoint(directory, index, key_range, fmt)
+    if state and not resume:
+        raise RuntimeError(f"{directory} already holds an export; pass --resume or use a new directory")
+    if state is None:
+        state = {'range': [_key_text(k) for k in key_range], 'format': fmt,
+                 'last_key': None, 'parts': 0, 'students': 0, 'rows': 0, 'done': False}
+    if state['done']:
+        return state
+    # Anything past the checkpoint is a part that was being written when we stopped.
+    seq = state['parts']
+    while os.path.exists(part_path(directory, index, seq, fmt)):
+        os.remove(part_path(directory, index, seq, fmt))
+        seq += 1
+
+    row_start, row_stop = key_range
+    if state['last_key'] is not None:
+        row_start = state['last_key'].encode() + b'\x00'
+    part, part_students, part_count, last_key = None, 0, 0, None
+
+    def close_part():
+        part.close()
+        state['parts'] += 1
+        state['students'] += part_students
+        state['rows'] += part_count
+        state['last_key'] = _key_text(last_key)
+        save_checkpoint(directory, index, state)
+
+    with open_table() as table:
+        for key, rows in students(table, row_start, row_stop, batch_size):
+            if part is None:
+                part = WRITERS[fmt](part_path(directory, index, state['parts'], fmt))
+                part_students = part_count = 0
+            part.write(rows)
+            part_students, part_count, last_key = part_students + 1, part_count + len(rows), key
+            if part_count >= part_rows:
+                close_part()
+                part = None
+    if part is not None:
+        close_part()
+    state['done'] = True
+    save_checkpoint(directory, index, state)
+    return state
+
+
+def _server_table():
+    import app as server
+    return server.get_db(server.TABLE_STUDENTS)
+
+def _run_range(job):
+    """Pool worker: one range through the app's storage layer (pool, breaker, metrics)."""
+    index, key_range, args = job
+    started = time.time()
+    state = export_range(_server_table, args.directory, index, key_range, args.format,
+                         args.batch_size, args.part_rows, args.resume)
+    return index, state, time.time() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export every student's transcript as flat per-course rows.")
+    parser.add_argument('directory', help="output directory for part files and checkpoints")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--prefix', help="only matric numbers starting with this")
+    parser.add_argument('--split-at', default='', help="comma-separated matric prefixes to cut the key space at")
+    parser.add_argument('--processes', type=int, default=1, help="ranges exported in parallel")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="rows per scanner batch")
+    parser.add_argument('--part-rows', type=int, default=DEFAULT_PART_ROWS, help="course rows per part file")
+    parser.add_argument('--resume', action='store_true', help="continue from the checkpoints in DIRECTORY")
+    args = parser.parse_args(argv)
+
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401 -- fail before scanning anything
+        except ImportError:
+            parser.error("--format parquet needs pyarrow (pip install pyarrow)")
+    os.makedirs(args.directory, exist_ok=True)
+    ranges = key_ranges(args.prefix, [s.strip() for s in args.split_at.split(',') if s.strip()])
+    jobs = [(index, key_range, args) for index, key_range in enumerate(ranges)]
+
+    started = time.time()
+    if args.processes > 1 and len(jobs) > 1:
+        fork = 'fork' in multiprocessing.get_all_start_methods()
+        with multiprocessing.get_context('fork' if fork else 'spawn').Pool(min(args.processes, len(jobs))) as pool:
+            results = pool.map(_run_range, jobs, chunksize=1)
+    else:
+        results = [_run_range(job) for job in jobs]
+
+    total_students = total_rows = 0
+    for index, state, seconds in sorted(results, key=lambda r: r[0]):
+        start, stop = state['range']
+        print(f"   range {index:02d} [{start or '…'}, {stop or '…'}): {state['students']} students, "
+              f"{state['rows']} rows, {state['parts']} parts in {seconds:.1f}s")
+        total_students += state['students']
+        total_rows += state['rows']
+    elapsed = time.time() - started
+    print(f"✅ Exported {total_students} students ({total_rows} rows) to {args.directory} "
+          f"in {elapsed:.1f}s ({total_rows / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
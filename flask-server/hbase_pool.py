@@ -0,0 +1,199 @@
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    from thriftpy2.protocol.exc import TProtocolException
+    from thriftpy2.transport import TTransportException
+except ImportError:  # fake backends don't need thrift installed
+    TProtocolException = TTransportException = OSError
+
+# Errors that mean the connection itself is broken and must not go back to the pool.
+# Application-level Thrift errors (HBase's IOError / IllegalArgument, TApplicationException)
+# arrive over a healthy socket, so they leave the connection pooled.
+BROKEN_CONNECTION_ERRORS = (TTransportException, TProtocolException, socket.error, OSError)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the checkout timeout."""
+
+
+class PoolClosed(Exception):
+    """Raised on checkout from a pool that has been closed."""
+
+
+def ping_tables(connection):
+    """Default health check: one cheap RPC proves the Thrift socket is alive."""
+    connection.tables()
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of HBase connections.
+
+    `factory` builds a new connection (a happybase.Connection in production,
+    any object with the same methods in tests). Connections that sat idle
+    longer than `health_check_interval` seconds are pinged before being
+    handed out; ones that fail the ping or raise a transport error while
+    checked out are closed and replaced on demand.
+    """
+
+    def __init__(self, factory, size=10, checkout_timeout=5.0,
+                 health_check_interval=30.0, health_check=ping_tables):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._factory = factory
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._health_check = health_check
+
+        self._idle = deque()  # (connection, last_returned_at), most recent on the right
+        self._cond = threading.Condition()
+        self._open = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._created = 0
+        self._discarded = 0
+        self._health_checks = 0
+        self._health_failures = 0
+        self._timeouts = 0
+
+    # --- CHECKOUT / RETURN ---
+    def _acquire(self):
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:  # also wakes checkouts that were waiting when close() ran
+                    raise PoolClosed("HBase connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn, returned_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No HBase connection free after {self.checkout_timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+
+            waited_for = time.monotonic() - start
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+                self._wait_total += waited_for
+                self._wait_max = max(self._wait_max, waited_for)
+
+        if conn is not None and time.monotonic() - returned_at > self.health_check_interval:
+            conn = self._checked(conn)
+        if conn is None:
+            conn = self._create()
+        return conn
+
+    def _create(self):
+        try:
+            conn = self._factory()
+        except Exception:
+            self._release_slot()
+            raise
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _checked(self, conn):
+        """Ping a stale idle connection; returns None (slot still held) if it is dead."""
+        with self._cond:
+            self._health_checks += 1
+        try:
+            self._health_check(conn)
+            return conn
+        except Exception:
+            with self._cond:
+                self._health_failures += 1
+                self._discarded += 1
+            self._close_quietly(conn)
+            return None
+
+    def _release(self, conn):
+        with self._cond:
+            if not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._close_quietly(conn)  # returned after close(): don't re-pool it
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _discard(self, conn):
+        with self._cond:
+            self._discarded += 1
+        self._close_quietly(conn)
+        self._release_slot()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out for the duration of the `with` block."""
+        conn = self._acquire()
+        try:
+            yield conn
+        except BROKEN_CONNECTION_ERRORS:
+            self._discard(conn)
+            raise
+        except BaseException:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def close(self):
+        """Close every idle connection (checked-out ones close when returned)."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    # --- MONITORING ---
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': idle,
+                'in_use': self._open - idle,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'avg_wait_ms': round(self._wait_total * 1000 / self._waits, 3) if self._waits else 0.0,
+                'max_wait_ms': round(self._wait_max * 1000, 3),
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'health_checks': self._health_checks,
+                'health_failures': self._health_failures,
+            }
@@ -0,0 +1,138 @@
+"""
+Secondary indexes over the students table.
+
+`student_index` is a covering index: each entry repeats the student's name,
+department and CGPA, so listings never go back to `students`. Keys sort by
+CGPA descending through an inverted, zero-padded value:
+
+    d|<department>|<500 - cgpa*100>|<matric>   department listings / ranges
+    c|<500 - cgpa*100>|<matric>                registry-wide ranges / leaderboard
+
+A department page or a top-N leaderboard is therefore a single bounded
+range scan whose cost follows the result size. save_result/delete_student
+keep the entries current via `record_change`; `python indexes.py rebuild`
+backfills a fresh table or repairs drift.
+"""
+import sys
+
+from stats import MAX_BUCKET, cgpa_hundredths, department_key
+
+TABLE_INDEX = 'student_index'
+INDEX_FAMILIES = {'i': {'max_versions': 1}}
+
+DEPT_PREFIX = b'd|'
+CGPA_PREFIX = b'c|'
+SEP = b'|'
+COLUMNS = {'name': b'i:name', 'department': b'i:dept', 'cgpa': b'i:cgpa'}
+
+
+def dept_token(department):
+    """Case-insensitive department key component (a '|' would break the key layout)."""
+    return department_key(department).replace('|', ' ').encode()
+
+def inverted(cgpa):
+    return b'%03d' % (MAX_BUCKET - cgpa_hundredths(cgpa))
+
+def entry_keys(matric, state):
+    """Index keys for a student `state` ({'name', 'department', 'cgpa'})."""
+    inv = inverted(state['cgpa'])
+    keys = [CGPA_PREFIX + inv + SEP + matric.encode()]
+    if department_key(state['department']):
+        keys.append(DEPT_PREFIX + dept_token(state['department']) + SEP + inv + SEP + matric.encode())
+    return keys
+
+def entry_data(state):
+    return {column: state[field].encode() for field, column in COLUMNS.items()}
+
+def decode_entry(key, data):
+    return {
+        'matricNumber': key.rsplit(SEP, 1)[1].decode('utf-8'),
+        'name': data.get(COLUMNS['name'], b'').decode('utf-8'),
+        'department': data.get(COLUMNS['department'], b'').decode('utf-8'),
+        'cgpa': data.get(COLUMNS['cgpa'], b'0.00').decode('utf-8'),
+    }
+
+
+# --- MAINTENANCE ---
+def record_change(index_table, matric, old, new):
+    """Moves a student's entries from state `old` to `new` (either may be None)."""
+    record_changes(index_table, [(matric, old, new)])
+
+def record_changes(index_table, changes, batch_size=1000):
+    """Applies many (matric, old, new) moves in one batched round of mutations."""
+    with index_table.batch(batch_size=batch_size) as batch:
+        for matric, old, new in changes:
+            stale = set(entry_keys(matric, old)) if old else set()
+            fresh = entry_keys(matric, new) if new else []
+            for key in stale.difference(fresh):
+                batch.delete(key)
+            for key in fresh:
+                batch.put(key, entry_data(new))
+
+
+# --- RANGE BOUNDS ---
+def cgpa_bounds(prefix, min_cgpa=None, max_cgpa=None):
+    """(row_start, row_stop) under `prefix` for min_cgpa <= cgpa <= max_cgpa."""
+    row_start = prefix + (inverted(max_cgpa) if max_cgpa is not None else b'')
+    if min_cgpa is not None:
+        row_stop = prefix + b'%03d' % (MAX_BUCKET - cgpa_hundredths(min_cgpa) + 1)
+    else:
+        row_stop = prefix[:-1] + bytes([prefix[-1] + 1])  # end of this prefix
+    return row_start, row_stop
+
+def department_bounds(department, min_cgpa=None, max_cgpa=None):
+    return cgpa_bounds(DEPT_PREFIX + dept_token(department) + SEP, min_cgpa, max_cgpa)
+
+def registry_bounds(min_cgpa=None, max_cgpa=None):
+    return cgpa_bounds(CGPA_PREFIX, min_cgpa, max_cgpa)
+
+
+# --- REPAIR ---
+def rebuild(students_table, index_table, batch_size=1000, dry_run=False):
+    """
+    Reconciles the index with an info:-only scan of `students`: missing or
+    outdated entries are rewritten, entries for vanished students removed.
+    Returns counters describing what was (or, with dry_run, would be) done.
+    """
+    expected = {}
+    students = 0
+    for key, data in students_table.scan(columns=[b'info:name', b'info:dept', b'info:cgpa'],
+                                         batch_size=batch_size):
+        students += 1
+        state = {
+            'name': data.get(b'info:name', b'').decode('utf-8'),
+            'department': data.get(b'info:dept', b'').decode('utf-8'),
+            'cgpa': data.get(b'info:cgpa', b'0.00').decode('utf-8'),
+        }
+        for index_key in entry_keys(key.decode('utf-8'), state):
+            expected[index_key] = entry_data(state)
+
+    result = {'students': students, 'entries': len(expected), 'written': 0, 'removed': 0}
+    with index_table.batch(batch_size=batch_size) as batch:
+        seen = set()
+        for key, data in index_table.scan(batch_size=batch_size):
+            want = expected.get(key)
+            if want is None:
+                result['removed'] += 1
+                if not dry_run: batch.delete(key)
+            else:
+                seen.add(key)
+                if data != want:
+                    result['written'] += 1
+                    if not dry_run: batch.put(key, want)
+        for key, want in expected.items():
+            if key not in seen:
+                result['written'] += 1
+                if not dry_run: batch.put(key, want)
+    return result
+
+
+if __name__ == '__main__':
+    # Usage: python indexes.py rebuild [--dry-run]
+    args = sys.argv[1:]
+    if not args or args[0] != 'rebuild' or set(args[1:]) - {'--dry-run'}:
+        sys.exit("Usage: python indexes.py rebuild [--dry-run]")
+    import app as server
+    with server.get_dbs(server.TABLE_STUDENTS, server.TABLE_INDEX) as (students, index_table):
+        report = rebuild(students, index_table, dry_run='--dry-run' in args)
+    print(f"✅ Index checked: {report}")
@@ -0,0 +1,227 @@
+"""
+Streaming bulk result ingestion.
+
+Accepts one course result per CSV row or NDJSON line:
+
+    matricNumber,name,department,level,semester,courseCode,score,unit
+    CSC/2021/001,Ada Obi,Computer Science,200,First,CSC201,71,3
+
+The upload is read incrementally and processed in chunks of records. For
+each chunk the students are fetched with one multi-get (info: plus only the
+semester cells being touched), courses are merged into their semester by
+course code, GPAs and running totals are recomputed per student, and the
+writes go out through `table.batch()`, version checked like single uploads
+(see writes.py). Memory use is bounded by the chunk size, not the upload
+size.
+"""
+import csv
+import io
+import json
+
+import records
+import writes
+
+MAX_REPORTED_ERRORS = 1000
+
+
+# --- PARSING ---
+def parse_csv(stream):
+    """Yields (line number, raw dict) from a CSV byte stream with a header row."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8', newline=''))
+    for raw in reader:
+        yield reader.line_num, raw
+
+def parse_ndjson(stream):
+    for line_no, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            yield line_no, e
+            continue
+        yield line_no, raw if isinstance(raw, dict) else ValueError("expected a JSON object")
+
+PARSERS = {'csv': parse_csv, 'ndjson': parse_ndjson}
+
+def _number(value, field):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number") from None
+    return int(number) if number.is_integer() else number
+
+def normalise(raw):
+    """Validates one uploaded record; raises ValueError with a readable message."""
+    if isinstance(raw, Exception):
+        raise ValueError(f"unparseable record: {raw}")
+    matric = str(raw.get('matricNumber') or '').strip()
+    code = str(raw.get('courseCode') or raw.get('code') or '').strip()
+    if not matric:
+        raise ValueError("matricNumber is required")
+    if not code:
+        raise ValueError("courseCode is required")
+    unit = _number(raw.get('unit') if raw.get('unit') not in (None, '') else 3, 'unit')
+    if not isinstance(unit, int) or unit <= 0:
+        raise ValueError("unit must be a positive whole number")
+    return {
+        'matricNumber': matric,
+        'name': str(raw.get('name') or '').strip(),
+        'department': str(raw.get('department') or '').strip(),
+        'level': str(raw.get('level') or '100').strip(),
+        'semester': str(raw.get('semester') or 'First').strip(),
+        'course': {'courseCode': code, 'score': _number(raw.get('score'), 'score'), 'unit': unit},
+    }
+
+
+# --- PROCESSING ---
+def _course_key(course):
+    return course.get('courseCode') or course.get('code')
+
+def merge_courses(existing, incoming):
+    """Existing semester courses with `incoming` ones replacing those with the same code."""
+    merged = {_course_key(c): c for c in existing}
+    for course in incoming:
+        merged[_course_key(course)] = course
+    return list(merged.values())
+
+def student_cells(row, student, scale):
+    """
+    Merges one student's chunk records into `row`. Returns (cells to put,
+    whether the legacy blob must be deleted, new state).
+    """
+    row, old = dict(row), records.student_state(row)
+    cells, drop_legacy = {}, False
+    if records.is_legacy(row):
+        # Convert up front so courses already in the blob are merged, not dropped.
+        cells, _ = records.history_cells(records.assemble_history(row), scale)
+        drop_legacy = records.LEGACY_HISTORY in row
+        row.pop(records.LEGACY_HISTORY, None)
+        row.update(cells)
+    for (level, semester), courses in student['semesters'].items():
+        column = records.semester_column(level, semester)
+        existing = records.decode_semester(row[column])['courses'] if column in row else []
+        gpa, processed = scale.gpa_data(merge_courses(existing, courses))
+        new_sem = {'semester': semester, 'level': level, 'courses': processed, 'gpa': gpa}
+        sem_cells, cgpa, _ = records.upsert_semester(row, new_sem, scale)
+        row.update(sem_cells)
+        cells.update(sem_cells)
+        cells[b'info:gpa'] = gpa.encode()
+        cells[b'info:cgpa'] = cgpa.encode()
+    new = {
+        'name': student['name'] or (old or {}).get('name', ''),
+        'department': student['department'] or (old or {}).get('department', ''),
+        'cgpa': cells[b'info:cgpa'].decode('utf-8'),
+    }
+    cells[b'info:name'] = new['name'].encode()
+    cells[b'info:dept'] = new['department'].encode()
+    return records.summarise(cells, 'bulk', new_sem), drop_legacy, new
+
+def apply_chunk(table, chunk, scale, writer, batch_size):
+    """
+    Writes one chunk of normalised records. Returns ([(matric, old state,
+    new state)] for the statistics/index maintenance hooks, [(matric,
+    writes.WriteConflict)] for students that could not be written).
+
+    Rows are claimed with `writer` against the rev in the multi-get and put
+    in one batch; rows another writer holds or wins are retried one by one
+    through `writer.write`, so neither side loses the other's totals.
+    """
+    students = {}  # matric -> {'name', 'department', 'semesters': {(level, semester): [courses]}}
+    for rec in chunk:
+        student = students.setdefault(rec['matricNumber'], {'name': '', 'department': '', 'semesters': {}})
+        student['name'] = rec['name'] or student['name']
+        student['department'] = rec['department'] or student['department']
+        student['semesters'].setdefault((rec['level'], rec['semester']), []).append(rec['course'])
+
+    keys = [m.encode() for m in students]
+    columns = [b'info'] + sorted({records.semester_column(level, sem)
+                                  for s in students.values() for level, sem in s['semesters']})
+    rows = dict(table.rows(keys, columns=columns))
+    partial = [k for k, row in rows.items() if records.needs_full_row(row)]
+    if partial:
+        rows.update(table.rows(partial))  # one-time conversion / semester count needs every cell
+
+    changes, claimed, contended, written = [], [], [], False
+    try:
+        with table.batch(batch_size=batch_size) as batch:
+            for matric, student in students.items():
+                key = matric.encode()
+                row = rows.get(key, {})
+                if not writer.claim(table, key, row):
+                    contended.append(matric)
+                    continue
+                claimed.append(key)
+                cells, drop_legacy, new = student_cells(row, student, scale)
+                batch.put(key, cells)
+                if drop_legacy:
+                    batch.delete(key, columns=[records.LEGACY_HISTORY])
+                changes.append((matric, records.student_state(row), new))
+        written = True
+    finally:
+        for key in claimed:
+            writer.release(table, key, written)
+
+    conflicts = []
+    for matric in contended:
+        key = matric.encode()
+
+        def read():
+            row = table.row(key, columns=columns)
+            return table.row(key) if records.needs_full_row(row) else row
+
+        def build(row):
+            cells, drop_legacy, new = student_cells(row, students[matric], scale)
+            return cells, (drop_legacy, new)
+        try:
+            row, (drop_legacy, new) = writer.write(table, key, read, build)
+        except writes.WriteConflict as e:
+            conflicts.append((matric, e))
+            continue
+        if drop_legacy:
+            table.delete(key, columns=[records.LEGACY_HISTORY])
+        changes.append((matric, records.student_state(row), new))
+    return changes, conflicts
+
+def ingest(stream, fmt, open_table, scale, on_changes, writer,
+           chunk_records=5000, batch_size=1000):
+    """
+    Streams `stream` (CSV or NDJSON bytes) into the students table, grading
+    with `scale` (a grading.GradingScale). `open_table` is a context manager
+    factory for the table, entered once per chunk, so no connection is held
+    while the upload is read.
+    `on_changes` receives each chunk's [(matric, old, new)] once written and
+    the table is released: it checks out connections of its own, and nesting
+    those inside ours could exhaust the pool under concurrent uploads.
+    Writes are version checked with `writer` (a writes.VersionedWriter);
+    students still contended after its retries are reported as errors.
+    """
+    result = {'records': 0, 'students': 0, 'chunks': 0, 'errorCount': 0, 'errors': []}
+    chunk = []
+
+    def flush():
+        with open_table() as table:
+            changes, conflicts = apply_chunk(table, chunk, scale, writer, batch_size)
+        on_changes(changes)
+        for matric, e in conflicts:
+            result['errorCount'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append({'matricNumber': matric, 'error': str(e)})
+        result['students'] += len(changes)
+        result['chunks'] += 1
+        chunk.clear()
+
+    for line_no, raw in PARSERS[fmt](stream):
+        try:
+            chunk.append(normalise(raw))
+        except ValueError as e:
+            result['errorCount'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append({'line': line_no, 'error': str(e)})
+            continue
+        result['records'] += 1
+        if len(chunk) >= chunk_records:
+            flush()
+    if chunk:
+        flush()
+    return result
@@ -0,0 +1,248 @@
+"""
+Low-overhead instrumentation exported in the Prometheus text format.
+
+    REQUESTS     request latency per route / method
+    STORAGE_OPS  time spent in each storage call (row, scan, put, connect...)
+    PHASES       in-process work: history decode, GPA math, serialization
+    PAYLOADS     size of the academic cells a transcript read decodes
+
+Histograms keep cumulative bucket counts per label set under a lock, so an
+observation is a bisect and three additions. `timed()` also accumulates into
+the current request's phase totals (a ContextVar), which app.py can emit as a
+`Server-Timing` header. Point-in-time gauges (pool, audit queue, cache,
+breaker) are read from the components' own stats() at scrape time.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_phases = ContextVar('request_phases', default=None)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('%s="%s"' % (n, str(v).replace('\\', '\\\\').replace('"', '\\"')) for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[slot] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        names = self.labelnames + ('le',)
+        for labels, series in sorted(snapshot.items()):
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                running += count
+                le = bound if bound == '+Inf' else _number(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (le,))} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {running}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}" for labels, v in values)
+        return lines
+
+
+class StatsGauges:
+    """Exposes the numeric fields of a component's stats() dict as `<prefix>_<field>` gauges."""
+
+    def __init__(self, prefix, help, stats):
+        self.prefix = prefix
+        self.help = help
+        self._stats = stats
+
+    def render(self):
+        try:
+            stats = self._stats()
+        except Exception:
+            return []
+        lines = []
+        for key, value in sorted(stats.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            lines += [f"# HELP {name} {self.help} ({key})", f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+REQUESTS = REGISTRY.register(Histogram(
+    'unisemi_request_seconds', "Request latency until the response is returned (first byte for streams)",
+    ('route', 'method')))
+RESPONSES = REGISTRY.register(Counter(
+    'unisemi_responses_total', "Responses by route, method and status", ('route', 'method', 'status')))
+STORAGE_OPS = REGISTRY.register(Histogram(
+    'unisemi_storage_op_seconds', "Time spent in storage calls", ('op',)))
+STORAGE_ERRORS = REGISTRY.register(Counter(
+    'unisemi_storage_op_errors_total', "Storage calls that raised", ('op',)))
+PHASES = REGISTRY.register(Histogram(
+    'unisemi_phase_seconds', "In-process request phases", ('phase',)))
+PAYLOADS = REGISTRY.register(Histogram(
+    'unisemi_history_bytes', "Bytes of academic cells decoded per transcript read", ('kind',), SIZE_BUCKETS))
+
+
+# --- PER-REQUEST PHASES ---
+def begin_request():
+    """Starts collecting phase totals for the current request; returns a token for end_request."""
+    return _phases.set({})
+
+def end_request(token):
+    """Phase totals (name -> seconds) collected since begin_request."""
+    phases = _phases.get()
+    _phases.reset(token)
+    return phases or {}
+
+def _add_phase(name, seconds):
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+def server_timing(phases, total):
+    """Server-Timing header value: one entry per phase plus the total, in milliseconds."""
+    entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in sorted(phases.items())]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ', '.join(entries)
+
+
+# --- TIMERS ---
+@contextmanager
+def timed(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        PHASES.observe(elapsed, phase)
+        _add_phase(phase, elapsed)
+
+@contextmanager
+def storage_op(op):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STORAGE_ERRORS.inc(op)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STORAGE_OPS.observe(elapsed, op)
+        _add_phase('hbase_' + op, elapsed)
+
+
+# --- STORAGE PROXIES ---
+class InstrumentedBatch:
+    def __init__(self, batch):
+        self._batch = batch
+
+    def __getattr__(self, name):
+        return getattr(self._batch, name)
+
+    def __enter__(self):
+        self._batch.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        with storage_op('batch_send'):
+            return self._batch.__exit__(*exc)
+
+
+class InstrumentedTable:
+    """Times the happybase Table calls routes make; everything else passes through."""
+
+    TIMED = ('row', 'rows', 'cells', 'put', 'delete', 'counter_get', 'counter_set', 'counter_inc', 'counter_dec')
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getattr__(self, name):
+        attr = getattr(self._table, name)
+        if name not in self.TIMED:
+            return attr
+
+        def call(*args, **kwargs):
+            with storage_op(name):
+                return attr(*args, **kwargs)
+        return call
+
+    def scan(self, *args, **kwargs):
+        """Times the waits on storage while iterating, not the caller's work between rows."""
+        rows = self._table.scan(*args, **kwargs)
+        waited = 0.0
+        try:
+            while True:
+                fetch = time.perf_counter()
+                try:
+                    item = next(rows)
+                except StopIteration:
+                    return
+                finally:
+                    waited += time.perf_counter() - fetch
+                yield item
+        finally:
+            close = getattr(rows, 'close', None)
+            if close: close()
+            STORAGE_OPS.observe(waited, 'scan')
+            _add_phase('hbase_scan', waited)
+
+    def batch(self, *args, **kwargs):
+        return InstrumentedBatch(self._table.batch(*args, **kwargs))
@@ -0,0 +1,244 @@
+"""
+Row layout for the `students` table.
+
+Each semester lives in its own cell, `academic:<level>_<semester>` (e.g.
+`academic:100_First`), holding that semester's JSON. Running totals sit next
+to the student's other fields:
+
+    info:units      total course units taken
+    info:points     total grade points (unit x point), so CGPA = points / units
+    info:semesters  number of semester cells
+
+An upload therefore reads the info: family plus one semester cell, adjusts
+the totals by that semester's delta and writes back only what changed; the
+cost no longer grows with years of study. The full history is reassembled
+only by readers that need it.
+
+Rows written before this layout keep everything in one `academic:history`
+JSON blob. `assemble_history` and `row_totals` read both shapes, uploads
+convert a legacy row the first time they touch it, and `python records.py
+migrate` converts the rest in bulk.
+
+Every write also puts `academic:summary`, a small JSON description of the
+write (action, semester, semester count, GPA, CGPA) that shares the
+mutation's timestamp; versions.py lists history from it.
+
+Semester cells are written in the compact binary encoding from codec.py;
+cells written as JSON stay readable, and `python records.py reencode`
+rewrites them in place.
+"""
+import argparse
+import json
+import time
+
+import codec
+
+LEGACY_HISTORY = b'academic:history'
+ACADEMIC_PREFIX = b'academic:'
+COL_UNITS = b'info:units'
+COL_POINTS = b'info:points'
+COL_SEMESTERS = b'info:semesters'
+COL_SUMMARY = b'academic:summary'
+SEMESTER_ORDER = {'First': 0, 'Second': 1}
+
+
+def semester_column(level, semester):
+    return ACADEMIC_PREFIX + f"{level}_{semester}".encode()
+
+def is_semester_column(column):
+    return column.startswith(ACADEMIC_PREFIX) and column != LEGACY_HISTORY and column != COL_SUMMARY
+
+def semester_label(column):
+    """'academic:100_First' -> ('100', 'First') without decoding the cell."""
+    level, _, semester = column[len(ACADEMIC_PREFIX):].decode('utf-8').partition('_')
+    return level, semester
+
+def semester_sort_key(sem):
+    level = str(sem.get('level', ''))
+    return (0, int(level)) if level.isdigit() else (1, level), SEMESTER_ORDER.get(sem.get('semester'), 9)
+
+def encode_semester(sem):
+    return codec.encode(sem)
+
+def decode_semester(raw):
+    """Semester dict from a binary or JSON cell."""
+    return codec.decode(raw)
+
+
+# --- TOTALS ---
+def semester_totals(sem, scale):
+    """(units, points) for one semester graded by `scale` (a grading.GradingScale)."""
+    return scale.semester_totals([sem])[0]
+
+def format_cgpa(units, points):
+    return "{:.2f}".format(points / units) if units else "0.00"
+
+def is_legacy(row):
+    """True for a stored row still in the single-blob layout (or with no totals yet)."""
+    return bool(row) and COL_UNITS not in row
+
+def needs_full_row(row):
+    """
+    True when an upload can't work from the info: family and one semester
+    cell: legacy rows, and rows whose totals predate the semester count.
+    """
+    return bool(row) and COL_SEMESTERS not in row
+
+def row_totals(row, scale):
+    if COL_UNITS in row:
+        return int(row[COL_UNITS]), int(row.get(COL_POINTS, b'0'))
+    totals = scale.semester_totals(assemble_history(row))
+    return sum(u for u, _ in totals), sum(p for _, p in totals)
+
+
+# --- READS ---
+def student_state(row):
+    """The info: fields that aggregates and indexes derive from, or None for a missing row."""
+    if not row: return None
+    return {
+        'name': row.get(b'info:name', b'').decode('utf-8'),
+        'department': row.get(b'info:dept', b'').decode('utf-8'),
+        'cgpa': row.get(b'info:cgpa', b'0.00').decode('utf-8'),
+    }
+
+def assemble_history(row):
+    """Semester list in level/semester order from either layout."""
+    if LEGACY_HISTORY in row:
+        raw = row[LEGACY_HISTORY]
+        return json.loads(raw.decode('utf-8')) if raw else []
+    history = [decode_semester(value) for column, value in row.items() if is_semester_column(column)]
+    history.sort(key=semester_sort_key)
+    return history
+
+
+# --- WRITES ---
+def history_cells(history, scale):
+    """Cells (semester columns + totals) that store `history` in the per-semester layout."""
+    cells = {}
+    for sem in history:
+        cells[semester_column(sem.get('level'), sem.get('semester'))] = encode_semester(sem)
+    totals = scale.semester_totals(history)
+    units, points = sum(u for u, _ in totals), sum(p for _, p in totals)
+    cells[COL_SEMESTERS] = str(len(cells)).encode()
+    cells[COL_UNITS] = str(units).encode()
+    cells[COL_POINTS] = str(points).encode()
+    return cells, format_cgpa(units, points)
+
+def upsert_semester(row, new_sem, scale):
+    """
+    Cells to write for replacing/adding `new_sem` on a row read with the
+    info: family and that semester's column (or the full row when
+    `needs_full_row`). Returns (cells, cgpa, needs_legacy_delete).
+    """
+    column = semester_column(new_sem['level'], new_sem['semester'])
+    if is_legacy(row):
+        history = [h for h in assemble_history(row)
+                   if not (h.get('level') == new_sem['level'] and h.get('semester') == new_sem['semester'])]
+        history.append(new_sem)
+        cells, cgpa = history_cells(history, scale)
+        return cells, cgpa, LEGACY_HISTORY in row
+
+    units, points = row_totals(row, scale)
+    if COL_SEMESTERS in row:
+        semesters = int(row[COL_SEMESTERS])
+    else:
+        semesters = sum(1 for c in row if is_semester_column(c))
+    if column not in row:
+        semesters += 1
+    else:
+        old_units, old_points = semester_totals(decode_semester(row[column]), scale)
+        units, points = units - old_units, points - old_points
+    new_units, new_points = semester_totals(new_sem, scale)
+    units, points = units + new_units, points + new_points
+    cells = {
+        column: encode_semester(new_sem),
+        COL_UNITS: str(units).encode(),
+        COL_POINTS: str(points).encode(),
+        COL_SEMESTERS: str(semesters).encode(),
+    }
+    return cells, format_cgpa(units, points), False
+
+def summarise(cells, action, sem=None):
+    """
+    Adds the `academic:summary` cell for a write of `cells` (which must hold
+    the semester count and info:cgpa); `sem` is the semester it touched.
+    """
+    summary = {'action': action}
+    if sem is not None:
+        summary['level'], summary['semester'] = sem.get('level'), sem.get('semester')
+    summary['semesters'] = int(cells[COL_SEMESTERS])
+    if b'info:gpa' in cells:
+        summary['gpa'] = cells[b'info:gpa'].decode('utf-8')
+    summary['cgpa'] = cells[b'info:cgpa'].decode('utf-8')
+    cells[COL_SUMMARY] = json.dumps(summary, separators=(',', ':')).encode()
+    return cells
+
+
+# --- MIGRATION ---
+def migrate(table, scale, batch_size=500, dry_run=False):
+    """Rewrites every legacy academic:history row into per-semester cells."""
+    migrated = scanned = 0
+    with table.batch(batch_size=batch_size) as batch:
+        for key, row in table.scan(batch_size=batch_size):
+            scanned += 1
+            if not is_legacy(row):
+                continue
+            migrated += 1
+            if dry_run:
+                continue
+            cells, cgpa = history_cells(assemble_history(row), scale)
+            cells[b'info:cgpa'] = cgpa.encode()
+            batch.put(key, summarise(cells, 'migrate'))
+            if LEGACY_HISTORY in row:
+                batch.delete(key, columns=[LEGACY_HISTORY])
+    return {'scanned': scanned, 'migrated': migrated}
+
+
+def reencode(table, fmt=None, batch_size=500, pause=0.0, dry_run=False):
+    """
+    Rewrites the latest version of every semester cell not already in `fmt`
+    (default: UNISEMI_HISTORY_FORMAT). Cells are put back with their own
+    timestamps, so the rewrite replaces the version it read instead of
+    showing up as a new upload, and an upload that lands mid-run keeps its
+    newer version. Older versions stay as they are until they age out.
+    `pause` seconds between scanner batches keeps a background run gentle.
+    """
+    fmt = fmt or codec.default_format()
+    report = {'scanned': 0, 'cells': 0, 'rewritten': 0, 'bytes_before': 0, 'bytes_after': 0}
+    for key, row in table.scan(columns=[b'academic'], include_timestamp=True, batch_size=batch_size):
+        report['scanned'] += 1
+        if pause and report['scanned'] % batch_size == 0:
+            time.sleep(pause)
+        by_timestamp = {}
+        for column, (value, timestamp) in row.items():
+            if not is_semester_column(column): continue
+            report['cells'] += 1
+            encoded = codec.encode(codec.decode(value), fmt)
+            report['bytes_before'] += len(value)
+            report['bytes_after'] += len(encoded)
+            if encoded != value:
+                by_timestamp.setdefault(timestamp, {})[column] = encoded
+        for timestamp, cells in by_timestamp.items():
+            report['rewritten'] += len(cells)
+            if not dry_run:
+                table.put(key, cells, timestamp=timestamp)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintenance for the students table layout.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('migrate', help="convert legacy academic:history rows").add_argument('--dry-run', action='store_true')
+    reencode_parser = commands.add_parser('reencode', help="rewrite semester cells in the current encoding")
+    reencode_parser.add_argument('--dry-run', action='store_true')
+    reencode_parser.add_argument('--format', choices=codec.FORMATS, help="default: UNISEMI_HISTORY_FORMAT")
+    reencode_parser.add_argument('--pause', type=float, default=0.0, help="seconds to sleep every 500 rows")
+    args = parser.parse_args()
+
+    import app as server
+    with server.get_db(server.TABLE_STUDENTS) as students:
+        if args.command == 'migrate':
+            print(f"✅ Layout migration: {migrate(students, server.GRADING, dry_run=args.dry_run)}")
+        else:
+            report = reencode(students, args.format, pause=args.pause, dry_run=args.dry_run)
+            print(f"✅ Re-encode: {report}")
@@ -0,0 +1,464 @@
+"""
+In-memory name / matric search behind GET /api/search?q=...&limit=...
+
+Every student contributes a few terms: each word of their name plus their
+matric number with punctuation removed, all lowercased with accents
+stripped. Terms are kept in one sorted fixed-width numpy array next to an
+array of student ids, so a prefix lookup is two binary searches. Students
+themselves are one packed string each ("matric␟name␟department␟cgpa").
+
+Results come best match first:
+
+    exact    every query word is one of the student's terms
+    prefix   every query word begins one of them (type-ahead)
+    fuzzy    a query word within 1 edit of a name word (2 from 8 letters
+             on), or a matric number one edit away from the query
+
+Fuzzy name matching uses trigram postings over the distinct name words,
+which number in the thousands even for 10^6 students, not over students.
+Matric typos are caught by looking up every one-edit variant of the query
+in a single vectorised searchsorted.
+
+The index is built once from an info:-only scan, either by the first
+search or by serve.py at startup. After that, record_student_changes
+feeds it every write:
+
+- New terms go into a small sorted delta list, which is merged into the
+  arrays every DELTA_LIMIT terms.
+- A renamed or deleted student's old id is tombstoned. Tombstoned terms
+  are dropped at a merge once they make up COMPACT_RATIO of the array.
+- Writes that arrive while the scan is running are replayed when it
+  finishes.
+"""
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+
+import numpy as np
+
+TERM_WIDTH = 24                 # bytes kept per term; longer words match on their first 24
+TERM_DTYPE = f'S{TERM_WIDTH}'
+DELTA_LIMIT = 20000
+COMPACT_RATIO = 0.2
+MAX_CANDIDATES = 1000           # students checked per query tier
+MAX_WORD_DOCS = 5000            # students collected to filter fuzzy matches by a second word
+MAX_FUZZY_WORDS = 16            # closest name words tried per fuzzy query word
+FUZZY_CANDIDATES = 32           # name words sharing the most trigrams that get an edit distance
+MIN_FUZZY_LENGTH = 4
+SCAN_COLUMNS = [b'info:name', b'info:dept', b'info:cgpa']
+SEP = '\x1f'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+_WORD = re.compile(r'\w+')
+_DIGITS = [bytes([c]) for c in b'0123456789']
+_LETTERS = [bytes([c]) for c in b'abcdefghijklmnopqrstuvwxyz']
+
+
+# --- TEXT ---
+def normalise(text):
+    """Lowercase with accents dropped ('Adébáyọ̀' -> 'adebayo')."""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+
+def words(text):
+    return _WORD.findall(normalise(text))
+
+def squash(matric):
+    """'CSC/2015/001' -> 'csc2015001', the matric's single term."""
+    if matric.isalnum() and matric.isascii():
+        return matric.lower()
+    return ''.join(words(matric))
+
+def term(word):
+    return word.encode('utf-8')[:TERM_WIDTH]
+
+def student_terms(matric, name_words):
+    return {term(squash(matric)), *map(term, name_words)}
+
+def edit_distance(a, b, limit, prefix=False):
+    """
+    Edits (insert, delete, substitute, swap neighbours) between `a` and `b`,
+    or with `prefix` between `a` and the closest prefix of `b`; limit + 1 as
+    soon as it must exceed `limit`. Only cells within `limit` of the
+    diagonal are computed.
+    """
+    if prefix:
+        b = b[:len(a) + limit]
+    elif abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i if i <= limit else over] + [over] * len(b)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cb = b[j - 1]
+            d = previous[j - 1] + (ca != cb)
+            if previous[j] < d: d = previous[j] + 1
+            if current[j - 1] < d: d = current[j - 1] + 1
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb and before[j - 2] < d:
+                d = before[j - 2] + 1
+            current[j] = d
+        if min(current) > limit:
+            return over
+        before, previous = previous, current
+    return min(min(previous) if prefix else previous[-1], over)
+
+def typo_limit(word):
+    return 1 if len(word) < 8 else 2
+
+def grams(word):
+    padded = f' {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def one_edit_variants(word):
+    """
+    Terms one deletion, swap, substitution or insertion away from `word`,
+    substituting and inserting digits next to digits and letters elsewhere.
+    """
+    word = term(word)
+    out = set()
+    for i in range(len(word)):
+        out.add(word[:i] + word[i + 1:])
+        if i + 1 < len(word):
+            out.add(word[:i] + word[i + 1:i + 2] + word[i:i + 1] + word[i + 2:])
+        for r in _DIGITS if word[i:i + 1].isdigit() else _LETTERS:
+            out.add(word[:i] + r + word[i + 1:])
+    for i in range(len(word) + 1):
+        for r in _DIGITS if word[i - 1:i].isdigit() or word[i:i + 1].isdigit() else _LETTERS:
+            out.add(word[:i] + r + word[i:])
+    out.discard(word)
+    return [v for v in out if len(v) < TERM_WIDTH]
+
+
+def word_pattern(query_words, exact):
+    """One regex requiring every query word to be (or, unless `exact`, begin) a word of the text."""
+    tail = r'(?!\w)' if exact else ''
+    return re.compile(''.join(rf'(?=.*?(?<!\w){re.escape(w)}{tail})' for w in query_words), re.S)
+
+
+# --- RECORDS ---
+def pack(matric, name, department, cgpa):
+    return SEP.join((matric, name, department, cgpa))
+
+def searchable(doc):
+    """A packed student's name words and matric term as one string for word_pattern."""
+    matric, name, _ = doc.split(SEP, 2)
+    text = f'{name} {matric}'
+    if text.isascii() and matric.isalnum():
+        return text.lower()
+    return f'{normalise(name)} {squash(matric)}'
+
+def unpack(doc):
+    matric, name, department, cgpa = doc.split(SEP)
+    return {'matricNumber': matric, 'name': name, 'department': department, 'cgpa': cgpa}
+
+def scan_students(table, batch_size=5000):
+    """(matric, name, department, cgpa) for every student, from the info: columns only."""
+    for key, row in table.scan(columns=SCAN_COLUMNS, batch_size=batch_size):
+        yield (key.decode('utf-8'), row.get(b'info:name', b'').decode('utf-8'),
+               row.get(b'info:dept', b'').decode('utf-8'), row.get(b'info:cgpa', b'0.00').decode('utf-8'))
+
+
+# --- INDEX ---
+class SearchIndex:
+    def __init__(self, open_table):
+        self.open_table = open_table
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._state = 'empty'      # empty -> building -> ready
+        self._pending = []         # (matric, new state) seen during the build
+        self._reset()
+
+    def _reset(self):
+        self._docs = []                                   # id -> packed student, None once replaced
+        self._live = 0
+        self._terms = np.empty(0, dtype=TERM_DTYPE)
+        self._ids = np.empty(0, dtype=np.int32)
+        self._delta = []                                  # sorted [(term, id)] not merged yet
+        self._dead_terms = 0
+        self._words = []                                  # distinct name words
+        self._word_ids = {}
+        self._grams = {}                                  # trigram -> array of word ids
+        self._merges = 0
+
+    # --- building ---
+    def ensure(self):
+        """Builds the index from storage on first use; concurrent callers wait for it."""
+        if self._state == 'ready': return
+        with self._build_lock:
+            if self._state == 'ready': return
+            with self._lock:
+                self._state, self._pending = 'building', []
+            try:
+                with self.open_table() as table:
+                    self.build(scan_students(table))
+            except BaseException:
+                with self._lock:
+                    self._state, self._pending = 'empty', []
+                raise
+
+    def build(self, students):
+        """Indexes (matric, name, department, cgpa) tuples, then replays writes made meanwhile."""
+        docs, terms, ids, vocabulary = [], [], [], set()
+        for matric, name, department, cgpa in students:
+            doc = len(docs)
+            docs.append(pack(matric, name, department, cgpa))
+            name_words = words(name)
+            for t in student_terms(matric, name_words):
+                terms.append(t)
+                ids.append(doc)
+            vocabulary.update(name_words)
+        terms = np.array(terms, dtype=TERM_DTYPE)
+        order = np.argsort(terms, kind='stable')
+        with self._lock:
+            self._reset()
+            self._docs, self._live = docs, len(docs)
+            self._terms, self._ids = terms[order], np.array(ids, dtype=np.int32)[order]
+            for word in sorted(vocabulary):
+                self._add_word(word)
+            for matric, new in self._pending:
+                self._apply(matric, new)
+            self._state, self._pending = 'ready', []
+
+    # --- updates ---
+    def record_changes(self, changes):
+        """(matric, old state, new state) per write, as given to record_student_changes."""
+        with self._lock:
+            for matric, _, new in changes:
+                if self._state == 'building':
+                    self._pending.append((matric, new))
+                elif self._state == 'ready':
+                    self._apply(matric, new)
+            if len(self._delta) > DELTA_LIMIT:
+                self._merge()
+
+    def _apply(self, matric, new):
+        doc = self._find(matric)
+        if new is None:
+            if doc is not None:
+                self._tombstone(doc)
+            return
+        packed = pack(matric, new['name'], new['department'], new['cgpa'])
+        if doc is not None and unpack(self._docs[doc])['name'] == new['name']:
+            self._docs[doc] = packed  # same terms: update in place
+            return
+        if doc is not None:
+            self._tombstone(doc)
+        doc = len(self._docs)
+        self._docs.append(packed)
+        self._live += 1
+        name_words = words(new['name'])
+        for t in student_terms(matric, name_words):
+            insort(self._delta, (t, doc))
+        for word in name_words:
+            self._add_word(word)
+
+    def _tombstone(self, doc):
+        matric, name = self._docs[doc].split(SEP, 2)[:2]
+        self._dead_terms += len(student_terms(matric, words(name)))
+        self._docs[doc] = None
+        self._live -= 1
+
+    def _add_word(self, word):
+        if word in self._word_ids or len(word) < MIN_FUZZY_LENGTH - 1: return
+        word_id = self._word_ids[word] = len(self._words)
+        self._words.append(word)
+        for gram in grams(word):
+            self._grams.setdefault(gram, array('i')).append(word_id)
+
+    def _merge(self):
+        """Folds the delta into the arrays, dropping tombstoned terms once there are enough."""
+        terms, ids = self._terms, self._ids
+        if self._delta:
+            delta_terms = np.array([t for t, _ in self._delta], dtype=TERM_DTYPE)
+            delta_ids = np.array([d for _, d in self._delta], dtype=np.int32)
+            at = np.searchsorted(terms, delta_terms, side='right')
+            terms, ids = np.insert(terms, at, delta_terms), np.insert(ids, at, delta_ids)
+        if self._dead_terms > COMPACT_RATIO * len(terms):
+            alive = np.fromiter((doc is not None for doc in self._docs), dtype=bool, count=len(self._docs))
+            keep = alive[ids]
+            terms, ids = terms[keep], ids[keep]
+            self._dead_terms = 0
+        self._terms, self._ids, self._delta = terms, ids, []
+        self._merges += 1
+
+    def _find(self, matric):
+        t = term(squash(matric))
+        for doc in self._range(t, exact=True):
+            packed = self._docs[doc]
+            if packed is not None and packed.split(SEP, 1)[0] == matric:
+                return doc
+        return None
+
+    # --- lookups ---
+    def _span(self, t, exact):
+        """(start, stop) of the terms equal to (or starting with) `t` in the merged arrays."""
+        if exact or len(t) >= TERM_WIDTH:  # numpy ignores trailing NULs, so search for t itself
+            return (int(np.searchsorted(self._terms, t, side='left')),
+                    int(np.searchsorted(self._terms, t, side='right')))
+        return (int(np.searchsorted(self._terms, t, side='left')),
+                int(np.searchsorted(self._terms, t + b'\xff', side='left')))  # no UTF-8 byte is 0xff
+
+    def _delta_span(self, t, exact):
+        high = t + (b'\x00' if exact or len(t) >= TERM_WIDTH else b'\xff')
+        return bisect_left(self._delta, (t,)), bisect_left(self._delta, (high,))
+
+    def _range(self, t, exact, cap=MAX_CANDIDATES):
+        """Ids of terms equal to (or starting with) `t`: merged arrays first, then the delta."""
+        start, stop = self._span(t, exact)
+        found = self._ids[start:min(stop, start + cap)].tolist()
+        start, stop = self._delta_span(t, exact)
+        found.extend(doc for _, doc in self._delta[start:min(stop, start + cap - len(found))])
+        return found
+
+    def _count(self, t, exact):
+        start, stop = self._span(t, exact)
+        delta_start, delta_stop = self._delta_span(t, exact)
+        return stop - start + delta_stop - delta_start
+
+    def _similar_words(self, word):
+        """Name words within typo_limit edits of `word` or beginning within that of it, closest first."""
+        limit = typo_limit(word)
+        query_grams = grams(word)
+        postings = [self._grams[g] for g in query_grams if g in self._grams]
+        if not postings:
+            return []
+        counts = np.bincount(np.concatenate([np.frombuffer(p, dtype=np.int32) for p in postings]),
+                             minlength=len(self._words))
+        # An edit touches at most 3 trigrams; a longer word loses the closing 'xy ' gram too.
+        candidates = np.flatnonzero(counts >= max(len(query_grams) - 3 * limit - 1, 1))
+        candidates = candidates[np.argsort(-counts[candidates], kind='stable')]
+        scored = []
+        for word_id in candidates[:FUZZY_CANDIDATES].tolist():
+            other = self._words[word_id]
+            distance = edit_distance(word, other, limit, prefix=True)
+            if distance <= limit:
+                scored.append((distance, other != word[:len(other)] and len(other) != len(word), other))
+        scored.sort()
+        return [other for _, _, other in scored[:MAX_FUZZY_WORDS]]
+
+    def _fuzzy(self, word):
+        """Ids of students with a name word close to `word`, or a matric one edit from it."""
+        if any(c.isdigit() for c in word):
+            variants = one_edit_variants(word)
+            starts = np.searchsorted(self._terms, np.array(variants, dtype=TERM_DTYPE), side='left')
+            stops = np.searchsorted(self._terms, np.array([v + b'\xff' for v in variants], dtype=TERM_DTYPE),
+                                    side='left')
+            found = []
+            for i in np.flatnonzero(stops > starts).tolist():
+                found.extend(self._ids[starts[i]:min(stops[i], starts[i] + MAX_CANDIDATES)].tolist())
+                if len(found) >= MAX_CANDIDATES:
+                    return found
+            if self._delta:
+                for v in variants:
+                    start, stop = self._delta_span(v, exact=False)
+                    found.extend(doc for _, doc in self._delta[start:stop])
+            return found
+        found = []
+        for other in self._similar_words(word):
+            found.extend(self._range(term(other), exact=False))
+            if len(found) >= MAX_CANDIDATES:
+                break
+        return found
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """[{matricNumber, name, department, cgpa, match}] best first."""
+        query_words = words(query)
+        if not query_words:
+            return []
+        with self._lock:
+            results, seen = [], set()
+
+            def take(candidates, match, check=None):
+                for doc in candidates:
+                    if len(results) >= limit:
+                        return
+                    if doc in seen: continue
+                    packed = self._docs[doc]
+                    if packed is None or (check and not check(searchable(packed))): continue
+                    seen.add(doc)
+                    results.append(dict(unpack(packed), match=match))
+
+            if len(query_words) == 1:
+                word = query_words[0]
+                take(self._range(term(word), exact=True), 'exact')
+                take(self._range(term(word), exact=False), 'prefix')
+            else:
+                squashed = term(''.join(query_words))  # 'CSC/2015/001'
+                take(self._range(squashed, exact=True), 'exact')
+                take(self._range(squashed, exact=False), 'prefix')
+                self._multi_word(query_words, limit - len(results), take)
+            if len(results) < limit:
+                fuzzy = [w for w in query_words if len(w) >= MIN_FUZZY_LENGTH]
+                if fuzzy:
+                    pivot = max(fuzzy, key=len)
+                    # Every other word must begin, or be a typo of, one of the student's words.
+                    others = [(w, set(self._similar_words(w)) if len(w) >= MIN_FUZZY_LENGTH else set())
+                              for w in query_words if w != pivot]
+                    candidates = self._fuzzy(pivot)
+                    # Cheap id filters where a word's students are few enough to collect; text otherwise.
+                    unchecked = []
+                    for w, similar in others:
+                        docs = self._word_docs(w, similar)
+                        if docs is None:
+                            unchecked.append((w, similar))
+                        else:
+                            candidates = [doc for doc in candidates if doc in docs]
+
+                    def check(text):
+                        own = _WORD.findall(text)
+                        return all(any(o.startswith(w) or o in similar for o in own) for w, similar in unchecked)
+                    take(candidates, 'fuzzy', check if unchecked else None)
+            return results
+
+    def _word_docs(self, word, similar):
+        """
+        Ids of students with a term beginning `word` or equal to one of
+        `similar`, or None if there are more than MAX_WORD_DOCS of them.
+        """
+        ranges = [(term(word), False)] + [(term(other), True) for other in similar]
+        if sum(self._count(t, exact) for t, exact in ranges) > MAX_WORD_DOCS:
+            return None
+        docs = set()
+        for t, exact in ranges:
+            docs.update(self._range(t, exact, cap=MAX_WORD_DOCS))
+        return docs
+
+    def _multi_word(self, query_words, wanted, take):
+        """
+        Exact, then prefix, matches of a multi-word query from one walk over
+        the rarest word's prefix range, checking the other words against
+        each student. That word's exact terms sort first in the range.
+        """
+        pivot = min(query_words, key=lambda w: self._count(term(w), exact=False))
+        exact_pattern, prefix_pattern = word_pattern(query_words, True), word_pattern(query_words, False)
+        exact, prefix = [], []
+        for doc in self._range(term(pivot), exact=False):
+            packed = self._docs[doc]
+            if packed is None: continue
+            text = searchable(packed)
+            if not prefix_pattern.match(text):
+                continue
+            (exact if exact_pattern.match(text) else prefix).append(doc)
+            if len(exact) + len(prefix) >= wanted:
+                break
+        take(exact, 'exact')
+        take(prefix, 'prefix')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ready': int(self._state == 'ready'),
+                'students': self._live,
+                'terms': len(self._terms) + len(self._delta),
+                'delta_terms': len(self._delta),
+                'dead_terms': self._dead_terms,
+                'name_words': len(self._words),
+                'merges': self._merges,
+                'array_bytes': self._terms.nbytes + self._ids.nbytes,
+            }
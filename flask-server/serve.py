@@ -0,0 +1,317 @@
+"""
+Production serving mode.
+
+    python serve.py [--host 0.0.0.0] [--port 5000] [--workers N] [--queue-depth N]
+
+`python app.py` runs the Werkzeug dev server, which starts a new thread per
+connection with no bound: while a region server is slow, threads blocked in
+happybase pile up until the process falls over. Here one accept loop hands
+connections to a fixed pool of worker threads sized to the HBase connection
+pool, and a stalled backend ties up at most that many workers. A request
+holds at most one pooled connection at a time (app.get_dbs opens every
+table it needs on one), but the audit writer, health prober, log archiver
+and search warm-up hold one each in the background, so the default is the
+pool size less those; more workers than that can queue for a connection.
+
+Backpressure instead of unbounded queuing:
+
+    queue depth   up to `queue_depth` accepted connections wait for a
+                  worker; past that the accept loop answers 503 with
+                  Retry-After straight away
+    route limits  each listed Flask endpoint runs at most N requests at a
+                  time, and the rest get 429 with Retry-After, so bulk
+                  uploads, batch lookups, exports and rebuilds can't take
+                  every worker away from transcript lookups during a
+                  result release
+
+SIGTERM / SIGINT drains: the accept loop stops and the listening socket is
+closed, so new connections are refused rather than left unanswered in the
+backlog; queued and in-flight requests finish (up to the drain timeout),
+then the audit queue is written out, the health prober stops and the
+connection pool closes.
+
+The routes are unchanged; limits are a WSGI middleware around
+`app.wsgi_app` that matches endpoints with the app's own url_map.
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import threading
+import time
+from collections import Counter
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import ClosingIterator
+
+# Heavy endpoints and how many may run at once; UNISEMI_ROUTE_LIMITS="endpoint=N,..." replaces this.
+DEFAULT_ROUTE_LIMITS = 'bulk_upload_results=2,export_registry=2,get_students_batch=4,rebuild_stats=1,rebuild_index=1,clear_logs=1'
+RETRY_AFTER = 1
+# Pooled connections held outside requests: audit writer, health prober, log archiver, search warm-up.
+BACKGROUND_CONNECTIONS = 4
+
+
+def parse_limits(text):
+    """'endpoint=N,...' -> {endpoint: N}."""
+    limits = {}
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        endpoint, _, limit = part.partition('=')
+        limits[endpoint.strip()] = int(limit)
+    return limits
+
+def error_body(status, message):
+    return json.dumps({'error': message, 'status': status}).encode()
+
+
+# --- PER-ROUTE LIMITS ---
+class RouteLimiter:
+    """WSGI middleware: at most `limits[endpoint]` concurrent requests per endpoint, 429 beyond that."""
+
+    def __init__(self, flask_app, limits):
+        self.url_map = flask_app.url_map
+        self.wsgi_app = flask_app.wsgi_app
+        self.limits = dict(limits)
+        self._lock = threading.Lock()
+        self._active = Counter()
+        self._rejected = Counter()
+
+    def endpoint(self, environ):
+        try:
+            endpoint, _ = self.url_map.bind_to_environ(environ).match()
+        except HTTPException:  # 404 / 405 / redirects: let Flask answer
+            return None
+        return endpoint
+
+    def __call__(self, environ, start_response):
+        endpoint = self.endpoint(environ)
+        limit = self.limits.get(endpoint)
+        if limit is None:
+            return self.wsgi_app(environ, start_response)
+        with self._lock:
+            if self._active[endpoint] >= limit:
+                self._rejected[endpoint] += 1
+                busy = True
+            else:
+                self._active[endpoint] += 1
+                busy = False
+        if busy:
+            body = error_body(429, f"Too many concurrent {endpoint} requests; retry shortly")
+            start_response('429 Too Many Requests', [
+                ('Content-Type', 'application/json'), ('Content-Length', str(len(body))),
+                ('Retry-After', str(RETRY_AFTER)), ('Access-Control-Allow-Origin', '*'),
+            ])
+            return [body]
+        try:
+            response = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self._release(endpoint)
+            raise
+        # Streamed bodies keep their slot until the server closes the iterable.
+        return ClosingIterator(response, lambda: self._release(endpoint))
+
+    def _release(self, endpoint):
+        with self._lock:
+            self._active[endpoint] -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limits': dict(self.limits),
+                'active': {e: n for e, n in self._active.items() if n},
+                'rejected_by_route': dict(self._rejected),
+                'rejected': sum(self._rejected.values()),
+            }
+
+
+# --- SERVER ---
+class RequestHandler(WSGIRequestHandler):
+    # One request per connection, so an idle keep-alive client never pins a worker.
+    protocol_version = 'HTTP/1.0'
+    access_log = False
+
+    def log_request(self, code='-', size='-'):
+        if self.access_log:
+            super().log_request(code, size)
+
+
+class BoundedWSGIServer(BaseWSGIServer):
+    """Accept loop feeding a fixed set of worker threads through a bounded queue of connections."""
+
+    multithread = True
+
+    def __init__(self, host, port, app, workers, queue_depth):
+        super().__init__(host, port, app, handler=RequestHandler)
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._pending = queue.Queue(maxsize=queue_depth)
+        self._cond = threading.Condition()
+        self._outstanding = 0  # queued + in flight
+        self._busy = 0
+        self._served = 0
+        self._rejected = 0
+        self._threads = [threading.Thread(target=self._work, name=f'http-worker-{n}', daemon=True)
+                         for n in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def process_request(self, request, client_address):
+        """Runs on the accept loop: queue the connection for a worker, or turn it away."""
+        with self._cond:
+            self._outstanding += 1
+        try:
+            self._pending.put_nowait((request, client_address))
+        except queue.Full:
+            with self._cond:
+                self._outstanding -= 1
+                self._rejected += 1
+                self._cond.notify_all()
+            self._reject(request)
+
+    def _reject(self, request):
+        body = error_body(503, "Server busy; retry shortly")
+        head = (f"HTTP/1.0 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nRetry-After: {RETRY_AFTER}\r\n"
+                f"Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n").encode()
+        try:
+            request.setblocking(False)
+            try:
+                request.recv(65536)  # consume what already arrived so the close isn't a reset
+            except OSError:
+                pass
+            request.setblocking(True)
+            request.settimeout(1.0)
+            request.sendall(head + body)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _work(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            with self._cond:
+                self._busy += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._cond:
+                    self._busy -= 1
+                    self._served += 1
+                    self._outstanding -= 1
+                    self._cond.notify_all()
+
+    def drain(self, timeout):
+        """After the accept loop stops: waits for queued and in-flight requests, then stops the workers."""
+        with self._cond:
+            finished = self._cond.wait_for(lambda: self._outstanding == 0, timeout)
+        for _ in self._threads:
+            try:
+                self._pending.put_nowait(None)
+            except queue.Full:
+                break  # timed out with work still queued; the daemon workers die with the process
+        return finished
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'busy': self._busy,
+                'queued': self._outstanding - self._busy,
+                'queue_depth': self.queue_depth,
+                'served': self._served,
+                'rejected': self._rejected,
+            }
+
+
+def default_workers(server):
+    """
+    One worker per pooled HBase connection left after the background
+    holders (10 for the in-memory backend, which has no pool).
+    """
+    size = server.storage.stats().get('size')
+    if size is None:
+        return 10
+    return max(1, size - BACKGROUND_CONNECTIONS)
+
+
+def warm_search(server):
+    """Builds the search index off the request path, so the first /api/search doesn't pay for the scan."""
+    def build():
+        started = time.monotonic()
+        try:
+            server.SEARCH.ensure()
+        except Exception as e:
+            print(f"⚠️ Search index deferred to the first search: {e}")
+            return
+        print(f"🔎 Search index ready in {time.monotonic() - started:.1f}s: {server.SEARCH.stats()['students']} students")
+    threading.Thread(target=build, name='search-warmup', daemon=True).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API with bounded workers and backpressure.")
+    parser.add_argument('--host', default=os.environ.get('UNISEMI_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('UNISEMI_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=os.environ.get('UNISEMI_WORKERS'),
+                        help=f"worker threads (default: HBASE_POOL_SIZE - {BACKGROUND_CONNECTIONS})")
+    parser.add_argument('--queue-depth', type=int, default=os.environ.get('UNISEMI_QUEUE_DEPTH'),
+                        help="connections that may wait for a worker (default: 4 x workers)")
+    parser.add_argument('--route-limits', default=os.environ.get('UNISEMI_ROUTE_LIMITS', DEFAULT_ROUTE_LIMITS),
+                        help=f"endpoint=N,... (default {DEFAULT_ROUTE_LIMITS})")
+    parser.add_argument('--drain-timeout', type=float, default=float(os.environ.get('UNISEMI_DRAIN_TIMEOUT', 30)),
+                        help="seconds to let in-flight requests finish on shutdown")
+    parser.add_argument('--access-log', action='store_true', help="log every request")
+    args = parser.parse_args(argv)
+
+    import app as server
+    import metrics
+
+    workers = args.workers or default_workers(server)
+    pool_size = server.storage.stats().get('size')
+    if pool_size is not None and workers + BACKGROUND_CONNECTIONS > pool_size:
+        print(f"⚠️ {workers} workers + {BACKGROUND_CONNECTIONS} background connections exceed "
+              f"HBASE_POOL_SIZE={pool_size}; requests may queue for a connection")
+    queue_depth = args.queue_depth or 4 * workers
+    limiter = RouteLimiter(server.app, parse_limits(args.route_limits))
+    server.app.wsgi_app = limiter
+    RequestHandler.access_log = args.access_log
+    httpd = BoundedWSGIServer(args.host, args.port, server.app, workers, queue_depth)
+    metrics.REGISTRY.register(metrics.StatsGauges('unisemi_server', "HTTP worker pool", httpd.stats))
+    metrics.REGISTRY.register(metrics.StatsGauges('unisemi_route_limits', "Per-route limits", limiter.stats))
+
+    try:
+        server.ensure_schema()
+    except Exception as e:
+        print(f"⚠️ Schema bootstrap deferred until HBase is reachable: {e}")
+    server.HEALTH.status()  # first probe + start the background prober
+    warm_search(server)
+
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    accept_loop = threading.Thread(target=httpd.serve_forever, name='http-accept', daemon=True)
+    accept_loop.start()
+    print(f"🚀 Serving on {args.host}:{args.port} with {workers} workers, queue depth {queue_depth}, "
+          f"route limits {limiter.limits}")
+    while not stop.wait(1.0):
+        pass
+
+    print(f"🛑 Draining (up to {args.drain_timeout:g}s)...")
+    started = time.monotonic()
+    httpd.shutdown()      # stops the accept loop
+    httpd.server_close()  # closes the listening socket, so new clients are refused instead of left in the backlog
+    drained = httpd.drain(args.drain_timeout)
+    server.AUDIT.close()
+    server.HEALTH.close()
+    server.storage.close()
+    print(f"{'✅' if drained else '⚠️'} Stopped after {time.monotonic() - started:.1f}s: {httpd.stats()}")
+
+
+if __name__ == '__main__':
+    main()
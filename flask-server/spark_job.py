@@ -1,98 +1,301 @@
-import sys
+"""
+Table-wide CGPA recompute job.
+
+Re-grades every student from a snapshot of the `students` table using only
+native DataFrame expressions (no Python UDFs, no collect()), so the same job
+runs in local[*] on one machine and unchanged on a cluster.
+
+    # 1. Export the table (or use any NDJSON file with the same shape)
+    python spark_job.py snapshot students.ndjson
+
+    # 2. Recompute and either write corrected rows out or straight back to HBase
+    python spark_job.py recompute students.ndjson --output corrected/
+    python spark_job.py recompute students.ndjson --write-back
+    python spark_job.py recompute students.ndjson --write-back --scale "70:A:5,60:B:4,50:C:3,40:D:2,0:F:0"
+
+Snapshot lines look like the /api/results/<matric> response plus the row's
+write revision: {"matricNumber": ..., "name": ..., "department": ...,
+"academicHistory": [...], "rev": ...}. Write-back re-grades the stored
+semester cells in place (each course's grade and the semester GPA; codes,
+order and scores are kept) and is version checked like uploads (see
+writes.py): a student written since the snapshot, or mid-write, is skipped
+and counted, so rerun from a fresh snapshot to pick those up. Lines with
+no "rev" count as 0, i.e. never uploaded to through the API.
+After a write-back run `stats.py rebuild` and `indexes.py rebuild`, since
+CGPAs moved outside the API.
+"""
+import argparse
 import json
-import base64  # <--- CRITICAL IMPORT
-from pyspark.sql import SparkSession
-from pyspark.sql.types import StructType, StructField, StringType, IntegerType, ArrayType
+import os
+
+from grading import DEFAULT_UNIT, GradingScale, parse_bands
+
+WRITE_BATCH_SIZE = 1000
+TABLE_STUDENTS = 'students'
+# Shipped to executors so write-back needs only the storage layer, not Flask.
+EXECUTOR_MODULES = ('hbase_pool.py', 'metrics.py', 'storage.py', 'codec.py', 'records.py', 'grading.py',
+                    'writes.py')
+
+
+# --- SNAPSHOT (HBase -> NDJSON) ---
+def write_snapshot(path, batch_size=1000):
+    """Streams the students table into an NDJSON snapshot the recompute step can read."""
+    import app as server
+    import records
+    import writes
+
+    count = 0
+    with server.get_db(server.TABLE_STUDENTS) as table, open(path, 'w', encoding='utf-8') as out:
+        for key, row in table.scan(batch_size=batch_size):
+            out.write(json.dumps({
+                'matricNumber': key.decode('utf-8'),
+                'name': row.get(b'info:name', b'').decode('utf-8'),
+                'department': row.get(b'info:dept', b'').decode('utf-8'),
+                'academicHistory': records.assemble_history(row),
+                'rev': writes.counter_value(row, writes.COL_REV),
+            }) + '\n')
+            count += 1
+    return count
+
+
+# --- SPARK PIPELINE ---
+def snapshot_schema():
+    from pyspark.sql.types import ArrayType, LongType, StringType, StructField, StructType
+
+    # Courses are kept as their raw JSON text and parsed in recompute(), so a
+    # missing unit can be told apart from a null one, as grading.to_unit does.
+    semester = StructType([
+        StructField('level', StringType()), StructField('semester', StringType()),
+        StructField('courses', ArrayType(StringType())),
+    ])
+    return StructType([
+        StructField('matricNumber', StringType()), StructField('name', StringType()),
+        StructField('department', StringType()), StructField('academicHistory', ArrayType(semester)),
+        StructField('rev', LongType()),
+    ])
+
+def unit_column(course):
+    """
+    Course unit as a Column, matching grading.to_unit: missing -> DEFAULT_UNIT,
+    null / non-numeric / non-finite -> 0, otherwise truncated toward zero.
+    try_cast keeps one bad value from failing the job under ANSI mode.
+    """
+    from pyspark.sql import functions as F
+
+    unit = course['unit'].try_cast('double')
+    finite = unit.isNotNull() & ~F.isnan(unit) & (F.abs(unit) != F.lit(float('inf')))
+    return F.when(~F.map_contains_key(course, 'unit'), F.lit(DEFAULT_UNIT)) \
+        .when(finite, F.coalesce(unit.try_cast('long'), F.lit(0))) \
+        .otherwise(F.lit(0))
+
+def grade_columns(score, scale):
+    """(letter, point) Column expressions: a CASE WHEN chain over the scale's threshold table."""
+    from pyspark.sql import functions as F
+
+    letter = point = None
+    for minimum, band_letter, band_point in scale.bands:
+        cond = score >= F.lit(minimum)
+        letter = F.when(cond, F.lit(band_letter)) if letter is None else letter.when(cond, F.lit(band_letter))
+        point = F.when(cond, F.lit(band_point)) if point is None else point.when(cond, F.lit(band_point))
+    lowest_letter, lowest_point = scale.bands[-1][1], scale.bands[-1][2]
+    # Unparseable or below-scale scores fall to the bottom band, as in GradingScale.grade.
+    return letter.otherwise(F.lit(lowest_letter)), point.otherwise(F.lit(lowest_point))
+
+def recompute(df, scale):
+    """
+    Snapshot DataFrame -> one row per student with corrected totals:
+    matricNumber, rev, units, points, cgpa, latest_gpa,
+    semesters[{column, units, points, gpa, grades[{pos, grade}]}], where
+    `pos` is the course's index in its semester. The course records
+    themselves are only read; write-back applies the grades to them.
+    """
+    from pyspark.sql import functions as F
+    from pyspark.sql.types import MapType, StringType
+    from pyspark.sql.window import Window
+
+    df = df.withColumn('rev', F.coalesce(F.col('rev'), F.lit(0)))
+    semesters = df.select('matricNumber', 'rev', F.posexplode_outer('academicHistory').alias('pos', 'sem'))
+    courses = semesters.select(
+        'matricNumber', 'rev', 'pos',
+        F.col('sem.level').alias('level'), F.col('sem.semester').alias('semester'),
+        F.posexplode_outer('sem.courses').alias('course_pos', 'c'),
+    )
+    course = F.from_json(F.col('c'), MapType(StringType(), StringType()))
+    letter, point = grade_columns(course['score'].try_cast('double'), scale)
+    graded = courses.select(
+        'matricNumber', 'rev', 'pos', 'level', 'semester', 'course_pos',
+        unit_column(course).alias('unit'), point.alias('point'), letter.alias('grade'),
+        F.col('c').isNull().alias('empty'),
+    )
+    counted = F.when(~F.col('empty'), F.col('unit')).otherwise(F.lit(0))
+
+    per_semester = graded.groupBy('matricNumber', 'rev', 'pos', 'level', 'semester').agg(
+        F.sum(counted).alias('units'),
+        F.sum(counted * F.col('point')).alias('points'),
+        # sort_array orders the structs by their first field, the course position.
+        F.sort_array(F.collect_list(F.when(~F.col('empty'), F.struct(
+            F.col('course_pos').alias('pos'), 'grade')))).alias('grades'),
+    ).withColumn(
+        'gpa', F.format_number(F.when(F.col('units') > 0, F.col('points') / F.col('units')).otherwise(F.lit(0.0)), 2)
+    )
+    per_semester = per_semester.withColumn('cell', F.struct(
+        F.concat(F.lit('academic:'), F.col('level'), F.lit('_'), F.col('semester')).alias('column'),
+        'units', 'points', 'gpa', 'grades',
+    ))
 
-def calculate_gpa_spark(matric_number, history_json):
+    latest = Window.partitionBy('matricNumber').orderBy(F.col('pos').desc())
+    per_semester = per_semester.withColumn('latest_gpa', F.first('gpa').over(latest))
+
+    return per_semester.groupBy('matricNumber', 'rev').agg(
+        F.sum('units').alias('units'),
+        F.sum('points').alias('points'),
+        F.first('latest_gpa').alias('latest_gpa'),
+        F.collect_list(F.when(F.col('level').isNotNull(), F.col('cell'))).alias('semesters'),
+    ).withColumn(
+        'cgpa', F.format_number(F.when(F.col('units') > 0, F.col('points') / F.col('units')).otherwise(F.lit(0.0)), 2)
+    ).withColumn('latest_gpa', F.coalesce(F.col('latest_gpa'), F.lit('0.00')))
+
+
+# --- WRITE-BACK ---
+def totals_cells(row):
+    """info: cells a recompute writes for one result row."""
+    import records
+
+    return {
+        records.COL_UNITS: str(row['units']).encode(),
+        records.COL_POINTS: str(row['points']).encode(),
+        records.COL_SEMESTERS: str(len({cell['column'] for cell in row['semesters']})).encode(),
+        b'info:cgpa': row['cgpa'].replace(',', '').encode(),
+        b'info:gpa': row['latest_gpa'].replace(',', '').encode(),
+    }
+
+def regrade_semester(sem, cell):
+    """Stored semester `sem` with the grades and GPA of its recomputed `cell`; codes, order and scores are kept."""
+    grades = {grade['pos']: grade['grade'] for grade in cell['grades']}
+    courses = [dict(course, grade=grades[i]) if isinstance(course, dict) and i in grades else course
+               for i, course in enumerate(sem.get('courses') or [])]
+    return dict(sem, courses=courses, gpa=cell['gpa'].replace(',', ''))
+
+def semester_cells(stored, row):
+    """Re-graded academic: cells for a stored row: each semester cell, or the legacy history blob."""
+    import records
+
+    recomputed = {cell['column'].encode(): cell for cell in row['semesters']}
+    if records.LEGACY_HISTORY in stored:
+        history = records.assemble_history(stored)
+        for i, sem in enumerate(history):
+            cell = recomputed.get(records.semester_column(sem.get('level'), sem.get('semester')))
+            if cell is not None:
+                history[i] = regrade_semester(sem, cell)
+        return {records.LEGACY_HISTORY: json.dumps(history).encode()}
+    return {column: records.encode_semester(regrade_semester(records.decode_semester(stored[column]), cell))
+            for column, cell in recomputed.items() if column in stored}
+
+def write_rows(table, rows, writer=None, batch_size=WRITE_BATCH_SIZE):
     """
-    Uses Apache Spark to calculate CGPA.
-    In a real cluster, this would split the work across 100 computers.
+    Writes recomputed grades and totals for `rows`, a chunk at a time, and
+    returns {'written', 'skipped'}. Students deleted since the snapshot are
+    left alone; ones whose info:rev moved since the snapshot, or that
+    `writer` (a writes.VersionedWriter) can't claim, are skipped. Rows still
+    holding the legacy academic:history blob get their CGPA, GPA and blob;
+    their totals are derived when they are migrated or first uploaded to.
     """
-    # 1. Initialize Spark (Suppressing excessive logs)
+    import records
+    import writes
+
+    writer = writer or writes.VersionedWriter()
+    report = {'written': 0, 'skipped': 0}
+    rows = iter(rows)
+    while True:
+        chunk = [row for _, row in zip(range(batch_size), rows)]
+        if not chunk:
+            return report
+        keys = [row['matricNumber'].encode() for row in chunk]
+        columns = {cell['column'].encode() for row in chunk for cell in row['semesters']}
+        stored = dict(table.rows(keys, columns=[b'info', records.LEGACY_HISTORY] + sorted(columns)))
+        claimed, written = [], False
+        try:
+            with table.batch(batch_size=batch_size) as batch:
+                for key, row in zip(keys, chunk):
+                    if key not in stored:
+                        continue
+                    current = stored[key]
+                    if writes.counter_value(current, writes.COL_REV) != row['rev'] \
+                            or not writer.claim(table, key, current):
+                        report['skipped'] += 1
+                        continue
+                    claimed.append(key)
+                    cells = totals_cells(row)
+                    if records.COL_UNITS in current:
+                        cells = records.summarise(cells, 'recompute')
+                    else:
+                        cells = {column: cells[column] for column in (b'info:cgpa', b'info:gpa')}
+                    cells.update(semester_cells(current, row))
+                    batch.put(key, cells)
+            written = True
+        finally:
+            for key in claimed:
+                writer.release(table, key, written)
+        report['written'] += len(claimed)
+
+def write_partition(rows):
+    """Runs on each executor: one pooled connection, batched puts for the partition; yields its report."""
+    from storage import make_storage
+
+    storage = make_storage()
+    try:
+        with storage.table(TABLE_STUDENTS) as table:
+            yield write_rows(table, rows)
+    finally:
+        storage.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute grades, GPAs and CGPAs for the whole registry.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    snap = sub.add_parser('snapshot', help="export the students table to NDJSON")
+    snap.add_argument('path')
+    run = sub.add_parser('recompute', help="re-grade a snapshot with Spark")
+    run.add_argument('input', help="NDJSON snapshot file or directory (any Spark-readable path)")
+    run.add_argument('--output', help="write corrected rows here as JSON")
+    run.add_argument('--write-back', action='store_true', help="write corrected rows to HBase in batches")
+    run.add_argument('--scale', help="grading scale 'min:letter:point,...' (default: UNISEMI_GRADING_SCALE or 70:A:5,60:B:4,50:C:3,45:D:2,0:F:0)")
+    run.add_argument('--master', default='local[*]', help="Spark master (default local[*])")
+    args = parser.parse_args(argv)
+
+    if args.command == 'snapshot':
+        print(f"✅ Wrote {write_snapshot(args.path)} students to {args.path}")
+        return
+    if not args.output and not args.write_back:
+        parser.error("recompute needs --output and/or --write-back")
+
+    from pyspark.sql import SparkSession
+
     spark = SparkSession.builder \
-        .appName("Student_CGPA_Processor") \
-        .master("local[*]") \
+        .appName("Student_CGPA_Recompute") \
+        .master(args.master) \
         .config("spark.ui.showConsoleProgress", "false") \
         .getOrCreate()
-
-    # Set log level to ERROR to keep output clean for our Python script to read
     spark.sparkContext.setLogLevel("ERROR")
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in EXECUTOR_MODULES:
+        spark.sparkContext.addPyFile(os.path.join(here, module))
 
     try:
-        # 2. Convert JSON history into a Spark DataFrame
-        # We flatten the structure: One row per course
-        data = []
-        try:
-            history = json.loads(history_json)
-        except json.JSONDecodeError:
-            return 0.0
-        
-        for semester in history:
-            for course in semester.get('courses', []):
-                try:
-                    data.append({
-                        'score': int(course.get('score', 0)),
-                        'unit': int(course.get('unit', 0))
-                    })
-                except:
-                    continue
-
-        if not data:
-            return 0.0
-
-        # Create DataFrame
-        rdd = spark.sparkContext.parallelize(data)
-        # Define schema explicitly to avoid inference overhead/errors on empty data
-        schema = StructType([
-            StructField("score", IntegerType(), True),
-            StructField("unit", IntegerType(), True)
-        ])
-        df = spark.createDataFrame(rdd, schema)
-
-        # 3. Define Grading Logic 
-        def get_points(score):
-            if score >= 70: return 5
-            elif score >= 60: return 4
-            elif score >= 50: return 3
-            elif score >= 45: return 2
-            else: return 0
-
-        # Calculate Points locally for this small batch 
-        total_units = 0
-        total_points = 0
-        
-        rows = df.collect()
-        for row in rows:
-            u = row['unit']
-            s = row['score']
-            p = get_points(s)
-            total_units += u
-            total_points += (u * p)
-
-        cgpa = total_points / total_units if total_units > 0 else 0.0
-        return round(cgpa, 2)
-
-    except Exception as e:
-        # If Spark fails, we print to stderr so we can debug, but return 0.0 to app
-        sys.stderr.write(f"Spark Job Error: {str(e)}\n")
-        return 0.0
-        
+        scale = GradingScale(parse_bands(args.scale)) if args.scale else GradingScale.from_env()
+        result = recompute(spark.read.schema(snapshot_schema()).json(args.input), scale)
+        if args.output:
+            result.write.mode('overwrite').json(args.output)
+            print(f"✅ Corrected rows written to {args.output}")
+        if args.write_back:
+            reports = result.rdd.mapPartitions(write_partition).collect()
+            written, skipped = (sum(r[k] for r in reports) for k in ('written', 'skipped'))
+            print(f"✅ {written} corrected rows written back to HBase — now run `stats.py rebuild` and `indexes.py rebuild`")
+            if skipped:
+                print(f"⚠️ {skipped} students changed since the snapshot were skipped; snapshot again and rerun for them")
     finally:
         spark.stop()
 
+
 if __name__ == "__main__":
-    # Command Line Arguments: python spark_job.py [MATRIC] [BASE64_DATA]
-    if len(sys.argv) > 2:
-        matric = sys.argv[1]
-        raw_data = sys.argv[2]
-        
-        try:
-            # --- THE FIX: Decode Base64 back to JSON String ---
-            history_json = base64.b64decode(raw_data).decode('utf-8')
-            
-            result = calculate_gpa_spark(matric, history_json)
-            print(result) # Only print the number!
-        except Exception as e:
-            # Fallback
-            print(0.0)
\ No newline at end of file
+    main()
@@ -0,0 +1,188 @@
+"""
+Incrementally maintained registry statistics.
+
+The `student_stats` table holds one row for the whole registry and one row
+per department, each with HBase counters:
+
+    agg:count      number of students
+    agg:cgpa_sum   sum of CGPAs in hundredths (counters are integers)
+    agg:bNNN       students whose CGPA is NNN/100 — a 501-bucket histogram,
+                   so the maximum survives deletes without a rescan
+    agg:name       (department rows) display spelling, taken from a student in it
+
+Department rows are keyed case- and whitespace-insensitively, the same way
+indexes.py keys its department entries, so "Computer Science" and
+"computer science " share one row.
+
+save_result/delete_student feed old and new (department, cgpa) pairs into
+`record_change`, so dashboards read a handful of rows no matter how many
+students exist. Concurrent edits of the same student can still race; run
+`python stats.py rebuild` to recompute everything from a scan.
+"""
+import struct
+import sys
+
+TABLE_STATS = 'student_stats'
+STATS_FAMILIES = {'agg': {'max_versions': 1}}
+
+ALL_ROW = b'all'
+DEPT_PREFIX = b'dept:'
+COL_COUNT = b'agg:count'
+COL_SUM = b'agg:cgpa_sum'
+COL_NAME = b'agg:name'
+BUCKET_PREFIX = b'agg:b'
+MAX_BUCKET = 500  # CGPA 5.00
+
+
+def cgpa_hundredths(cgpa):
+    """'3.47' -> 347, clamped to the 0.00-5.00 scale."""
+    try:
+        value = int(round(float(cgpa) * 100))
+    except (TypeError, ValueError):
+        value = 0
+    return min(max(value, 0), MAX_BUCKET)
+
+def bucket_column(hundredths):
+    return BUCKET_PREFIX + b'%03d' % hundredths
+
+def department_key(department):
+    """Case- and whitespace-insensitive department identity (indexes.dept_token builds on it)."""
+    return department.strip().lower()
+
+def dept_row(department):
+    return DEPT_PREFIX + department_key(department).encode()
+
+
+# --- INCREMENTAL UPDATES ---
+def _deltas(old, new):
+    """{row: {column: delta}} for a student moving from `old` to `new` ((dept, cgpa) or None)."""
+    deltas = {}
+
+    def add(row, column, amount):
+        if amount:
+            cols = deltas.setdefault(row, {})
+            cols[column] = cols.get(column, 0) + amount
+
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        department, cgpa = state
+        hundredths = cgpa_hundredths(cgpa)
+        rows = [ALL_ROW] + ([dept_row(department)] if department_key(department) else [])
+        for row in rows:
+            add(row, COL_COUNT, sign)
+            add(row, COL_SUM, sign * hundredths)
+            add(row, bucket_column(hundredths), sign)
+    # Drop columns whose old and new contributions cancel out (e.g. same dept, same bucket).
+    return {row: {c: d for c, d in cols.items() if d} for row, cols in deltas.items()}
+
+def record_change(stats_table, old, new):
+    """Applies one student's change to the counters; a no-op when nothing aggregated moved."""
+    record_changes(stats_table, [(old, new)])
+
+def _names(states):
+    """{department row: display name} for the departments in `states`."""
+    names = {}
+    for state in states:
+        if state is not None and department_key(state[0]):
+            names.setdefault(dept_row(state[0]), state[0].strip())
+    return names
+
+def record_changes(stats_table, changes):
+    """
+    Applies many (old, new) changes with one increment per counter that
+    actually moved, and names department rows that gained students.
+    """
+    merged = {}
+    for old, new in changes:
+        for row, cols in _deltas(old, new).items():
+            target = merged.setdefault(row, {})
+            for column, delta in cols.items():
+                target[column] = target.get(column, 0) + delta
+    for row, cols in merged.items():
+        for column, delta in cols.items():
+            if delta:
+                stats_table.counter_inc(row, column, delta)
+    for row, name in _names(new for _, new in changes).items():
+        if merged.get(row, {}).get(COL_COUNT, 0) > 0:
+            stats_table.put(row, {COL_NAME: name.encode()})
+
+
+# --- READS ---
+def _counter(data, column):
+    raw = data.get(column)
+    return struct.unpack('>q', raw)[0] if raw else 0
+
+def _decode(data):
+    count = _counter(data, COL_COUNT)
+    sum_ = _counter(data, COL_SUM)
+    highest = None
+    # Zero-padded bucket names sort numerically; the first non-empty one from the top is the max.
+    for column in sorted((c for c in data if c.startswith(BUCKET_PREFIX)), reverse=True):
+        if _counter(data, column) > 0:
+            highest = int(column[len(BUCKET_PREFIX):])
+            break
+    return {
+        'total': count,
+        'avgCGPA': "{:.2f}".format(sum_ / count / 100) if count > 0 else "0.00",
+        'highestCGPA': "{:.2f}".format(highest / 100) if highest is not None and count > 0 else "0.00",
+    }
+
+def read_stats(stats_table):
+    """Registry-wide and per-department totals from O(#departments) stored rows."""
+    result = _decode(stats_table.row(ALL_ROW))
+    departments = []
+    for key, data in stats_table.scan(row_prefix=DEPT_PREFIX):
+        entry = _decode(data)
+        if entry['total'] > 0:
+            entry['department'] = (data.get(COL_NAME) or key[len(DEPT_PREFIX):]).decode('utf-8')
+            departments.append(entry)
+    result['departments'] = departments
+    return result
+
+
+# --- REPAIR ---
+def rebuild(students_table, stats_table, batch_size=1000):
+    """
+    Recomputes every counter from an info:-only scan of the students table.
+    The new rows are written before anything stale is deleted, so readers
+    never see the departments disappear mid-rebuild.
+    """
+    totals, states = {}, []
+    scanned = 0
+    for _, data in students_table.scan(columns=[b'info:dept', b'info:cgpa'], batch_size=batch_size):
+        state = (data.get(b'info:dept', b'').decode('utf-8'), data.get(b'info:cgpa', b'0.00').decode('utf-8'))
+        for row, cols in _deltas(None, state).items():
+            target = totals.setdefault(row, {})
+            for column, delta in cols.items():
+                target[column] = target.get(column, 0) + delta
+        states.append(state)
+        scanned += 1
+    names = _names(states)
+
+    old = {key: set(data) for key, data in stats_table.scan()}
+    with stats_table.batch(batch_size=batch_size) as batch:
+        for row, cols in totals.items():
+            cells = {column: struct.pack('>q', value) for column, value in cols.items()}
+            if row in names:
+                cells[COL_NAME] = names[row].encode()
+            batch.put(row, cells)
+    with stats_table.batch(batch_size=batch_size) as batch:
+        for key, columns in old.items():
+            if key not in totals:
+                batch.delete(key)
+            else:
+                stale = columns - set(totals[key]) - ({COL_NAME} if key in names else set())
+                if stale:
+                    batch.delete(key, columns=sorted(stale))
+    return scanned
+
+
+if __name__ == '__main__':
+    # Usage: python stats.py rebuild
+    if sys.argv[1:] != ['rebuild']:
+        sys.exit("Usage: python stats.py rebuild")
+    import app as server
+    with server.get_dbs(server.TABLE_STUDENTS, server.TABLE_STATS) as (students, stats_table):
+        count = rebuild(students, stats_table)
+    print(f"✅ Rebuilt statistics from {count} students")
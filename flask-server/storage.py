@@ -0,0 +1,392 @@
+"""
+Storage backends for the Flask server.
+
+Both backends hand out happybase-compatible connection and table objects, so
+route code is written once against the happybase API:
+
+    with storage.table('students') as table:
+        table.row(b'CSC/2020/001')
+
+`HappyBaseStorage` talks to a real HBase Thrift server through the shared
+connection pool. `MemoryStorage` is an in-process stand-in that models the
+parts of HBase the app relies on (sorted row keys, column families, cell
+versions) for local development, profiling and benchmarks.
+"""
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+
+import metrics
+from hbase_pool import ConnectionPool
+
+DEFAULT_HBASE_HOST = '10.47.246.170'
+DEFAULT_HBASE_PORT = 9090
+
+# Thrift's ColumnDescriptor default when a family doesn't set max_versions.
+DEFAULT_MAX_VERSIONS = 3
+
+
+def row_prefix_stop(prefix):
+    """Smallest key greater than every key starting with `prefix` (happybase's str_increment)."""
+    for i in range(len(prefix) - 1, -1, -1):
+        if prefix[i] != 0xFF:
+            return prefix[:i] + bytes([prefix[i] + 1])
+    return None
+
+
+# --- HAPPYBASE BACKEND ---
+class HappyBaseStorage:
+    def __init__(self, host=DEFAULT_HBASE_HOST, port=DEFAULT_HBASE_PORT, pool_size=10,
+                 transport='buffered', protocol='binary', timeout=5000):
+        import happybase
+
+        def connect():
+            with metrics.storage_op('connect'):
+                return happybase.Connection(
+                    host, port=port, timeout=timeout,
+                    transport=transport, protocol=protocol, autoconnect=True
+                )
+
+        self.host = host
+        self.port = port
+        self.pool = ConnectionPool(connect, size=pool_size)
+
+    @contextmanager
+    def connection(self):
+        with self.pool.connection() as connection:
+            yield connection
+
+    @contextmanager
+    def table(self, name):
+        with self.pool.connection() as connection:
+            yield connection.table(name)
+
+    def stats(self):
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close()
+
+
+# --- IN-MEMORY BACKEND ---
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class MemoryBatch:
+    """Buffers mutations like happybase.Batch and applies them on send()."""
+
+    def __init__(self, table, timestamp=None, batch_size=None):
+        self._table = table
+        self._timestamp = timestamp
+        self._batch_size = batch_size
+        self._mutations = []
+
+    def put(self, row, data, wal=None):
+        self._mutations.append(('put', row, data))
+        self._maybe_send()
+
+    def delete(self, row, columns=None, wal=None):
+        self._mutations.append(('delete', row, columns))
+        self._maybe_send()
+
+    def _maybe_send(self):
+        if self._batch_size and len(self._mutations) >= self._batch_size:
+            self.send()
+
+    def send(self):
+        mutations, self._mutations = self._mutations, []
+        for op, row, payload in mutations:
+            if op == 'put':
+                self._table.put(row, payload, timestamp=self._timestamp)
+            else:
+                self._table.delete(row, columns=payload, timestamp=self._timestamp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.send()
+
+
+class MemoryTable:
+    """
+    A happybase.Table look-alike.
+
+    Rows are kept in a sorted key list next to a dict of
+    {column: [(timestamp, value), ...]} with versions newest-first and
+    trimmed to the family's max_versions, like an HBase store.
+    """
+
+    def __init__(self, name, families):
+        self.name = name
+        self.families = {f.encode() if isinstance(f, str) else f: dict(opts or {})
+                         for f, opts in families.items()}
+        self._keys = []
+        self._rows = {}
+        self._lock = threading.RLock()
+
+    # --- helpers ---
+    def _max_versions(self, column):
+        family = column[:column.find(b':')] if b':' in column else column
+        opts = self.families.get(family)
+        if opts is None:
+            raise ValueError(f"Unknown column family {family!r} in table {self.name!r}")
+        return opts.get('max_versions', DEFAULT_MAX_VERSIONS)
+
+    @staticmethod
+    def _wanted(columns):
+        if not columns:
+            return None
+        return [c.encode() if isinstance(c, str) else c for c in columns]
+
+    @staticmethod
+    def _matches(column, wanted):
+        if wanted is None:
+            return True
+        for w in wanted:
+            if column == w or (b':' not in w and column.split(b':', 1)[0] == w):
+                return True
+        return False
+
+    def _project(self, cells, columns, timestamp, include_timestamp):
+        out = {}
+        if columns is not None and all(b':' in c for c in columns):
+            selected = ((c, cells[c]) for c in columns if c in cells)  # direct lookups, no family sweep
+        else:
+            selected = ((c, v) for c, v in cells.items() if self._matches(c, columns))
+        for column, versions in selected:
+            for ts, value in versions:
+                if timestamp is None or ts < timestamp:
+                    out[column] = (value, ts) if include_timestamp else value
+                    break
+        return out
+
+    # --- reads ---
+    def row(self, row, columns=None, timestamp=None, include_timestamp=False):
+        with self._lock:
+            cells = self._rows.get(row)
+            if not cells:
+                return {}
+            return self._project(cells, self._wanted(columns), timestamp, include_timestamp)
+
+    def rows(self, rows, columns=None, timestamp=None, include_timestamp=False):
+        wanted = self._wanted(columns)
+        result = []
+        with self._lock:
+            for key in rows:
+                cells = self._rows.get(key)
+                if cells:
+                    data = self._project(cells, wanted, timestamp, include_timestamp)
+                    if data:
+                        result.append((key, data))
+        return result
+
+    def cells(self, row, column, versions=None, timestamp=None, include_timestamp=False):
+        with self._lock:
+            stored = self._rows.get(row, {}).get(column, [])
+            found = [(v, ts) for ts, v in stored if timestamp is None or ts < timestamp]
+        if versions is not None:
+            found = found[:versions]
+        return found if include_timestamp else [v for v, _ in found]
+
+    def scan(self, row_start=None, row_stop=None, row_prefix=None, columns=None,
+             filter=None, timestamp=None, include_timestamp=False, batch_size=1000,
+             scan_batching=None, limit=None, sorted_columns=False, reverse=False):
+        if filter is not None:
+            raise NotImplementedError("MemoryTable does not evaluate HBase filter strings")
+        if row_prefix is not None:
+            if row_start is not None or row_stop is not None:
+                raise TypeError("'row_prefix' cannot be combined with 'row_start' or 'row_stop'")
+            if reverse:
+                row_start, row_stop = row_prefix_stop(row_prefix), row_prefix
+            else:
+                row_start, row_stop = row_prefix, row_prefix_stop(row_prefix)
+        if batch_size < 1:
+            raise ValueError("'batch_size' must be >= 1")
+        wanted = self._wanted(columns)
+
+        returned = 0
+        last = None
+        while True:
+            # Pull one scanner batch at a time so concurrent writers are never blocked for long.
+            with self._lock:
+                keys = self._keys
+                if not reverse:
+                    lo = bisect_right(keys, last) if last is not None else (
+                        bisect_left(keys, row_start) if row_start is not None else 0)
+                    hi = bisect_left(keys, row_stop) if row_stop is not None else len(keys)
+                    chunk = keys[lo:min(hi, lo + batch_size)]
+                else:
+                    # Reverse scans run from row_start (inclusive) down to row_stop (exclusive).
+                    hi = bisect_left(keys, last) if last is not None else (
+                        bisect_right(keys, row_start) if row_start is not None else len(keys))
+                    lo = bisect_right(keys, row_stop) if row_stop is not None else 0
+                    chunk = keys[max(lo, hi - batch_size):hi][::-1]
+                batch = []
+                for key in chunk:
+                    data = self._project(self._rows[key], wanted, timestamp, include_timestamp)
+                    if data:
+                        batch.append((key, data))
+            if not chunk:
+                return
+            last = chunk[-1]
+            for key, data in batch:
+                yield key, (dict(sorted(data.items())) if sorted_columns else data)
+                returned += 1
+                if limit is not None and returned >= limit:
+                    return
+
+    # --- writes ---
+    def put(self, row, data, timestamp=None, wal=True):
+        ts = timestamp if timestamp is not None else _now_ms()
+        with self._lock:
+            cells = self._rows.get(row)
+            if cells is None:
+                cells = self._rows[row] = {}
+                insort(self._keys, row)
+            for column, value in data.items():
+                max_versions = self._max_versions(column)
+                versions = cells.get(column)
+                if not versions:
+                    cells[column] = [(ts, value)]
+                elif ts > versions[0][0]:  # common case: newest write
+                    versions.insert(0, (ts, value))
+                    del versions[max_versions:]
+                else:
+                    versions = [(t, v) for t, v in versions if t != ts]
+                    versions.append((ts, value))
+                    versions.sort(key=lambda tv: tv[0], reverse=True)
+                    cells[column] = versions[:max_versions]
+
+    def delete(self, row, columns=None, timestamp=None, wal=True):
+        with self._lock:
+            cells = self._rows.get(row)
+            if cells is None:
+                return
+            wanted = self._wanted(columns)
+            for column in list(cells):
+                if not self._matches(column, wanted):
+                    continue
+                if timestamp is None:
+                    del cells[column]
+                else:
+                    kept = [(t, v) for t, v in cells[column] if t > timestamp]
+                    if kept:
+                        cells[column] = kept
+                    else:
+                        del cells[column]
+            if not cells:
+                del self._rows[row]
+                del self._keys[bisect_left(self._keys, row)]
+
+    def batch(self, timestamp=None, batch_size=None, transaction=False, wal=True):
+        return MemoryBatch(self, timestamp=timestamp, batch_size=batch_size)
+
+    # --- counters (8-byte big-endian, same encoding as HBase increments) ---
+    def counter_get(self, row, column):
+        return self.counter_inc(row, column, value=0)
+
+    def counter_set(self, row, column, value=0):
+        self.put(row, {column: struct.pack('>q', value)})
+
+    def counter_inc(self, row, column, value=1):
+        with self._lock:
+            current = self.row(row, columns=[column]).get(column)
+            total = (struct.unpack('>q', current)[0] if current else 0) + value
+            if value:
+                self.put(row, {column: struct.pack('>q', total)})
+            return total
+
+    def counter_dec(self, row, column, value=1):
+        return self.counter_inc(row, column, -value)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+
+class MemoryConnection:
+    """happybase.Connection look-alike over a shared MemoryStorage."""
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def tables(self):
+        with self._storage._lock:
+            return sorted(name.encode() for name in self._storage._tables)
+
+    def table(self, name):
+        with self._storage._lock:
+            try:
+                return self._storage._tables[name]
+            except KeyError:
+                raise LookupError(f"Table {name!r} does not exist") from None
+
+    def create_table(self, name, families):
+        with self._storage._lock:
+            if name in self._storage._tables:
+                raise ValueError(f"Table {name!r} already exists")
+            self._storage._tables[name] = MemoryTable(name, families)
+
+    def delete_table(self, name, disable=False):
+        with self._storage._lock:
+            self._storage._tables.pop(name, None)
+
+    def disable_table(self, name):
+        pass
+
+    def enable_table(self, name):
+        pass
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryStorage:
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.RLock()
+        self._checkouts = 0
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            self._checkouts += 1
+        yield MemoryConnection(self)
+
+    @contextmanager
+    def table(self, name):
+        with self.connection() as connection:
+            yield connection.table(name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'checkouts': self._checkouts,
+                'tables': {name: len(t) for name, t in self._tables.items()},
+            }
+
+    def close(self):
+        pass
+
+
+def make_storage(backend=None):
+    """Builds the backend named by UNISEMI_STORAGE ('hbase' or 'memory')."""
+    backend = backend or os.environ.get('UNISEMI_STORAGE', 'hbase')
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'hbase':
+        return HappyBaseStorage(
+            host=os.environ.get('HBASE_HOST', DEFAULT_HBASE_HOST),
+            port=int(os.environ.get('HBASE_PORT', DEFAULT_HBASE_PORT)),
+            pool_size=int(os.environ.get('HBASE_POOL_SIZE', 10)),
+        )
+    raise ValueError(f"Unknown storage backend {backend!r}")
@@ -1,87 +1,477 @@
-import happybase
-import time
+"""
+Mixed-workload load generator.
+
+Drives a mix of transcript lookups, result uploads, student listings and
+audit-log reads from several worker processes (each running a few threads)
+against either the HTTP API or the storage layer directly, and reports
+per-operation p50/p95/p99 latency, throughput and error rates.
+
+    python stress.py seed --students 20000
+    python stress.py seed --target http --url http://localhost:5000 --students 20000
+    python stress.py run --target http --url http://localhost:5000 --students 20000 \\
+        --processes 4 --threads 8 --duration 60 --mix lookup=70,upload=10,list=15,logs=5 --json run.json
+    python stress.py run --students 20000 --json after.json --baseline run.json
+
+Seeded students have 8-10 semesters of 6-10 courses, scored around a
+per-student ability so CGPAs spread out and transcripts are production
+sized. Matric numbers look like real ones (CSC20190004217), and the student
+each request touches is drawn from a Zipf distribution (--zipf s) over a
+shuffled ranking, so a few students are hot without sitting next to each
+other in key order. `run --students` must match what was seeded.
+
+The storage target makes the same storage calls as the routes, without
+HTTP and Flask. With UNISEMI_STORAGE=memory there is nothing to share
+between processes, so `run` seeds the registry in the parent and forks the
+workers, each of which then works on its own copy.
+
+The JSON report (--json) holds the configuration and per-operation numbers;
+--baseline prints the change against an earlier report.
+"""
+import argparse
+import http.client
 import json
+import math
+import multiprocessing
+import os
 import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+from urllib.parse import urlencode, urlsplit
+
+import audit
+import indexes
+import records
+import stats
 
 # --- CONFIGURATION ---
-HBASE_HOST = '10.47.246.170'  # YOUR SERVER IP
-HBASE_PORT = 9090
-TABLE_NAME = 'students'
-TOTAL_STUDENTS = 100000  # Number of records to insert
-
-def get_connection():
-    try:
-        return happybase.Connection(
-            HBASE_HOST, 
-            port=HBASE_PORT, 
-            transport='buffered', 
-            protocol='binary',
-            timeout=10000
-        )
-    except Exception as e:
-        print(f"❌ Connection Error: {e}")
-        return None
-
-def run_stress_test():
-    print(f"🚀 STARTING STRESS TEST: {TOTAL_STUDENTS} Records target...")
-    print(f"   Target Server: {HBASE_HOST}")
-    
-    conn = get_connection()
-    if not conn: return
-
-    try:
-        table = conn.table(TABLE_NAME)
-        
-        # --- START TIMER ---
-        start_time = time.time()
-        print(f"   ⏱️  Timer Started at: {time.strftime('%H:%M:%S', time.localtime(start_time))}")
-
-        # Use batch for speed (sends data in packets rather than 1 by 1)
-        batch = table.batch()
-        
-        for i in range(TOTAL_STUDENTS):
-            matric = f"STRESS-TEST-{i:04d}" # e.g., STRESS-TEST-0050
-            
-            # Randomize some data to make it realistic
-            gpa = round(random.uniform(1.0, 5.0), 2)
-            
-            data = {
-                b'info:name': f"Generated Student {i}".encode(),
-                b'info:dept': b"Stress Analysis Dept",
-                b'info:gpa': str(gpa).encode(),
-                b'info:cgpa': str(gpa).encode(),
-                b'academic:history': json.dumps([]).encode()
-            }
-            
-            batch.put(matric.encode(), data)
-            
-            # Print a dot every 100 records so you know it's working
-            if i > 0 and i % 100 == 0:
-                print(".", end="", flush=True)
-
-        # Send all remaining data
-        batch.send()
-        print(" Done!")
-
-        # --- STOP TIMER ---
-        end_time = time.time()
-        
-        # --- CALCULATE STATS ---
-        duration = end_time - start_time
-        speed = TOTAL_STUDENTS / duration
-
-        print(f"\n{'='*40}")
-        print(f"✅ STRESS TEST COMPLETED SUCCESSFULLY")
-        print(f"{'='*40}")
-        print(f"📊 Total Records : {TOTAL_STUDENTS}")
-        print(f"⏱️  Time Taken    : {round(duration, 4)} seconds")
-        print(f"🚀 Speed         : {int(speed)} records/second")
-        print(f"{'='*40}")
-
-    except Exception as e:
-        print(f"\n❌ Test Failed: {e}")
-    finally:
-        conn.close()
-
-if __name__ == "__main__":
-    run_stress_test()
\ No newline at end of file
+OPERATIONS = ('lookup', 'upload', 'list', 'logs')
+DEFAULT_MIX = 'lookup=70,upload=10,list=15,logs=5'
+DEPARTMENTS = [
+    ('CSC', 'Computer Science'), ('MTH', 'Mathematics'), ('PHY', 'Physics'),
+    ('CHM', 'Chemistry'), ('ECO', 'Economics'), ('MEE', 'Mechanical Engineering'),
+    ('EEE', 'Electrical Engineering'), ('LAW', 'Law'), ('MED', 'Medicine'), ('ACC', 'Accounting'),
+]
+LEVELS = ['100', '200', '300', '400', '500']
+SEMESTERS = ['First', 'Second']
+UNITS = [1, 2, 3, 3, 3, 4]
+LIST_PAGE_SIZE = 50
+LOG_PAGE_SIZE = 50
+SEED_CHUNK_RECORDS = 20000   # course records per bulk upload request when seeding over HTTP
+SEED_LOG_DAYS = 30
+STARTUP_GRACE = 2.0          # seconds for every worker to start before the clock does
+
+
+# --- DATA GENERATION ---
+def make_matric(i):
+    code, _ = DEPARTMENTS[i % len(DEPARTMENTS)]
+    return f"{code}{2015 + i % 8}{i:07d}"
+
+def identity(i):
+    """(matric, name, department code, department) for student i."""
+    code, dept = DEPARTMENTS[i % len(DEPARTMENTS)]
+    return make_matric(i), f"Student {i}", code, dept
+
+def make_semester(rng, code, index, ability):
+    """Semester `index` (0 = 100 level First) with 6-10 courses scored around `ability`."""
+    level, semester = LEVELS[index // 2 % len(LEVELS)], SEMESTERS[index % 2]
+    return {'level': level, 'semester': semester, 'courses': [{
+        'code': f"{code}{level[0]}{n + 10 * (index % 2):02d}",
+        'score': max(0, min(100, round(rng.gauss(ability, 12)))),
+        'unit': rng.choice(UNITS),
+    } for n in range(1, rng.randint(6, 10) + 1)]}
+
+def make_student(seed, i):
+    """(matric, name, department, history) for student i; the same in every process."""
+    rng = random.Random(f"{seed}-student-{i}")
+    matric, name, code, dept = identity(i)
+    ability = rng.gauss(58, 10)
+    history = [make_semester(rng, code, s, ability) for s in range(rng.randint(8, 10))]
+    return matric, name, dept, history
+
+
+class ZipfKeys:
+    """Student indexes with Zipf(s) popularity over a shuffled ranking; s=0 is uniform."""
+
+    def __init__(self, students, s, seed):
+        self.ranking = list(range(students))
+        random.Random(f"{seed}-ranking").shuffle(self.ranking)
+        self.cumulative = list(accumulate(1 / rank ** s for rank in range(1, students + 1)))
+
+    def sample(self, rng):
+        rank = bisect_left(self.cumulative, rng.random() * self.cumulative[-1])
+        return self.ranking[min(rank, len(self.ranking) - 1)]
+
+
+# --- TARGETS ---
+class HttpTarget:
+    """One keep-alive connection per thread; errors are labelled 'HTTP <status>' or the exception name."""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.base = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._connection = None
+
+    def request(self, method, path, body=None, content_type='application/json'):
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {'Content-Type': content_type} if body is not None else {}
+        try:
+            self._connection.request(method, self.base + path, body, headers)
+            response = self._connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self._connection.close()
+            self._connection = None
+            raise
+        return f"HTTP {response.status}" if response.status >= 400 else None
+
+    def lookup(self, matric):
+        return self.request('GET', f'/api/results/{matric}')
+
+    def upload(self, matric, name, department, semester):
+        return self.request('POST', '/api/results', json.dumps(
+            {'matricNumber': matric, 'name': name, 'department': department, **semester}))
+
+    def list(self, start_after):
+        return self.request('GET', '/api/students?' + urlencode({'limit': LIST_PAGE_SIZE, 'start_after': start_after}))
+
+    def logs(self, from_ms):
+        query = {'limit': LOG_PAGE_SIZE, **({'from': from_ms} if from_ms else {})}
+        return self.request('GET', '/api/logs?' + urlencode(query))
+
+
+class StorageTarget:
+    """The storage calls each route makes, through app.get_db (pool, breaker, metrics)."""
+
+    def __init__(self, server):
+        self.server = server
+
+    def lookup(self, matric):
+        with self.server.get_db(self.server.TABLE_STUDENTS) as table:
+            row = table.row(matric.encode())
+        if not row:
+            return 'not found'
+        records.assemble_history(row)
+
+    def upload(self, matric, name, department, semester):
+        server = self.server
+        gpa, courses = server.GRADING.gpa_data(semester['courses'])
+        semester = dict(semester, courses=courses, gpa=gpa)
+        # Same path as POST /api/results: coalesced per matric, version-checked write.
+        server.UPLOADS.submit(matric, {'sem': semester, 'name': name, 'department': department})
+        server.log_action("RESULT_UPLOAD", f"Updated result for {matric}", matric)
+
+    def list(self, start_after):
+        server = self.server
+        with server.get_db(server.TABLE_STUDENTS) as table:
+            rows = table.scan(row_start=start_after.encode() + b'\x00', columns=server.STUDENT_LIST_COLUMNS,
+                              limit=LIST_PAGE_SIZE + 1, batch_size=LIST_PAGE_SIZE + 1)
+            for key, data in rows:
+                server.student_summary(key, data)
+
+    def logs(self, from_ms):
+        server = self.server
+        audit.query_logs(lambda: server.get_db(server.TABLE_LOGS), LOG_PAGE_SIZE, from_ms=from_ms)
+
+
+def load_server():
+    import app as server
+    return server
+
+def is_memory_storage(server):
+    from storage import MemoryStorage
+    return isinstance(server.storage, MemoryStorage)
+
+
+# --- SEEDING ---
+def seed_storage(server, students, seed, log_events):
+    scale = server.GRADING
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        with table.batch(batch_size=1000) as batch:
+            for i in range(students):
+                matric, name, dept, history = make_student(seed, i)
+                for sem in history:
+                    sem['gpa'], sem['courses'] = scale.gpa_data(sem['courses'])
+                cells, cgpa = records.history_cells(history, scale)
+                cells.update({b'info:name': name.encode(), b'info:dept': dept.encode(),
+                              b'info:gpa': history[-1]['gpa'].encode(), b'info:cgpa': cgpa.encode()})
+                batch.put(matric.encode(), records.summarise(cells, 'upload', history[-1]))
+        with server.get_db(server.TABLE_STATS) as stats_table:
+            stats.rebuild(table, stats_table)
+        with server.get_db(server.TABLE_INDEX) as index_table:
+            indexes.rebuild(table, index_table)
+
+    rng = random.Random(f"{seed}-logs")
+    now_ms = int(time.time() * 1000)
+    with server.get_db(server.TABLE_LOGS) as table:
+        with table.batch(batch_size=1000) as batch:
+            for _ in range(log_events):
+                matric = make_matric(rng.randrange(students))
+                batch.put(*audit.log_entry("RESULT_UPLOAD", f"Updated result for {matric}", matric,
+                                           timestamp_ms=now_ms - rng.randrange(SEED_LOG_DAYS * 86400000)))
+
+def seed_http(target, students, seed):
+    """Loads the registry through POST /api/results/bulk so stats, indexes and logs stay in step."""
+    lines, sent = [], 0
+
+    def send():
+        error = target.request('POST', '/api/results/bulk', '\n'.join(lines), 'application/x-ndjson')
+        if error:
+            raise RuntimeError(f"bulk upload failed: {error}")
+        lines.clear()
+
+    for i in range(students):
+        matric, name, dept, history = make_student(seed, i)
+        for sem in history:
+            for course in sem['courses']:
+                lines.append(json.dumps({
+                    'matricNumber': matric, 'name': name, 'department': dept,
+                    'level': sem['level'], 'semester': sem['semester'],
+                    'courseCode': course['code'], 'score': course['score'], 'unit': course['unit'],
+                }))
+        if len(lines) >= SEED_CHUNK_RECORDS:
+            sent += len(lines)
+            send()
+            print(f"   {i + 1}/{students} students ({sent} course records)", flush=True)
+    if lines:
+        send()
+
+
+# --- WORKERS ---
+def parse_mix(text):
+    """'lookup=70,upload=10,...' -> {operation: weight}; omitted operations get 0."""
+    mix = {}
+    for part in text.split(','):
+        op, _, weight = part.partition('=')
+        op = op.strip()
+        if op not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r} (choose from {', '.join(OPERATIONS)})")
+        try:
+            mix[op] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight for {op} must be a number") from None
+        if mix[op] < 0:
+            raise argparse.ArgumentTypeError(f"weight for {op} must not be negative")
+    if not sum(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return mix
+
+def call(target, op, i, rng):
+    """Issues one `op` touching student i; returns an error label or None."""
+    if op == 'lookup':
+        return target.lookup(make_matric(i))
+    if op == 'upload':
+        matric, name, code, dept = identity(i)
+        semester = make_semester(rng, code, rng.randrange(len(LEVELS) * 2), rng.gauss(58, 10))
+        return target.upload(matric, name, dept, semester)
+    if op == 'list':
+        return target.list(make_matric(i))
+    # Half the log reads are the newest page, half a recent time window.
+    return target.logs(int(time.time() * 1000) - 3600000 if rng.random() < 0.5 else None)
+
+def run_thread(target, args, keys, rng, window, results, lock):
+    start, measure_from, stop = window
+    ops = [op for op in OPERATIONS if args.mix.get(op)]
+    cumulative = list(accumulate(args.mix[op] for op in ops))
+    latencies = {op: [] for op in OPERATIONS}
+    errors = {op: Counter() for op in OPERATIONS}
+    time.sleep(max(start - time.time(), 0))
+    while True:
+        now = time.time()
+        if now >= stop:
+            break
+        op = rng.choices(ops, cum_weights=cumulative)[0]
+        i = keys.sample(rng)
+        t0 = time.perf_counter()
+        try:
+            error = call(target, op, i, rng)
+        except Exception as e:
+            error = type(e).__name__
+        elapsed = (time.perf_counter() - t0) * 1000
+        if now >= measure_from:
+            latencies[op].append(elapsed)
+            if error:
+                errors[op][error] += 1
+    with lock:
+        for op in OPERATIONS:
+            results[op][0].extend(latencies[op])
+            results[op][1].update(errors[op])
+
+def run_worker(args, worker, window):
+    """One worker process: `args.threads` closed-loop clients; returns {op: (latencies ms, errors)}."""
+    keys = ZipfKeys(args.students, args.zipf, args.seed)
+    if args.target == 'storage':
+        server = load_server()
+        if not is_memory_storage(server):
+            from storage import make_storage
+            server.use_storage(make_storage())  # never share the parent's sockets
+        make_target = lambda: StorageTarget(server)
+    else:
+        make_target = lambda: HttpTarget(args.url, args.timeout)
+
+    results = {op: ([], Counter()) for op in OPERATIONS}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=run_thread, name=f"stress-{worker}-{t}", args=(
+        make_target(), args, keys, random.Random(f"{args.seed}-{worker}-{t}"), window, results, lock))
+        for t in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {op: (latencies, dict(errors)) for op, (latencies, errors) in results.items()}
+
+
+# --- REPORTING ---
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values), math.ceil(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[k]
+
+def summarize(latencies, errors, seconds):
+    latencies.sort()
+    count, failed = len(latencies), sum(errors.values())
+    return {
+        'requests': count,
+        'errors': failed,
+        'error_rate': round(failed / count, 4) if count else 0.0,
+        'throughput_rps': round(count / seconds, 1) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+        'error_kinds': dict(errors.most_common()),
+    }
+
+def build_report(args, parts):
+    operations, everything, all_errors = {}, [], Counter()
+    for op in OPERATIONS:
+        latencies, errors = [], Counter()
+        for part in parts:
+            latencies.extend(part[op][0])
+            errors.update(part[op][1])
+        if not latencies and not errors:
+            continue
+        everything.extend(latencies)
+        all_errors.update(errors)
+        operations[op] = summarize(latencies, errors, args.duration)
+    config = {k: v for k, v in vars(args).items() if k not in ('command', 'json', 'baseline')}
+    return {
+        'config': config,
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'operations': operations,
+        'overall': summarize(everything, all_errors, args.duration),
+    }
+
+def print_report(report):
+    print(f"\n{'OPERATION':<12}{'REQ':>9}{'ERR %':>8}{'REQ/S':>10}{'P50 ms':>10}{'P95 ms':>10}{'P99 ms':>10}{'MAX ms':>10}")
+    print('-' * 79)
+    rows = list(report['operations'].items()) + [('overall', report['overall'])]
+    for name, r in rows:
+        print(f"{name:<12}{r['requests']:>9}{r['error_rate'] * 100:>8.2f}{r['throughput_rps']:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+    for name, r in rows[:-1]:
+        if r['error_kinds']:
+            print(f"⚠️  {name} errors: " + ', '.join(f"{kind} x{n}" for kind, n in r['error_kinds'].items()))
+
+def print_comparison(report, baseline):
+    """Relative change per operation for throughput and latency percentiles."""
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+
+    print(f"\n{'VS BASELINE':<12}{'REQ/S':>10}{'P50':>10}{'P95':>10}{'P99':>10}{'ERR %':>10}")
+    print('-' * 62)
+    old_ops = dict(baseline.get('operations', {}), overall=baseline.get('overall', {}))
+    for name, r in list(report['operations'].items()) + [('overall', report['overall'])]:
+        old = old_ops.get(name)
+        if not old:
+            continue
+        print(f"{name:<12}{change(r['throughput_rps'], old['throughput_rps']):>10}"
+              f"{change(r['p50_ms'], old['p50_ms']):>10}{change(r['p95_ms'], old['p95_ms']):>10}"
+              f"{change(r['p99_ms'], old['p99_ms']):>10}"
+              f"{(r['error_rate'] - old['error_rate']) * 100:>+10.2f}")
+
+
+# --- COMMANDS ---
+def seed(args):
+    started = time.perf_counter()
+    print(f"🌱 Seeding {args.students} students (8-10 semesters x 6-10 courses) via {args.target}...")
+    if args.target == 'http':
+        seed_http(HttpTarget(args.url, args.timeout), args.students, args.seed)
+    else:
+        server = load_server()
+        if is_memory_storage(server):
+            sys.exit("❌ In-memory storage doesn't outlive this process; `run --target storage` seeds it itself")
+        seed_storage(server, args.students, args.seed, args.log_events)
+    print(f"✅ Seeded in {time.perf_counter() - started:.1f}s")
+
+def run(args):
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+    if args.target == 'storage':
+        server = load_server()
+        if is_memory_storage(server):
+            if not fork:
+                sys.exit("❌ In-memory storage needs fork() to share the seeded registry with workers")
+            print(f"🧪 Seeding {args.students} students into in-memory storage...")
+            seed_storage(server, args.students, args.seed, args.log_events)
+
+    print(f"🚀 {args.processes} processes x {args.threads} threads -> {args.target} "
+          f"{args.url if args.target == 'http' else os.environ.get('UNISEMI_STORAGE', 'hbase')}")
+    print(f"   mix {args.mix}, zipf s={args.zipf}, {args.warmup:g}s warmup + {args.duration:g}s measured")
+    start = time.time() + STARTUP_GRACE
+    window = (start, start + args.warmup, start + args.warmup + args.duration)
+    context = multiprocessing.get_context('fork' if fork else 'spawn')
+    with context.Pool(args.processes) as pool:
+        parts = pool.starmap(run_worker, [(args, worker, window) for worker in range(args.processes)])
+
+    report = build_report(args, parts)
+    print_report(report)
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(report, json.load(f))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Wrote {args.json}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mixed-workload load generator for the HTTP API or storage layer.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help in (('seed', "load a realistic registry"), ('run', "drive a mixed workload and report latencies")):
+        sub = commands.add_parser(name, help=help)
+        sub.add_argument('--target', choices=('http', 'storage'), default='storage',
+                         help="HTTP API at --url, or storage via app.get_db (UNISEMI_STORAGE / HBASE_*)")
+        sub.add_argument('--url', default='http://localhost:5000', help="API base URL for --target http")
+        sub.add_argument('--students', type=int, default=20000, help="registry size (default 20000)")
+        sub.add_argument('--seed', type=int, default=42, help="RNG seed; seed and run must agree")
+        sub.add_argument('--log-events', type=int, default=10000, help="audit events to seed (storage target)")
+        sub.add_argument('--timeout', type=float, default=10.0, help="HTTP timeout in seconds")
+    run_parser = commands.choices['run']
+    run_parser.add_argument('--processes', type=int, default=4, help="worker processes")
+    run_parser.add_argument('--threads', type=int, default=4, help="client threads per process")
+    run_parser.add_argument('--duration', type=float, default=30.0, help="measured seconds")
+    run_parser.add_argument('--warmup', type=float, default=5.0, help="unmeasured seconds before that")
+    run_parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                            help=f"operation weights (default {DEFAULT_MIX})")
+    run_parser.add_argument('--zipf', type=float, default=1.1, help="key popularity exponent (0 = uniform)")
+    run_parser.add_argument('--json', help="write the report to this JSON file")
+    run_parser.add_argument('--baseline', help="earlier --json report to compare against")
+    args = parser.parse_args(argv)
+
+    if args.students < 1:
+        sys.exit("❌ --students must be at least 1")
+    if args.command == 'seed':
+        seed(args)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import archive
+import audit
+from storage import MemoryTable
+
+BASE = 1_700_000_000_000  # 2023-11-14 22:13 UTC
+HOUR = 3600 * 1000
+
+
+def make_logs(count=40, step=6 * HOUR):
+    table = MemoryTable('system_logs', {'details': {}})
+    for i in range(count):
+        key, cells = audit.log_entry('UPLOAD' if i % 2 else 'DELETE', f'event {i}',
+                                     matric=f'S{i % 4}' if i % 5 else None, timestamp_ms=BASE + i * step)
+        table.put(key, cells)
+    return table
+
+
+def times(rows):
+    return [int(data[audit.COL_TIME]) for _, _, data in rows]
+
+
+def query(table, log_archive, limit=100, **kwargs):
+    @contextmanager
+    def open_table():
+        yield table
+    return audit.query_logs(open_table, limit, archive=log_archive, **kwargs)
+
+
+def test_segment_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, 'BLOCK_ROWS', 4)
+    table = make_logs(10, step=1000)
+    rows = sorted((audit.sort_key(key), key, data) for key, data in table.scan())
+    writer = archive.SegmentWriter(str(tmp_path), archive.event_day(rows[0][0]))
+    for row in rows:
+        writer.add(*row)
+    assert os.listdir(tmp_path) == [os.path.basename(writer.path) + '.tmp']  # unsealed until close()
+    writer.close()
+
+    segment = archive.Segment(writer.path)
+    assert (segment.rows, len(segment.blocks)) == (10, 3)
+    assert list(segment.rows_from()) == rows  # matric-less rows come back without the column too
+    assert list(segment.rows_from(rows[5][0], rows[9][0])) == rows[5:9]
+    assert list(segment.rows_from(rows[9][0] + b'\xff')) == []
+
+    aborted = archive.SegmentWriter(str(tmp_path), '20231114')
+    aborted.add(*rows[0])
+    aborted.abort()
+    assert os.listdir(tmp_path) == [os.path.basename(writer.path)]
+
+
+def test_archive_moves_old_rows_into_daily_segments(tmp_path):
+    table = make_logs()
+    cutoff = BASE + 20 * 6 * HOUR
+    report = archive.archive_logs(table, str(tmp_path), cutoff, batch_size=7)
+    assert (report['archived'], report['deleted']) == (20, 20)
+    days = {archive.event_day(audit.sort_key(audit.log_key(BASE + i * 6 * HOUR, '0'))) for i in range(20)}
+    assert report['segments'] == len(days)
+    assert sorted(name.split('-')[1] for name in os.listdir(tmp_path)) == sorted(days)
+    assert sorted(int(data[audit.COL_TIME]) for _, data in table.scan()) == [
+        BASE + i * 6 * HOUR for i in range(20, 40)]
+
+    log_archive = archive.LogArchive(str(tmp_path))
+    assert log_archive.stats()['segments'] == len(days) and log_archive.stats()['rows'] == 20
+    assert times(log_archive.scan()) == [BASE + i * 6 * HOUR for i in range(19, -1, -1)]
+    start, stop = audit.sort_bounds(BASE + 5 * 6 * HOUR, BASE + 12 * 6 * HOUR)
+    assert times(log_archive.scan(start, stop)) == [BASE + i * 6 * HOUR for i in range(12, 4, -1)]
+    assert archive.archive_logs(table, str(tmp_path), cutoff)['archived'] == 0  # nothing left to move
+
+
+def test_queries_merge_archive_and_table(tmp_path):
+    table = make_logs()
+    archive.archive_logs(table, str(tmp_path), BASE + 20 * 6 * HOUR)
+    log_archive = archive.LogArchive(str(tmp_path))
+    seen, cursor = [], None
+    while True:
+        page, cursor = query(table, log_archive, limit=7, after=cursor.encode() if cursor else None)
+        seen += [e['timestamp'] for e in page]
+        if cursor is None:
+            break
+    assert seen == [BASE + i * 6 * HOUR for i in range(39, -1, -1)]
+
+    page, _ = query(table, log_archive, actions=['UPLOAD'], matric='S1')
+    assert [e['details'] for e in page] == [f'event {i}' for i in (37, 33, 29, 21, 17, 13, 9, 1)]
+    assert len(query(table, None)[0]) == 20  # live table only
+
+
+def test_rows_in_both_places_are_returned_once(tmp_path):
+    table = make_logs(10)
+    kept = list(table.scan())
+    archive.archive_logs(table, str(tmp_path), BASE + 10 * 6 * HOUR)
+    for key, data in kept:  # archived, but the deletes haven't landed
+        table.put(key, data)
+    page, _ = query(table, archive.LogArchive(str(tmp_path)))
+    assert [e['timestamp'] for e in page] == [BASE + i * 6 * HOUR for i in range(9, -1, -1)]
+
+
+def test_crash_mid_delete_is_finished_by_the_next_run(tmp_path, monkeypatch):
+    table = make_logs(10, step=1000)  # one day, one segment
+    real_delete = archive.delete_segment_rows
+
+    def crash(table, path, batch_size=archive.DELETE_BATCH_SIZE):
+        raise ConnectionError("region server went away")
+    monkeypatch.setattr(archive, 'delete_segment_rows', crash)
+    with pytest.raises(ConnectionError):
+        archive.archive_logs(table, str(tmp_path), BASE + 10 * 1000)
+    [segment] = [n for n in os.listdir(tmp_path) if n.endswith('.seg')]
+    assert sorted(os.listdir(tmp_path)) == [segment, segment + '.pending']
+    assert len(list(table.scan())) == 10  # sealed, but nothing deleted
+
+    # Reads stay correct meanwhile: every row is in both places.
+    assert len(query(table, archive.LogArchive(str(tmp_path)))[0]) == 10
+
+    open(tmp_path / 'logs-20231114-dead.seg.tmp', 'wb').close()  # a writer that died before sealing
+    table.put(*audit.log_entry('UPLOAD', 'new', timestamp_ms=BASE + 60 * 1000))
+    monkeypatch.setattr(archive, 'delete_segment_rows', real_delete)
+    report = archive.archive_logs(table, str(tmp_path), BASE)  # cutoff before every row: only the cleanup
+    assert report == {'segments': 0, 'archived': 0, 'deleted': 10}
+    assert os.listdir(tmp_path) == [segment]
+    assert [data[audit.COL_INFO] for _, data in table.scan()] == [b'new']
+    assert archive.finish_pending(table, str(tmp_path)) == 0
+
+
+def test_archive_runner_runs_one_at_a_time(tmp_path):
+    table = make_logs(10, step=1000)
+    release = threading.Event()
+
+    @contextmanager
+    def open_table():
+        yield table
+    runner = archive.ArchiveRunner(open_table, flush=lambda: release.wait(5))
+    started, status = runner.start(str(tmp_path), BASE + 10 * 1000)
+    assert started and status['state'] == 'running'
+    again, status = runner.start(str(tmp_path), BASE + 10 * 1000)
+    assert not again and status['state'] == 'running'  # joins the run already going
+    release.set()
+    assert runner.wait(5)
+    status = runner.status()
+    assert (status['state'], status['archived'], status['deleted']) == ('done', 10, 10)
+    assert 'finished_at' in status and list(table.scan()) == []
+
+
+def test_failed_run_is_reported(tmp_path):
+    @contextmanager
+    def open_table():
+        raise ConnectionError("down")
+        yield
+    runner = archive.ArchiveRunner(open_table)
+    runner.start(str(tmp_path), BASE)
+    assert runner.wait(5)
+    assert runner.status()['state'] == 'failed' and runner.status()['error'] == 'down'
+
+
+def test_logs_routes_keep_archived_events(server, client):
+    for i in range(5):
+        server.log_action('UPLOAD', f'event {i}', f'S{i}')
+    assert client.delete('/api/logs?before=junk').status_code == 400
+
+    response = client.delete('/api/logs')  # also archives what is still queued
+    assert response.status_code == 202 and response.headers['Location'] == '/api/logs/archive'
+    assert response.get_json()['started']
+    assert server.LOG_ARCHIVER.wait(5)
+    status = client.get('/api/logs/archive').get_json()
+    assert (status['state'], status['archived'], status['deleted']) == ('done', 5, 5)
+    assert status['archive']['rows'] == 5
+    with server.get_db(server.TABLE_LOGS) as table:
+        assert list(table.scan()) == []
+    body = client.get('/api/logs').get_json()
+    assert sorted(e['details'] for e in body['data']) == [f'event {i}' for i in range(5)]
+    assert client.get('/api/logs?archived=false').get_json()['data'] == []
+    assert client.get('/api/logs?matric=S3').get_json()['data'][0]['details'] == 'event 3'
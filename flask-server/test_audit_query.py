@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+
+import pytest
+
+import audit
+from storage import MemoryTable
+
+BASE = 1_700_000_000_000
+
+
+@pytest.fixture
+def logs():
+    table = MemoryTable('system_logs', {'details': {}})
+    for i in range(40):
+        key, cells = audit.log_entry('UPLOAD' if i % 2 else 'DELETE', f'event {i}',
+                                     matric=f'S{i % 4}', timestamp_ms=BASE + i * 1000)
+        table.put(key, cells)
+    return table
+
+
+def query(table, limit=100, **kwargs):
+    @contextmanager
+    def open_table():
+        yield table
+    return audit.query_logs(open_table, limit, **kwargs)
+
+
+def test_keys_are_salted_and_newest_first():
+    key = audit.log_key(BASE, 'deadbeef')
+    assert key == b'%02x|%013d|deadbeef' % (0xdeadbeef % audit.LOG_BUCKETS, audit.MAX_TS - BASE)
+    assert audit.sort_key(audit.log_key(BASE + 1, '00000000')) < audit.sort_key(key)
+
+
+def test_spreads_over_buckets(logs):
+    assert len({key[:2] for key, _ in logs.scan()}) > 1
+
+
+def test_pages_newest_first_across_buckets(logs):
+    seen, cursor = [], None
+    while True:
+        page, cursor = query(logs, limit=7, after=cursor.encode() if cursor else None)
+        seen += [e['timestamp'] for e in page]
+        if cursor is None:
+            break
+    assert seen == [BASE + i * 1000 for i in range(39, -1, -1)]
+
+
+def test_one_checkout_per_page(logs):
+    opened = []
+
+    @contextmanager
+    def open_table():
+        opened.append(True)
+        yield logs
+    page, _ = audit.query_logs(open_table, 100, matric='S1')
+    assert len(page) == 10 and len(opened) == 1
+
+
+def test_time_range_is_inclusive(logs):
+    page, cursor = query(logs, from_ms=BASE + 10_000, to_ms=BASE + 12_000)
+    assert [e['timestamp'] for e in page] == [BASE + 12_000, BASE + 11_000, BASE + 10_000]
+    assert cursor is None
+
+
+def test_action_and_matric_filters(logs):
+    page, _ = query(logs, actions=['UPLOAD'], matric='S1', limit=3)
+    assert [(e['action'], e['matricNumber'], e['details']) for e in page] == [
+        ('UPLOAD', 'S1', 'event 37'), ('UPLOAD', 'S1', 'event 33'), ('UPLOAD', 'S1', 'event 29')]
+
+
+def test_migrate_rewrites_legacy_keys():
+    table = MemoryTable('system_logs', {'details': {}})
+    table.put(b'%d_abcdef12' % BASE, {audit.COL_ACTION: b'OLD', audit.COL_TIME: str(BASE).encode()})
+    table.put(b'junk', {audit.COL_ACTION: b'ODD'})
+    key, cells = audit.log_entry('NEW', 'x', timestamp_ms=BASE + 1)
+    table.put(key, cells)
+
+    assert audit.migrate(table, dry_run=True) == {'scanned': 3, 'migrated': 2}
+    assert audit.migrate(table) == {'scanned': 3, 'migrated': 2}
+    assert all(key[2:3] == audit.SEP for key, _ in table.scan())
+    assert audit.log_key(BASE, 'abcdef12') in {key for key, _ in table.scan()}
+    assert [e['action'] for e in query(table)[0]] == ['NEW', 'OLD', 'ODD']
+
+
+def test_logs_route_filters(server, client, upload):
+    upload('S1')
+    upload('S2')
+    client.delete('/api/results/S2')
+    body = client.get('/api/logs?action=DELETE_STUDENT&flush=true').get_json()
+    assert [e['matricNumber'] for e in body['data']] == ['S2']
+    assert [e['action'] for e in client.get('/api/logs?matric=S2&limit=1').get_json()['data']] == ['DELETE_STUDENT']
+    assert client.get('/api/logs?from=yesterday').status_code == 400
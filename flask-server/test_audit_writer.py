@@ -0,0 +1,113 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+import audit
+from storage import MemoryTable
+
+
+def make_log(**kwargs):
+    table = MemoryTable('system_logs', {'details': {}})
+    gate = threading.Event()
+    gate.set()
+
+    @contextmanager
+    def open_table():
+        gate.wait()
+        yield table
+    return audit.AuditLog(open_table, **kwargs), table, gate
+
+
+def test_flush_writes_in_batches():
+    log, table, _ = make_log(batch_size=4, flush_interval=60)
+    for i in range(10):
+        assert log.submit('ACT', f'event {i}', matric='S1')
+    assert log.flush(timeout=5)
+    stats = log.stats()
+    assert (stats['written'], stats['batches'], stats['pending']) == (10, 3, 0)
+    assert len(table) == 10
+    assert {data[audit.COL_MATRIC] for _, data in table.scan()} == {b'S1'}
+    log.close()
+
+
+def test_flush_interval_writes_a_partial_batch():
+    log, table, _ = make_log(batch_size=100, flush_interval=0.01)
+    log.submit('ACT', 'one')
+    for _ in range(200):
+        if len(table):
+            break
+        time.sleep(0.01)
+    assert len(table) == 1
+    log.close()
+
+
+def test_drop_policy_counts_dropped_events():
+    log, table, gate = make_log(max_queue=2, batch_size=1, flush_interval=0, policy='drop')
+    gate.clear()  # the worker takes one event and stalls on the table
+    results = [log.submit('ACT', str(i)) for i in range(6)]
+    assert results.count(False) >= 3
+    gate.set()
+    log.flush(timeout=5)
+    stats = log.stats()
+    assert stats['dropped'] == results.count(False) and stats['written'] == results.count(True)
+    log.close()
+
+
+def test_block_policy_gives_up_after_timeout():
+    log, _, gate = make_log(max_queue=1, batch_size=1, flush_interval=60, block_timeout=0.05)
+    gate.clear()
+    log.submit('ACT', 'a')
+    log.flush(timeout=0)  # hand it to the stalled worker
+    log.submit('ACT', 'b')
+    assert not log.submit('ACT', 'c')
+    assert log.stats()['dropped'] == 1
+    gate.set()
+    log.close()
+
+
+def test_close_writes_out_the_queue_then_refuses():
+    log, table, _ = make_log(batch_size=100, flush_interval=60)
+    for i in range(5):
+        log.submit('ACT', str(i))
+    log.close()
+    assert len(table) == 5
+    assert not log.submit('ACT', 'late')
+    assert log.stats()['dropped'] == 1
+
+
+def test_failed_write_is_counted():
+    @contextmanager
+    def broken():
+        raise OSError("no route to host")
+        yield
+    log = audit.AuditLog(broken, flush_interval=0)
+    log.submit('ACT', 'x')
+    assert log.flush(timeout=5)
+    assert log.stats()['failed'] == 1
+    log.close()
+
+
+def test_bad_settings():
+    with pytest.raises(ValueError):
+        audit.AuditLog(lambda: None, policy='maybe')
+    with pytest.raises(ValueError):
+        audit.AuditLog(lambda: None, batch_size=0)
+
+
+def test_routes_log_through_the_queue(server, client, upload):
+    upload('S1')
+    server.AUDIT.flush(timeout=5)
+    logs = client.get('/api/logs').get_json()
+    assert [(e['action'], e['matricNumber']) for e in logs['data']] == [('RESULT_UPLOAD', 'S1')]
+    assert client.get('/api/logs/stats').get_json()['written'] >= 1
+
+
+def test_log_reads_only_flush_on_request(server, client, monkeypatch):
+    flushes = []
+    monkeypatch.setattr(server.AUDIT, 'flush', lambda timeout=None: flushes.append(timeout))
+    client.get('/api/logs')
+    assert flushes == []  # reads what is stored; the writer stays off the read path
+    client.get('/api/logs?flush=true')
+    assert flushes == [server.AUDIT.flush_interval]
@@ -0,0 +1,69 @@
+import pytest
+
+
+def batch(client, matrics, fields=None):
+    body = {'matrics': matrics} if fields is None else {'matrics': matrics, 'fields': fields}
+    return client.post('/api/results/batch', json=body)
+
+
+@pytest.fixture
+def students(server, upload):
+    upload('S1', name='Ada', courses=(('CSC101', 75, 3),))
+    upload('S2', name='Bo', courses=(('CSC101', 55, 3),))
+    upload('S2', name='Bo', semester='Second', courses=(('CSC102', 65, 3),))
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        table.put(b'S3', {b'info:name': b'Cy', b'info:dept': b'Maths'})  # no results yet
+
+
+def test_full_transcripts_in_request_order(client, students):
+    response = batch(client, ['S2', 'NOPE', ' S1 ', 'S2'])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['found'], body['missing']) == (2, 1)
+    assert [e['matricNumber'] for e in body['data']] == ['S2', 'NOPE', 'S1']  # trimmed and deduped
+    assert body['data'][1] == {'matricNumber': 'NOPE', 'error': 'Student not found'}
+    assert body['data'][0] == client.get('/api/results/S2').get_json()
+    assert body['data'][2] == client.get('/api/results/S1').get_json()
+
+
+def test_chunks_and_the_transcript_cache(server, client, students, upload, monkeypatch):
+    monkeypatch.setattr(server, 'BATCH_ROWS_CHUNK', 2)
+    server.TRANSCRIPTS.invalidate(['S1', 'S2'])
+    first = batch(client, ['S1', 'S2', 'S3', 'S4', 'S5']).get_json()
+    assert [e.get('error') for e in first['data']] == [None, None, None, 'Student not found', 'Student not found']
+    hits = server.TRANSCRIPTS.stats()['hits']
+    assert batch(client, ['S1', 'S2', 'S3']).get_json() == {**first, 'data': first['data'][:3],
+                                                             'found': 3, 'missing': 0}
+    assert server.TRANSCRIPTS.stats()['hits'] == hits + 3
+
+    upload('S1', name='Ada', semester='Second', courses=(('CSC102', 55, 3),))  # invalidates S1
+    assert batch(client, ['S1']).get_json()['data'][0]['cgpa'] == '4.00'
+
+
+def test_fields_projection(client, students):
+    body = batch(client, ['S1', 'S2', 'S3', 'NOPE'], ['cgpa', 'semesters', 'department']).get_json()
+    assert body['data'] == [
+        {'matricNumber': 'S1', 'cgpa': '5.00', 'semesters': 1, 'department': 'Computer Science'},
+        {'matricNumber': 'S2', 'cgpa': '3.50', 'semesters': 2, 'department': 'Computer Science'},
+        {'matricNumber': 'S3', 'cgpa': None, 'semesters': None, 'department': 'Maths'},
+        {'matricNumber': 'NOPE', 'error': 'Student not found'},
+    ]
+    [s2] = batch(client, ['S2'], ['academicHistory', 'gpa']).get_json()['data']
+    assert [sem['semester'] for sem in s2['academicHistory']] == ['First', 'Second']
+    assert s2['gpa'] == '4.00'
+
+
+@pytest.mark.parametrize('body', [
+    None, {}, {'matrics': []}, {'matrics': 'S1'}, {'matrics': ['S1', 7]}, {'matrics': ['  ']},
+    {'matrics': ['S1'], 'fields': []}, {'matrics': ['S1'], 'fields': ['name', 'password']},
+    {'matrics': ['S1'], 'fields': 'name'},
+])
+def test_bad_requests(client, body):
+    response = client.post('/api/results/batch', json=body)
+    assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def test_too_many_matrics(server, client):
+    too_many = [f'S{i}' for i in range(server.MAX_BATCH_MATRICS + 1)]
+    assert batch(client, too_many).status_code == 400
+    assert batch(client, too_many[:-1] + ['S0']).status_code == 200  # counted after deduping
@@ -0,0 +1,138 @@
+import socket
+
+import pytest
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, HealthProber
+
+
+def tripped(**kwargs):
+    """A breaker that is open and ready to go half-open on the next call."""
+    b = CircuitBreaker(failure_threshold=1, reset_timeout=kwargs.pop('reset_timeout', 0), **kwargs)
+    b.record_failure(socket.timeout("down"))
+    assert b.state == OPEN
+    return b
+
+
+def test_opens_after_consecutive_transport_failures():
+    b = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            with b.guard():
+                raise ConnectionError("refused")
+    with b.guard():
+        pass  # a success resets the run
+    for _ in range(3):
+        with pytest.raises(OSError):
+            with b.guard():
+                raise OSError("refused")
+    assert b.state == OPEN
+    with pytest.raises(CircuitOpen) as raised:
+        with b.guard():
+            pass
+    assert 0 < raised.value.retry_after <= 60
+    assert b.stats()['rejected'] == 1 and b.stats()['opens'] == 1
+
+
+def test_application_errors_count_as_success():
+    b = CircuitBreaker(failure_threshold=1)
+    with pytest.raises(KeyError):
+        with b.guard():
+            raise KeyError('row')
+    assert b.state == CLOSED and b.stats()['successes'] == 1
+
+
+def test_half_open_trial_closes_or_reopens():
+    b = tripped()
+    with b.guard():
+        assert b.state == HALF_OPEN
+    assert b.state == CLOSED
+
+    b = tripped()
+    with pytest.raises(OSError):
+        with b.guard():
+            raise OSError("still down")
+    assert b.state == OPEN
+
+
+def test_half_open_admits_only_the_trial():
+    b = tripped()
+    with b.guard():
+        with pytest.raises(CircuitOpen):
+            with b.guard():
+                pass
+
+
+def test_generator_exit_hands_the_trial_back():
+    b = tripped()
+
+    def stream():
+        with b.guard():
+            yield 'first'
+            yield 'second'
+
+    body = stream()
+    assert next(body) == 'first'
+    body.close()  # the client went away mid-stream: GeneratorExit inside the guard
+    assert b.state == HALF_OPEN and (b.stats()['successes'], b.stats()['failures']) == (0, 1)
+    with b.guard():  # the trial slot is free again
+        pass
+    assert b.state == CLOSED
+
+
+def test_late_release_cannot_free_a_newer_trial():
+    b = tripped()
+    stale = b.before_call()
+    b.record_failure(OSError("down"))  # reopened: the old trial's period is over
+    b.reset_timeout = 0
+    fresh = b.before_call()
+    b.release_trial(stale)
+    with pytest.raises(CircuitOpen):
+        b.before_call()  # `fresh` still holds the only slot
+    b.release_trial(fresh)
+    assert b.before_call() is not None
+
+
+def test_health_prober_feeds_the_breaker():
+    up = {'ok': False}
+
+    def probe():
+        if not up['ok']:
+            raise socket.error("refused")
+    b = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    prober = HealthProber(probe, b, interval=60)
+    assert prober.check()['status'] == 'offline' and b.state == OPEN
+    up['ok'] = True
+    status = prober.status()
+    assert status['status'] == 'offline' and status['circuit'] == OPEN  # cached until the next probe
+    assert prober.check()['status'] == 'online' and b.state == CLOSED
+    assert prober.stats()['probes'] == 2
+    prober.close()
+
+
+@pytest.fixture
+def circuit(server, monkeypatch):
+    b = tripped()
+    monkeypatch.setattr(server, 'BREAKER', b)
+    return b
+
+
+def test_open_circuit_answers_503(server, client, monkeypatch):
+    monkeypatch.setattr(server, 'BREAKER', tripped(reset_timeout=30))
+    response = client.get('/api/students')
+    assert response.status_code == 503 and response.get_json()['circuit'] == OPEN
+    assert 1 <= int(response.headers['Retry-After']) <= 30
+
+
+def test_two_table_request_spends_one_trial(client, circuit):
+    assert client.post('/api/index/rebuild').status_code == 200
+    assert client.post('/api/stats/rebuild').status_code == 200
+    assert circuit.state == CLOSED
+
+
+def test_abandoned_stream_releases_the_trial(client, circuit):
+    response = client.get('/api/students', buffered=False)
+    assert response.status_code == 200 and circuit.state == HALF_OPEN
+    response.close()  # hung up after the first chunk
+    assert circuit.state == HALF_OPEN
+    assert client.get('/api/students').get_json() == {'data': [], 'next': None}
+    assert circuit.state == CLOSED
@@ -0,0 +1,59 @@
+import cache
+from cache import ENTRY_OVERHEAD, TranscriptCache
+
+
+def test_lru_bounded_by_bytes():
+    c = TranscriptCache(max_bytes=3 * (ENTRY_OVERHEAD + 11))
+    for key in ('a', 'b', 'c'):
+        c.put(key, b'x' * 10, 'e', c.begin())
+    c.get('a')  # a is now the most recently used
+    c.put('d', b'x' * 10, 'e', c.begin())
+    assert c.get('b') is None and c.get('a') == (b'x' * 10, 'e')
+    stats = c.stats()
+    assert stats['entries'] == 3 and stats['evictions'] == 1 and stats['bytes'] <= c.max_bytes
+
+
+def test_oversized_body_is_not_cached():
+    c = TranscriptCache(max_bytes=100)
+    c.put('a', b'x' * 100, 'e', c.begin())
+    assert c.get('a') is None and c.stats()['bytes'] == 0
+
+
+def test_entries_expire():
+    c = TranscriptCache(ttl=0)
+    c.put('a', b'body', 'e', c.begin())
+    assert c.get('a') is None and c.stats()['expirations'] == 1
+
+
+def test_put_after_a_racing_invalidation_is_rejected():
+    c = TranscriptCache()
+    token = c.begin()
+    c.invalidate(['a'])  # a write landed between the read and the put
+    c.put('a', b'stale', 'e', token)
+    assert c.get('a') is None and c.stats()['rejected'] == 1
+
+
+def test_etag_changes_with_timestamp_and_body():
+    assert cache.make_etag(1, b'a') != cache.make_etag(2, b'a') != cache.make_etag(2, b'b')
+
+
+def test_transcript_etag_and_304(server, client, upload):
+    upload('S1')
+    first = client.get('/api/results/S1')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+    again = client.get('/api/results/S1', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.get_data() == b''
+    stats = client.get('/api/cache').get_json()
+    assert (stats['hits'], stats['not_modified']) == (1, 1)
+
+
+def test_upload_invalidates_the_cached_transcript(client, upload):
+    upload('S1', courses=(('CSC101', 75, 3),))
+    etag = client.get('/api/results/S1').headers['ETag']
+    upload('S1', courses=(('CSC101', 55, 3),))
+    fresh = client.get('/api/results/S1', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200 and fresh.get_json()['cgpa'] == '3.00'
+    assert fresh.headers['ETag'] != etag
+    client.delete('/api/results/S1')
+    assert client.get('/api/results/S1').status_code == 404
@@ -0,0 +1,107 @@
+import json
+import random
+
+import pytest
+
+import codec
+
+FORMATS = ('binary', 'binary-zlib')
+
+
+def semester(courses):
+    return {'level': '100', 'semester': 'First', 'gpa': '4.50', 'courses': courses}
+
+
+ROUND_TRIPS = [
+    semester([]),
+    semester([{}]),
+    semester([{}, {}, {}]),
+    {'level': '100', 'semester': 'First'},  # no courses key at all
+    {},
+    semester([{'code': 'CSC101', 'score': 75, 'unit': 3, 'grade': 'A'}]),
+    semester([{'code': f'C{i}', 'score': i, 'unit': 3, 'grade': 'AB'[i % 2]} for i in range(300)]),
+    semester([{'score': -1}, {'score': 2 ** 31}, {'score': -2 ** 40}]),  # int32 / int64 columns
+    semester([{'score': 70.5}, {'score': float('inf')}, {'score': -0.0}]),
+    semester([{'score': 70}, {'score': 70.5}, {'score': '70'}]),  # mixed types fall back to JSON
+    semester([{'score': None, 'ok': True, 'notes': [1, {'a': 2}]}]),
+    semester([{'code': ''}, {'code': 'é漢字'}, {'code': ''}]),
+    semester([{'code': 'a\x00b'}]),  # NUL can't be a separator
+    {'level': 100, 'semester': 'First', 'gpa': 4.5, 'courses': [{'x': 1}]},
+]
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+@pytest.mark.parametrize('sem', ROUND_TRIPS, ids=range(len(ROUND_TRIPS)))
+def test_round_trip(sem, fmt):
+    raw = codec.encode(sem, fmt)
+    assert codec.is_binary(raw)
+    decoded = codec.decode(raw)
+    assert decoded == sem and json.dumps(decoded) == json.dumps(sem)  # same types, same key order
+
+
+@pytest.mark.parametrize('sem', [
+    semester([{'a': 1}, {'b': 2}]),                     # courses with different keys
+    semester([{'a': 1}, 'not a dict']),
+    semester({'a': 1}),                                 # courses not a list
+    semester([{'k' * 300: 1}]),                         # key too long for the schema
+    semester([{'code': '\ud800'}]),                     # lone surrogate
+    [1, 2, 3],
+])
+def test_unfit_semesters_fall_back_to_json(sem):
+    raw = codec.encode(sem, 'binary')
+    assert not codec.is_binary(raw)
+    assert codec.decode(raw) == sem
+
+
+def test_json_format_and_legacy_cells():
+    sem = semester([{'code': 'A', 'score': 75}])
+    assert codec.encode(sem, 'json') == json.dumps(sem).encode()
+    assert codec.decode(json.dumps(sem).encode()) == sem
+
+
+def test_zlib_only_when_it_helps():
+    big = semester([{'code': 'CSC101', 'score': 75, 'unit': 3, 'grade': 'A'}] * 200)
+    assert codec.encode(big, 'binary-zlib')[2] & codec.FLAG_ZLIB
+    assert len(codec.encode(big, 'binary-zlib')) < len(codec.encode(big, 'binary'))
+    small = semester([{'code': 'CSC101', 'score': 75}])
+    assert not codec.encode(small, 'binary-zlib')[2] & codec.FLAG_ZLIB
+
+
+def test_binary_is_smaller_than_json():
+    sem = semester([{'code': f'CSC{i}', 'score': 40 + i, 'unit': 3, 'grade': 'ABCDF'[i % 5]} for i in range(8)])
+    assert len(codec.encode(sem, 'binary')) < len(codec.encode(sem, 'json')) / 2
+
+
+def test_bad_version_and_format(monkeypatch):
+    raw = bytearray(codec.encode(semester([]), 'binary'))
+    raw[1] = codec.VERSION + 1
+    with pytest.raises(ValueError):
+        codec.decode(bytes(raw))
+    monkeypatch.setenv('UNISEMI_HISTORY_FORMAT', 'json')
+    assert not codec.is_binary(codec.encode(semester([])))
+    monkeypatch.setenv('UNISEMI_HISTORY_FORMAT', 'xml')
+    with pytest.raises(ValueError):
+        codec.encode(semester([]))
+
+
+def value_makers(rng):
+    return [
+        lambda: rng.randint(0, 255), lambda: rng.randint(-2 ** 31, 2 ** 31 - 1),
+        lambda: rng.randint(-2 ** 63, 2 ** 63 - 1), lambda: rng.random() * 100, lambda: rng.choice('ABC'),
+        lambda: ''.join(rng.choice('xyzé ') for _ in range(rng.randint(0, 6))),
+        lambda: None, lambda: rng.random() < 0.5,
+    ]
+
+
+def test_fuzzed_round_trips():
+    rng = random.Random(17)
+    makers = value_makers(rng)
+    mixed = lambda: rng.choice(makers)()
+    for _ in range(500):
+        # Most columns hold one type (the typed layouts); some mix them (the JSON fallback).
+        columns = {f'k{i}': rng.choice(makers + [mixed]) for i in range(rng.randint(0, 5))}
+        courses = [{key: make() for key, make in columns.items()} for _ in range(rng.choice([0, 1, 2, 7, 40, 300]))]
+        sem = {'level': str(rng.randint(1, 5) * 100), 'gpa': mixed(), 'courses': courses}
+        for fmt in FORMATS:
+            raw = codec.encode(sem, fmt)
+            assert codec.is_binary(raw) and json.dumps(codec.decode(raw)) == json.dumps(sem)
@@ -1,3 +1,4 @@
+import os
 import sys
 import socket
 import subprocess
@@ -6,8 +7,8 @@ import json
 import time
 
 # --- CONFIGURATION ---
-SERVER_IP = '10.47.246.170'  # Ensure this matches your Server IP
-SERVER_PORT = 9090
+SERVER_IP = os.environ.get('HBASE_HOST', '10.47.246.170')  # Ensure this matches your Server IP
+SERVER_PORT = int(os.environ.get('HBASE_PORT', 9090))
 TABLE_NAME = 'students'     # The actual table your app uses
 
 # Dummy Data (Exactly what your React app sends)
@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+import os
+
+import pytest
+
+import export
+
+
+@pytest.fixture
+def registry(server, upload):
+    upload('CSC/1', name='Ada', courses=(('CSC101', 75, 3), ('MTH101', 55, 2)))
+    upload('CSC/2', name='Bo', courses=(('CSC101', 65, 3),))
+    upload('EEE/1', name='Cy', department='Electrical', courses=(('EEE101', 47, 3),))
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        table.put(b'MTH/1', {b'info:name': b'Di', b'info:dept': b'Maths'})  # no results yet
+    return server
+
+
+def open_table(server):
+    return lambda: server.get_db(server.TABLE_STUDENTS)
+
+
+def read_csv(text):
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def test_csv_route_has_one_row_per_course(client, registry):
+    response = client.get('/api/export')
+    assert response.mimetype == 'text/csv'
+    assert 'students.csv' in response.headers['Content-Disposition']
+    rows = read_csv(response.get_data(as_text=True))
+    assert [(r['matricNumber'], r['courseCode']) for r in rows] == [
+        ('CSC/1', 'CSC101'), ('CSC/1', 'MTH101'), ('CSC/2', 'CSC101'), ('EEE/1', 'EEE101'), ('MTH/1', '')]
+    assert rows[0] == {'matricNumber': 'CSC/1', 'name': 'Ada', 'department': 'Computer Science',
+                       'cgpa': '4.20', 'level': '100', 'semester': 'First', 'gpa': '4.20',
+                       'courseCode': 'CSC101', 'score': '75', 'unit': '3', 'grade': 'A'}
+
+
+def test_ndjson_route_with_prefix_and_start_after(client, registry):
+    response = client.get('/api/export?format=ndjson&prefix=CSC')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r['matricNumber'] for r in rows] == ['CSC/1', 'CSC/1', 'CSC/2']
+    assert list(rows[0]) == list(export.FIELDS)
+
+    resumed = client.get('/api/export?format=ndjson&start_after=CSC/2').get_data(as_text=True)
+    assert [json.loads(line)['matricNumber'] for line in resumed.splitlines()] == ['EEE/1', 'MTH/1']
+    empty = client.get('/api/export?prefix=ZZZ').get_data(as_text=True)
+    assert read_csv(empty) == [] and empty.startswith('matricNumber,')
+
+
+def test_bad_format(client):
+    assert client.get('/api/export?format=parquet').status_code == 400
+
+
+def test_key_ranges():
+    assert export.key_ranges() == [(None, None)]
+    assert export.key_ranges('CSC', ['AAA', 'CSC/5', 'ZZZ']) == [(b'CSC', b'CSC/5'), (b'CSC/5', b'CSD')]
+    assert export.key_ranges(None, ['M', 'E']) == [(None, b'E'), (b'E', b'M'), (b'M', None)]
+
+
+def part_rows(directory):
+    names = sorted(n for n in os.listdir(directory) if n.startswith('part-'))
+    rows = []
+    for name in names:
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            rows += read_csv(f.read())
+    return names, rows
+
+
+def test_parts_roll_over_at_student_boundaries(registry, tmp_path):
+    state = export.export_range(open_table(registry), str(tmp_path), 0, (None, None), 'csv', part_rows=2)
+    assert (state['students'], state['rows'], state['parts'], state['done']) == (4, 5, 3, True)
+    names, rows = part_rows(tmp_path)
+    assert names == ['part-00-00000.csv', 'part-00-00001.csv', 'part-00-00002.csv']
+    assert len(rows) == 5
+    with pytest.raises(RuntimeError):  # a finished export is never overwritten by accident
+        export.export_range(open_table(registry), str(tmp_path), 0, (None, None), 'csv')
+
+
+def test_resume_drops_the_half_written_part(registry, tmp_path):
+    directory = str(tmp_path)
+    export.save_checkpoint(directory, 0, {'range': [None, None], 'format': 'csv', 'last_key': 'CSC/2',
+                                          'parts': 1, 'students': 2, 'rows': 3, 'done': False})
+    for seq in (0, 1):
+        with open(export.part_path(directory, 0, seq, 'csv'), 'w') as f:
+            f.write('matricNumber\nstale\n')
+    state = export.export_range(open_table(registry), directory, 0, (None, None), 'csv', resume=True)
+    assert (state['students'], state['rows'], state['parts']) == (4, 5, 2)
+    with open(export.part_path(directory, 0, 1, 'csv'), encoding='utf-8') as f:
+        assert [r['matricNumber'] for r in read_csv(f.read())] == ['EEE/1', 'MTH/1']
+
+    with pytest.raises(RuntimeError):  # checkpoint from another range
+        export.export_range(open_table(registry), directory, 0, (b'CSC', b'CSD'), 'csv', resume=True)
+
+
+def test_cli_splits_ranges(registry, tmp_path, capsys):
+    export.main([str(tmp_path), '--format', 'ndjson', '--split-at', 'E,M'])
+    names = sorted(os.listdir(tmp_path))
+    assert [n for n in names if n.startswith('checkpoint-')] == [
+        'checkpoint-00.json', 'checkpoint-01.json', 'checkpoint-02.json']
+    assert [n for n in names if n.startswith('part-')] == [
+        'part-00-00000.ndjson', 'part-01-00000.ndjson', 'part-02-00000.ndjson']
+    assert 'Exported 4 students (5 rows)' in capsys.readouterr().out
@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+import pytest
+
+import grading
+from grading import GradingScale
+
+SCALE = GradingScale()
+ODD_SCORES = [None, 'abc', '', float('nan'), float('inf'), -5, '69.99', 70, '70', 44.5, 100]
+ODD_UNITS = [None, 'two', '', float('nan'), float('inf'), -1, 2.9, '3', 0, 4]
+
+
+def test_bands():
+    assert [SCALE.letter(s) for s in (100, 70, 69.99, 60, 50, 45, 44.9, 0, -1)] == list('AABBCDFFF')
+    assert SCALE.point('65') == 4 and SCALE.letter('junk') == 'F' and SCALE.letter(float('nan')) == 'F'
+    letters, points = SCALE.grade([75, 'x', 55])
+    assert list(letters) == ['A', 'F', 'C'] and list(points) == [5, 0, 3]
+
+
+def test_parse_bands_and_repr():
+    scale = GradingScale(grading.parse_bands("70:A:5, 60:B:4,0:F:0"))
+    assert repr(scale) == "70:A:5,60:B:4,0:F:0"
+    assert scale.letter(65) == 'B' and scale.letter(59) == 'F'
+    with pytest.raises(ValueError):
+        grading.parse_bands("70:A")
+
+
+def test_to_unit():
+    assert [grading.to_unit(u) for u in ODD_UNITS] == [0, 0, 0, 0, 0, -1, 2, 3, 0, 4]
+
+
+def random_courses(rng, count):
+    courses = []
+    for i in range(count):
+        course = {'code': f'C{i}', 'score': rng.choice(ODD_SCORES + list(range(0, 101, 7)))}
+        if rng.random() < 0.8:
+            course['unit'] = rng.choice(ODD_UNITS + [1, 2, 3])
+        courses.append(course)
+    return courses
+
+
+@pytest.mark.parametrize('count', [5, grading.VECTOR_MIN - 1, grading.VECTOR_MIN, 300])
+def test_scalar_and_vector_paths_agree(count):
+    rng = random.Random(count)
+    courses = random_courses(rng, count)
+    gpa, graded = SCALE.gpa_data([dict(c) for c in courses])
+    assert [c['grade'] for c in graded] == [SCALE.letter(c.get('score', 0)) for c in courses]
+
+    units = sum(grading.to_unit(c.get('unit', grading.DEFAULT_UNIT)) for c in courses)
+    points = sum(grading.to_unit(c.get('unit', grading.DEFAULT_UNIT)) * SCALE.point(c.get('score', 0))
+                 for c in courses)
+    assert gpa == grading.format_gpa(units, points)
+    assert SCALE.semester_totals([{'courses': courses}]) == [(units, points)]
+
+
+def test_semester_totals_groups_semesters():
+    semesters = [{'courses': [{'score': 75, 'unit': 3}]}, {'courses': []},
+                 {'courses': [{'score': 65}] * 40 + [{'score': 30, 'unit': 2}] * 40}]
+    assert SCALE.semester_totals(semesters) == [(3, 15), (0, 0), (200, 480)]
+
+
+def test_student_totals_dense_and_sparse_ids():
+    scores, units = [75, 65, 55, 30], [3, 3, 2, 2]
+    ids, unit_sums, point_sums, cgpa = SCALE.student_totals([0, 0, 2, 2], scores, units)
+    assert ids.tolist() == [0, 2] and unit_sums.tolist() == [6, 4] and point_sums.tolist() == [27, 6]
+    assert np.allclose(cgpa, [4.5, 1.5])
+    ids, _, _, cgpa = SCALE.student_totals(['S9', 'S1', 'S9', 'S1'], scores, units)
+    assert ids.tolist() == ['S1', 'S9'] and np.allclose(cgpa, [2.4, 4.2])
@@ -0,0 +1,136 @@
+import socket
+import threading
+
+import pytest
+
+from hbase_pool import ConnectionPool, PoolClosed, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def tables(self):
+        return []
+
+    def close(self):
+        self.closed = True
+
+
+class AppError(Exception):
+    """Stands in for an HBase IOError arriving over a healthy socket."""
+
+
+def make_pool(size=2, **kwargs):
+    made = []
+
+    def factory():
+        made.append(FakeConnection())
+        return made[-1]
+    return ConnectionPool(factory, size=size, **kwargs), made
+
+
+def test_reuses_returned_connection():
+    pool, made = make_pool()
+    for _ in range(5):
+        with pool.connection() as conn:
+            assert conn is made[0]
+    stats = pool.stats()
+    assert stats['created'] == 1 and stats['checkouts'] == 5 and stats['idle'] == 1
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(size=1, checkout_timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiter_gets_released_connection():
+    pool, made = make_pool(size=1, checkout_timeout=2)
+    got = []
+    with pool.connection():
+        waiter = threading.Thread(target=lambda: got.append(pool.connection().__enter__()))
+        waiter.start()
+        waiter.join(0.05)
+        assert not got
+    waiter.join(2)
+    assert got == [made[0]] and pool.stats()['waits'] == 1
+
+
+def test_transport_error_discards_connection():
+    pool, made = make_pool()
+    with pytest.raises(socket.timeout):
+        with pool.connection():
+            raise socket.timeout("read timed out")
+    assert made[0].closed
+    with pool.connection() as conn:
+        assert conn is made[1]
+    assert pool.stats()['discarded'] == 1
+
+
+def test_application_error_keeps_connection():
+    pool, made = make_pool()
+    with pytest.raises(AppError):
+        with pool.connection():
+            raise AppError("table not found")
+    assert not made[0].closed
+    with pool.connection() as conn:
+        assert conn is made[0]
+    assert pool.stats()['discarded'] == 0
+
+
+def test_failed_health_check_replaces_stale_connection():
+    def ping(conn):
+        raise socket.error("broken pipe")
+    pool, made = make_pool(health_check_interval=0, health_check=ping)
+    with pool.connection():
+        pass
+    with pool.connection() as conn:
+        assert conn is made[1]
+    assert made[0].closed and pool.stats()['health_failures'] == 1
+
+
+def test_close_closes_idle_and_late_returns():
+    pool, made = make_pool()
+    with pool.connection():
+        with pool.connection() as held:
+            pass
+        pool.close()
+        assert held.closed  # idle when the pool closed
+        assert not made[0].closed
+    assert made[0].closed  # returned after close, not re-pooled
+    assert pool.stats()['open'] == 0 and pool.stats()['idle'] == 0
+
+
+def test_checkout_after_close_raises():
+    pool, made = make_pool(size=1, checkout_timeout=5)
+    errors = []
+
+    def waiter():
+        try:
+            with pool.connection():
+                pass
+        except PoolClosed as e:
+            errors.append(e)
+    with pool.connection():
+        blocked = threading.Thread(target=waiter)
+        blocked.start()
+        blocked.join(0.05)  # let it start waiting (closing first must raise too)
+        pool.close()  # wakes the waiter instead of leaving it to time out
+        blocked.join(5)
+    assert len(errors) == 1
+    with pytest.raises(PoolClosed):
+        with pool.connection():
+            pass
+    assert len(made) == 1 and pool.stats()['open'] == 0
+
+
+def test_schema_created_once(server):
+    tables = server.storage.stats()['tables']
+    assert set(server.SCHEMA) <= set(tables)
+    checkouts = server.storage.stats()['checkouts']
+    server.ensure_schema()
+    assert server.storage.stats()['checkouts'] == checkouts
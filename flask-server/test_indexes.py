@@ -0,0 +1,71 @@
+import indexes
+
+# One 3-unit course per student: the score fixes the CGPA.
+SCORE = {'5.00': 75, '4.00': 65, '3.00': 55, '2.00': 47}
+
+
+def enrol(upload, matric, department, cgpa):
+    upload(matric, name=matric.lower(), department=department, courses=(('GEN101', SCORE[cgpa], 3),))
+
+
+def seed(upload):
+    enrol(upload, 'C1', 'Computer Science', '3.00')
+    enrol(upload, 'C2', 'Computer Science', '5.00')
+    enrol(upload, 'C3', 'computer science', '4.00')
+    enrol(upload, 'M1', 'Mathematics', '2.00')
+
+
+def ranked(response):
+    return [(s['matricNumber'], s['cgpa']) for s in response.get_json()['data']]
+
+
+def test_leaderboard_is_best_first(client, upload):
+    seed(upload)
+    assert ranked(client.get('/api/leaderboard?limit=3')) == [('C2', '5.00'), ('C3', '4.00'), ('C1', '3.00')]
+    assert ranked(client.get('/api/leaderboard?department=Mathematics')) == [('M1', '2.00')]
+
+
+def test_department_listing_and_cgpa_range(client, upload):
+    seed(upload)
+    assert ranked(client.get('/api/departments/COMPUTER SCIENCE/students')) == [
+        ('C2', '5.00'), ('C3', '4.00'), ('C1', '3.00')]
+    assert ranked(client.get('/api/departments/Computer Science/students?min_cgpa=3.5&max_cgpa=4.5')) == [
+        ('C3', '4.00')]
+    assert ranked(client.get('/api/students/cgpa?min_cgpa=2.0&max_cgpa=3.0')) == [('C1', '3.00'), ('M1', '2.00')]
+    assert client.get('/api/students/cgpa?min_cgpa=high').status_code == 400
+
+
+def test_pages_follow_the_cursor(client, upload):
+    seed(upload)
+    first = client.get('/api/leaderboard?limit=2').get_json()
+    assert first['next'] is not None
+    second = client.get(f"/api/leaderboard?limit=2&start_after={first['next']}")
+    assert ranked(second) == [('C1', '3.00'), ('M1', '2.00')]
+
+
+def test_entries_move_with_the_student(client, upload):
+    seed(upload)
+    enrol(upload, 'M1', 'Physics', '5.00')  # re-upload: new grade, new department
+    assert ranked(client.get('/api/leaderboard?department=Mathematics')) == []
+    assert ranked(client.get('/api/leaderboard?department=physics')) == [('M1', '5.00')]
+    client.delete('/api/results/C2')
+    assert [m for m, _ in ranked(client.get('/api/leaderboard'))] == ['M1', 'C3', 'C1']
+
+
+def test_rebuild_repairs_drift(server, client, upload):
+    seed(upload)
+    with server.get_db(server.TABLE_INDEX) as table:
+        table.delete(indexes.entry_keys('C2', {'department': 'Computer Science', 'cgpa': '5.00'})[0])
+        table.put(b'c|000|GHOST', {b'i:name': b'ghost', b'i:dept': b'', b'i:cgpa': b'5.00'})
+    dry = client.post('/api/index/rebuild?dry_run=true').get_json()
+    assert (dry['written'], dry['removed']) == (1, 1)
+    assert 'GHOST' in [m for m, _ in ranked(client.get('/api/leaderboard'))]
+
+    report = client.post('/api/index/rebuild').get_json()
+    assert (report['students'], report['entries'], report['written'], report['removed']) == (4, 8, 1, 1)
+    assert [m for m, _ in ranked(client.get('/api/leaderboard'))] == ['C2', 'C3', 'C1', 'M1']
+
+
+def test_bounds():
+    assert indexes.department_bounds('Law') == (b'd|law|', b'd|law}')
+    assert indexes.registry_bounds('2.00', '4.00') == (b'c|100', b'c|301')
@@ -0,0 +1,125 @@
+import io
+import json
+
+import pytest
+
+import ingest
+import records
+from storage import MemoryTable
+from writes import COL_REV, COL_REV_DONE, VersionedWriter, counter_value
+
+CSV = b"""matricNumber,name,department,level,semester,courseCode,score,unit
+S1,Ada,Physics,100,First,PHY101,75,3
+S1,Ada,Physics,100,First,PHY102,65,3
+S2,Bo,Law,100,First,LAW101,55,2
+S2,,,100,First,,55,2
+S3,Cy,Law,100,First,LAW101,abc,2
+"""
+
+
+def test_normalise():
+    rec = ingest.normalise({'matricNumber': ' S1 ', 'code': 'X1', 'score': '70.0'})
+    assert rec == {'matricNumber': 'S1', 'name': '', 'department': '', 'level': '100', 'semester': 'First',
+                   'course': {'courseCode': 'X1', 'score': 70, 'unit': 3}}
+    for raw, message in (({'courseCode': 'X'}, 'matricNumber'), ({'matricNumber': 'S'}, 'courseCode'),
+                         ({'matricNumber': 'S', 'code': 'X', 'unit': '2.5'}, 'unit'),
+                         ({'matricNumber': 'S', 'code': 'X', 'score': ''}, 'score')):
+        with pytest.raises(ValueError, match=message):
+            ingest.normalise(raw)
+
+
+def test_merge_courses_replaces_by_code():
+    merged = ingest.merge_courses([{'code': 'A', 'score': 1}, {'code': 'B', 'score': 2}],
+                                  [{'courseCode': 'B', 'score': 9}, {'courseCode': 'C', 'score': 3}])
+    assert [(ingest._course_key(c), c['score']) for c in merged] == [('A', 1), ('B', 9), ('C', 3)]
+
+
+def test_parse_ndjson_reports_bad_lines():
+    lines = list(ingest.parse_ndjson(io.BytesIO(b'{"a": 1}\n\nnot json\n[1]\n')))
+    assert [n for n, _ in lines] == [1, 3, 4]
+    assert isinstance(lines[1][1], ValueError) and isinstance(lines[2][1], ValueError)
+
+
+def test_csv_upload_counts_and_errors(client):
+    body = client.post('/api/results/bulk?chunk=2', data=CSV, content_type='text/csv').get_json()
+    assert (body['records'], body['errorCount'], body['success']) == (3, 2, False)
+    assert [e['line'] for e in body['errors']] == [5, 6]
+    assert (body['chunks'], body['students']) == (2, 2)  # [S1, S1], [S2]: one update per student per chunk
+    s1 = client.get('/api/results/S1').get_json()
+    assert s1['cgpa'] == '4.50' and len(s1['academicHistory'][0]['courses']) == 2
+    assert client.get('/api/results/S2').get_json()['department'] == 'Law'
+
+
+def test_ndjson_merges_into_existing_semester(client, upload):
+    upload('S1', name='Ada', department='Physics', courses=(('PHY101', 40, 3), ('PHY102', 75, 3)))
+    lines = [{'matricNumber': 'S1', 'courseCode': 'PHY101', 'score': 65, 'unit': 3},
+             {'matricNumber': 'S1', 'courseCode': 'PHY103', 'score': 55, 'unit': 3}]
+    body = client.post('/api/results/bulk', data='\n'.join(map(json.dumps, lines)),
+                       content_type='application/x-ndjson').get_json()
+    assert body['success'] and body['students'] == 1
+    s1 = client.get('/api/results/S1').get_json()
+    assert (s1['name'], s1['department'], s1['cgpa']) == ('Ada', 'Physics', '4.00')
+    assert sorted(ingest._course_key(c) for c in s1['academicHistory'][0]['courses']) == [
+        'PHY101', 'PHY102', 'PHY103']
+    assert client.get('/api/stats').get_json()['total'] == 1
+
+
+def test_bad_format_and_batch_size(client):
+    assert client.post('/api/results/bulk?format=xml', data=b'').status_code == 400
+    assert client.post('/api/results/bulk?batch_size=big', data=b'').status_code == 400
+
+
+def test_index_hooks_run_after_the_table_is_released(client, nesting):
+    body = client.post('/api/results/bulk?chunk=2', data=CSV, content_type='text/csv').get_json()
+    assert body['students'] == 2
+    assert client.get('/api/stats').get_json()['total'] == 2  # the hooks still ran
+    assert nesting.deepest == 1
+
+
+def record(level, semester, code, score):
+    return {'matricNumber': 'S1', 'name': 'Ada', 'department': 'Physics', 'level': level,
+            'semester': semester, 'course': {'courseCode': code, 'score': score, 'unit': 3}}
+
+
+class RacedTable(MemoryTable):
+    """Lets another versioned writer land a semester just before the bulk chunk claims S1."""
+
+    def __init__(self, scale):
+        super().__init__('students', {'info': {}, 'academic': {'max_versions': 5}})
+        self.scale, self.raced = scale, False
+
+    def counter_inc(self, row, column, value=1):
+        if column == COL_REV and not self.raced:
+            self.raced = True
+            other = {'name': 'Ada', 'department': 'Physics',
+                     'semesters': {('100', 'Second'): [record('100', 'Second', 'PHY104', 55)['course']]}}
+            VersionedWriter(backoff=0).write(self, row, lambda: self.row(row),
+                                             lambda r: (ingest.student_cells(r, other, self.scale)[0], None))
+        return super().counter_inc(row, column, value)
+
+
+def test_chunk_retries_a_row_another_writer_won(server):
+    table, writer = RacedTable(server.GRADING), VersionedWriter(backoff=0)
+    changes, conflicts = ingest.apply_chunk(table, [record('100', 'First', 'PHY101', 75)],
+                                            server.GRADING, writer, batch_size=10)
+    assert conflicts == [] and [m for m, _, _ in changes] == ['S1']
+    row = table.row(b'S1')
+    assert row[records.COL_SEMESTERS] == b'2'  # neither write lost the other's semester
+    assert row[b'info:cgpa'] == b'4.00' and changes[0][2]['cgpa'] == '4.00'
+    assert counter_value(row, COL_REV) == counter_value(row, COL_REV_DONE)
+    assert (writer.stats()['conflicts'], writer.stats()['writes']) == (1, 1)
+
+
+def test_row_mid_write_elsewhere_is_reported_not_overwritten(server, client, upload, monkeypatch):
+    upload('S1', name='Ada', department='Physics')
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        table.counter_inc(b'S1', COL_REV)  # another process is mid-write
+    monkeypatch.setattr(server, 'WRITES', VersionedWriter(attempts=2, backoff=0, claim_timeout=60))
+    lines = [{'matricNumber': m, 'level': '100', 'semester': 'Second', 'courseCode': 'PHY104', 'score': 30}
+             for m in ('S1', 'S2')]
+    body = client.post('/api/results/bulk', data='\n'.join(map(json.dumps, lines)),
+                       content_type='application/x-ndjson').get_json()
+    assert (body['success'], body['students'], body['errorCount']) == (False, 1, 1)
+    assert body['errors'][0]['matricNumber'] == 'S1'
+    assert len(client.get('/api/results/S1').get_json()['academicHistory']) == 1
+    assert len(client.get('/api/results/S2').get_json()['academicHistory']) == 1
@@ -0,0 +1,39 @@
+def seed(upload):
+    for i in range(5):
+        upload(f'CSC{i:03d}', name=f'Ada {i}', department='Computer Science')
+    for i in range(3):
+        upload(f'MTH{i:03d}', name=f'Bo {i}', department='Mathematics')
+
+
+def matrics(body):
+    return [s['matricNumber'] for s in body['data']]
+
+
+def test_pages_follow_the_cursor(client, upload):
+    seed(upload)
+    first = client.get('/api/students?limit=3').get_json()
+    assert matrics(first) == ['CSC000', 'CSC001', 'CSC002'] and first['next'] == 'CSC002'
+    second = client.get(f"/api/students?limit=3&start_after={first['next']}").get_json()
+    assert matrics(second) == ['CSC003', 'CSC004', 'MTH000']
+    last = client.get('/api/students?limit=3&start_after=MTH000').get_json()
+    assert matrics(last) == ['MTH001', 'MTH002'] and last['next'] is None
+
+
+def test_summary_fields(client, upload):
+    upload('CSC001', name='Ada', courses=(('CSC101', 75, 3), ('CSC102', 65, 3)))
+    assert client.get('/api/students').get_json()['data'] == [
+        {'matricNumber': 'CSC001', 'name': 'Ada', 'department': 'Computer Science', 'cgpa': '4.50'}]
+
+
+def test_prefix_and_department_filters(client, upload):
+    seed(upload)
+    assert matrics(client.get('/api/students?prefix=MTH').get_json()) == ['MTH000', 'MTH001', 'MTH002']
+    body = client.get('/api/students?department=mathematics&limit=2').get_json()
+    assert matrics(body) == ['MTH000', 'MTH001'] and body['next'] == 'MTH001'
+    assert matrics(client.get('/api/students?prefix=CSC&department=Mathematics').get_json()) == []
+
+
+def test_limit_is_validated_and_clamped(client, upload):
+    seed(upload)
+    assert client.get('/api/students?limit=ten').status_code == 400
+    assert matrics(client.get('/api/students?limit=0').get_json()) == ['CSC000']
@@ -0,0 +1,80 @@
+import re
+
+import pytest
+
+import metrics
+from storage import MemoryTable
+
+
+def sample(text, name):
+    """Value of the first sample line for `name` (including any labels) in a Prometheus text body."""
+    match = re.search(r'^' + re.escape(name) + r' (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_buckets_are_cumulative():
+    h = metrics.Histogram('t_seconds', "test", ('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        h.observe(value, 'x')
+    text = '\n'.join(h.render())
+    assert sample(text, 't_seconds_bucket{op="x",le="0.1"}') == 1
+    assert sample(text, 't_seconds_bucket{op="x",le="1.0"}') == 3
+    assert sample(text, 't_seconds_bucket{op="x",le="+Inf"}') == 4
+    assert sample(text, 't_seconds_count{op="x"}') == 4 and sample(text, 't_seconds_sum{op="x"}') == 6.05
+
+
+def test_counter_and_label_escaping():
+    c = metrics.Counter('t_total', "test", ('route',))
+    c.inc('/a"b')
+    c.inc('/a"b', amount=2)
+    assert c.render()[-1] == 't_total{route="/a\\"b"} 3'
+
+
+def test_stats_gauges_skip_non_numbers_and_errors():
+    gauges = metrics.StatsGauges('t', "test", lambda: {'open': 2, 'ok': True, 'state': 'closed', 'ratio': 0.5})
+    assert [line for line in gauges.render() if not line.startswith('#')] == ['t_open 2', 't_ratio 0.5']
+    assert metrics.StatsGauges('t', "test", lambda: 1 / 0).render() == []
+
+
+def test_instrumented_table_times_calls_and_counts_errors():
+    table = metrics.InstrumentedTable(MemoryTable('t', {'info': {}}))
+    timed = lambda: sum(metrics.STORAGE_OPS._series.get(('put',), [0])[:-1])
+    before = timed()
+    table.put(b'r', {b'info:a': b'1'})
+    assert timed() == before + 1
+    assert list(table.scan()) == [(b'r', {b'info:a': b'1'})]
+    errors = metrics.STORAGE_ERRORS._values.get(('put',), 0)
+    with pytest.raises(ValueError):
+        table.put(b'r', {b'nope:a': b'1'})
+    assert metrics.STORAGE_ERRORS._values[('put',)] == errors + 1
+    assert table.name == 't'  # untimed attributes pass through
+
+
+def test_phases_collect_per_request():
+    token = metrics.begin_request()
+    with metrics.timed('grade'):
+        pass
+    with metrics.timed('grade'):
+        pass
+    phases = metrics.end_request(token)
+    assert list(phases) == ['grade']
+    assert re.fullmatch(r'grade;dur=\d+\.\d{3}, total;dur=12\.000', metrics.server_timing(phases, 0.012))
+
+
+def test_metrics_route(client, upload):
+    upload('S1')
+    client.get('/api/results/S1')
+    text = client.get('/api/metrics').get_data(as_text=True)
+    assert sample(text, 'unisemi_responses_total{route="/api/results/<matric>",method="GET",status="200"}') >= 1
+    assert 'unisemi_storage_op_seconds_count{op="row"}' in text
+    assert sample(text, 'unisemi_pool_checkouts') >= 1
+    assert 'unisemi_history_bytes_bucket' in text
+
+
+def test_server_timing_header(server, client, upload, monkeypatch):
+    upload('S1')
+    assert 'Server-Timing' not in client.get('/api/results/S1').headers
+    monkeypatch.setattr(server, 'SERVER_TIMING', True)
+    server.TRANSCRIPTS.invalidate(['S1'])
+    header = client.get('/api/results/S1').headers['Server-Timing']
+    assert 'hbase_row;dur=' in header and 'decode_history;dur=' in header and 'total;dur=' in header
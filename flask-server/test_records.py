@@ -0,0 +1,95 @@
+import json
+
+import codec
+import records
+from grading import GradingScale
+from storage import MemoryTable
+
+SCALE = GradingScale()
+
+
+def semester(level, name, *scores, unit=3):
+    return {'level': level, 'semester': name, 'gpa': '0.00',
+            'courses': [{'code': f'GEN{i}', 'score': s, 'unit': unit} for i, s in enumerate(scores)]}
+
+
+def make_table():
+    return MemoryTable('students', {'info': {}, 'academic': {'max_versions': 5}})
+
+
+def test_semester_columns_and_order():
+    assert records.semester_column('200', 'Second') == b'academic:200_Second'
+    assert records.semester_label(b'academic:200_Second') == ('200', 'Second')
+    assert not records.is_semester_column(records.COL_SUMMARY)
+    row = {records.semester_column(l, s): codec.encode(semester(l, s, 70))
+           for l, s in (('200', 'First'), ('100', 'Second'), ('100', 'First'))}
+    assert [(h['level'], h['semester']) for h in records.assemble_history(row)] == [
+        ('100', 'First'), ('100', 'Second'), ('200', 'First')]
+
+
+def test_upsert_adds_then_replaces_a_semester():
+    row = {}
+    cells, cgpa, legacy = records.upsert_semester(row, semester('100', 'First', 75, 65), SCALE)
+    assert (cgpa, legacy) == ('4.50', False)
+    assert (cells[records.COL_UNITS], cells[records.COL_POINTS], cells[records.COL_SEMESTERS]) == (b'6', b'27', b'1')
+    row.update(cells)
+
+    cells, cgpa, _ = records.upsert_semester(row, semester('100', 'Second', 55), SCALE)
+    assert (cgpa, cells[records.COL_SEMESTERS]) == ('4.00', b'2')
+    row.update(cells)
+
+    # Re-uploading a semester swaps its contribution instead of adding to it.
+    cells, cgpa, _ = records.upsert_semester(row, semester('100', 'First', 30), SCALE)
+    assert (cgpa, cells[records.COL_UNITS], cells[records.COL_SEMESTERS]) == ('1.50', b'6', b'2')
+
+
+def test_legacy_row_is_converted_on_upload():
+    history = [semester('100', 'First', 75), semester('100', 'Second', 65)]
+    row = {records.LEGACY_HISTORY: json.dumps(history).encode(), b'info:name': b'Ada'}
+    assert records.is_legacy(row) and records.needs_full_row(row)
+    assert records.row_totals(row, SCALE) == (6, 27)
+    cells, cgpa, legacy = records.upsert_semester(row, semester('100', 'Second', 55), SCALE)
+    assert legacy and cgpa == '4.00'
+    assert records.semester_column('100', 'First') in cells and cells[records.COL_SEMESTERS] == b'2'
+
+
+def test_summarise():
+    cells = {records.COL_SEMESTERS: b'2', b'info:cgpa': b'4.00', b'info:gpa': b'3.00'}
+    records.summarise(cells, 'upload', semester('100', 'Second', 55))
+    assert json.loads(cells[records.COL_SUMMARY]) == {
+        'action': 'upload', 'level': '100', 'semester': 'Second', 'semesters': 2, 'gpa': '3.00', 'cgpa': '4.00'}
+
+
+def test_migrate_converts_legacy_rows_only():
+    table = make_table()
+    table.put(b'OLD', {records.LEGACY_HISTORY: json.dumps([semester('100', 'First', 65)]).encode()})
+    cells, cgpa = records.history_cells([semester('100', 'First', 75)], SCALE)
+    cells[b'info:cgpa'] = cgpa.encode()
+    table.put(b'NEW', cells)
+
+    assert records.migrate(table, SCALE, dry_run=True) == {'scanned': 2, 'migrated': 1}
+    assert records.LEGACY_HISTORY in table.row(b'OLD')
+    assert records.migrate(table, SCALE) == {'scanned': 2, 'migrated': 1}
+    old = table.row(b'OLD')
+    assert records.LEGACY_HISTORY not in old and old[b'info:cgpa'] == b'4.00'
+    assert [h['courses'][0]['score'] for h in records.assemble_history(old)] == [65]
+    assert records.migrate(table, SCALE)['migrated'] == 0
+
+
+def test_reencode_rewrites_json_cells_in_place():
+    table = make_table()
+    column = records.semester_column('100', 'First')
+    table.put(b'S', {column: json.dumps(semester('100', 'First', 75)).encode()}, timestamp=1000)
+    report = records.reencode(table, 'binary')
+    assert (report['cells'], report['rewritten']) == (1, 1)
+    assert table.cells(b'S', column, include_timestamp=True)[0][1] == 1000
+    assert codec.is_binary(table.row(b'S')[column])
+    assert records.reencode(table, 'binary')['rewritten'] == 0
+
+
+def test_uploads_touch_one_semester(client, upload):
+    upload('S1', courses=(('CSC101', 75, 3),))
+    upload('S1', level='200', courses=(('CSC201', 55, 3),))
+    assert upload('S1', level='100', courses=(('CSC101', 65, 3),))['cgpa'] == '3.50'
+    body = client.get('/api/results/S1').get_json()
+    assert [(h['level'], h['gpa']) for h in body['academicHistory']] == [('100', '4.00'), ('200', '3.00')]
@@ -0,0 +1,115 @@
+import search
+from search import SearchIndex
+
+STUDENTS = [
+    ('CSC/2015/001', 'Adébáyọ̀ Ogunlesi', 'Computer Science', '4.50'),
+    ('CSC/2015/002', 'Ada Lovelace', 'Computer Science', '4.90'),
+    ('EEE/2016/010', 'Adamu Bello', 'Electrical', '3.20'),
+    ('MTH/2017/100', 'Chiamaka Nwosu', 'Mathematics', '3.80'),
+]
+
+
+def built(students=STUDENTS):
+    index = SearchIndex(None)
+    index.build(iter(students))
+    return index
+
+
+def found(index, query, limit=search.DEFAULT_LIMIT):
+    return [(r['matricNumber'], r['match']) for r in index.search(query, limit)]
+
+
+def student(name, department='Computer Science', cgpa='4.00'):
+    return {'name': name, 'department': department, 'cgpa': cgpa}
+
+
+def test_text_helpers():
+    assert search.normalise('Adébáyọ̀') == 'adebayo'
+    assert search.squash('CSC/2015/001') == 'csc2015001'
+    assert search.edit_distance('lovelace', 'lovelcae', 2) == 1  # a swap is one edit
+    assert search.edit_distance('ada', 'bello', 1) == 2
+    assert search.edit_distance('ogun', 'ogunlesi', 1, prefix=True) == 0
+    assert b'csc2015002' in search.one_edit_variants('csc2015001')
+
+
+def test_exact_then_prefix_matches():
+    index = built()
+    assert found(index, 'ada') == [('CSC/2015/002', 'exact'), ('EEE/2016/010', 'prefix')]
+    assert found(index, 'adebayo') == [('CSC/2015/001', 'exact')]  # accents don't matter
+    assert found(index, 'ADA lov') == [('CSC/2015/002', 'prefix')]
+    assert found(index, 'ada', limit=1) == [('CSC/2015/002', 'exact')]
+    assert found(index, '  !! ') == []
+
+
+def test_full_matric_is_an_exact_match():
+    index = built()
+    assert found(index, 'CSC/2015/001') == [('CSC/2015/001', 'exact')]
+    # Typed without the slashes, its neighbour one digit away follows as a fuzzy match.
+    assert found(index, 'csc2015001') == [('CSC/2015/001', 'exact'), ('CSC/2015/002', 'fuzzy')]
+    assert found(index, 'CSC/2015') == [('CSC/2015/001', 'prefix'), ('CSC/2015/002', 'prefix')]
+
+
+def test_fuzzy_names_and_matrics():
+    index = built()
+    assert found(index, 'chiamka') == [('MTH/2017/100', 'fuzzy')]
+    assert found(index, 'lovelcae ada') == [('CSC/2015/002', 'fuzzy')]
+    assert found(index, 'lovelcae bello') == []  # every word has to match something
+    assert found(index, 'mth2017101') == [('MTH/2017/100', 'fuzzy')]
+    assert found(index, 'xyz') == []  # too short to be a typo of anything
+
+
+def test_writes_update_the_index():
+    index = built()
+    index.record_changes([
+        ('CSC/2015/002', student('Ada Lovelace'), student('Ada Byron', cgpa='5.00')),  # renamed
+        ('EEE/2016/010', student('Adamu Bello'), None),                               # deleted
+        ('PHY/2018/007', None, student('Grace Hopper', 'Physics')),                    # added
+    ])
+    assert found(index, 'lovelace') == [] and found(index, 'byron') == [('CSC/2015/002', 'exact')]
+    assert found(index, 'ada') == [('CSC/2015/002', 'exact')]
+    assert found(index, 'hopper') == [('PHY/2018/007', 'exact')]
+    assert found(index, 'hoper') == [('PHY/2018/007', 'fuzzy')]
+    index.record_changes([('PHY/2018/007', None, student('Grace Hopper', 'Physics', '4.75'))])
+    assert index.search('grace')[0]['cgpa'] == '4.75'  # same name: updated in place
+    assert index.stats()['students'] == 4
+
+
+def test_delta_merges_and_compacts(monkeypatch):
+    monkeypatch.setattr(search, 'DELTA_LIMIT', 3)
+    index = built()
+    for i in range(6):
+        index.record_changes([(f'NEW/{i}', None, student(f'Student{i} Rename'))])
+    for i in range(6):
+        index.record_changes([(f'NEW/{i}', None, None)])
+    stats = index.stats()
+    assert stats['merges'] >= 2 and stats['students'] == 4
+    assert found(index, 'rename') == [] and found(index, 'ada')[0] == ('CSC/2015/002', 'exact')
+
+
+def test_writes_during_the_build_are_replayed():
+    index = SearchIndex(None)
+
+    def students():
+        yield STUDENTS[0]
+        index.record_changes([('LATE/1', None, student('Late Comer'))])  # lands mid-scan
+        yield STUDENTS[1]
+    index._state = 'building'
+    index.build(students())
+    assert found(index, 'comer') == [('LATE/1', 'exact')] and index.stats()['students'] == 3
+
+
+def test_search_route(client, upload):
+    assert client.get('/api/search').status_code == 400
+    assert client.get('/api/search?q=ada&limit=x').status_code == 400
+    upload('CSC1', name='Ada Lovelace')
+    upload('CSC2', name='Adamu Bello')
+    body = client.get('/api/search?q=ada').get_json()
+    assert body['query'] == 'ada' and body['count'] == 2
+    assert body['data'][0] == {'matricNumber': 'CSC1', 'name': 'Ada Lovelace',
+                               'department': 'Computer Science', 'cgpa': '5.00', 'match': 'exact'}
+    assert client.get('/api/search?q=ada&limit=1').get_json()['count'] == 1
+
+    upload('CSC3', name='Grace Hopper')  # after the build: goes in through record_changes
+    assert client.get('/api/search?q=hopper').get_json()['data'][0]['matricNumber'] == 'CSC3'
+    assert client.delete('/api/results/CSC3').status_code == 200
+    assert client.get('/api/search?q=hopper').get_json()['count'] == 0
@@ -0,0 +1,155 @@
+import http.client
+import threading
+import time
+
+import pytest
+from flask import Flask
+from werkzeug.test import Client
+
+import serve
+
+
+def blocking_app():
+    app = Flask('blocking')
+    release = threading.Event()
+    entered = threading.Semaphore(0)
+
+    @app.route('/slow')
+    def slow():
+        entered.release()
+        release.wait(5)
+        return 'done'
+
+    @app.route('/fast')
+    def fast():
+        return 'ok'
+    return app, release, entered
+
+
+def test_parse_limits():
+    assert serve.parse_limits(' a=1, b=2,,') == {'a': 1, 'b': 2}
+    assert serve.parse_limits(serve.DEFAULT_ROUTE_LIMITS)['bulk_upload_results'] == 2
+
+
+def test_route_limiter_answers_429_past_the_limit():
+    app, release, entered = blocking_app()
+    limiter = serve.RouteLimiter(app, {'slow': 1})
+    client = Client(limiter)
+    first = threading.Thread(target=lambda: client.get('/slow').close())
+    first.start()
+    assert entered.acquire(timeout=5)
+
+    busy = client.get('/slow')
+    assert busy.status_code == 429 and busy.headers['Retry-After'] == str(serve.RETRY_AFTER)
+    assert client.get('/fast').status_code == 200  # other routes are unaffected
+    assert limiter.stats()['active'] == {'slow': 1}
+
+    release.set()
+    first.join(5)
+    assert limiter.stats()['active'] == {} and limiter.stats()['rejected_by_route'] == {'slow': 1}
+    assert client.get('/slow').status_code == 200
+
+
+def test_route_limiter_holds_the_slot_until_a_stream_closes():
+    app = Flask('streaming')
+
+    @app.route('/stream')
+    def stream():
+        return app.response_class(iter(['a', 'b']))
+    limiter = serve.RouteLimiter(app, {'stream': 1})
+    response = Client(limiter).get('/stream', buffered=False)
+    assert limiter.stats()['active'] == {'stream': 1}
+    response.close()
+    assert limiter.stats()['active'] == {}
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def get(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    connection.request('GET', path)
+    response = connection.getresponse()
+    return response.status, response.getheader('Retry-After'), response.read()
+
+
+@pytest.fixture
+def bounded():
+    app, release, entered = blocking_app()
+    httpd = serve.BoundedWSGIServer('127.0.0.1', 0, app, workers=1, queue_depth=1)
+    accept_loop = threading.Thread(target=httpd.serve_forever, daemon=True)
+    accept_loop.start()
+    yield httpd, release, entered
+    release.set()
+    httpd.shutdown()
+    httpd.server_close()
+    httpd.drain(5)
+
+
+def test_full_queue_answers_503(bounded):
+    httpd, release, entered = bounded
+    results = []
+    worker = threading.Thread(target=lambda: results.append(get(httpd.port, '/slow')))
+    worker.start()
+    assert entered.acquire(timeout=5)
+    queued = threading.Thread(target=lambda: results.append(get(httpd.port, '/fast')))
+    queued.start()
+    assert wait_until(lambda: httpd.stats()['queued'])
+
+    status, retry_after, _ = get(httpd.port, '/fast')
+    assert (status, retry_after) == (503, str(serve.RETRY_AFTER))
+    release.set()
+    worker.join(5)
+    queued.join(5)
+    assert sorted(r[0] for r in results) == [200, 200]
+    assert wait_until(lambda: httpd.stats()['served'] == 2) and httpd.stats()['rejected'] == 1
+
+
+def test_drain_refuses_new_connections_and_finishes_in_flight(bounded):
+    httpd, release, entered = bounded
+    results = []
+    in_flight = threading.Thread(target=lambda: results.append(get(httpd.port, '/slow')))
+    in_flight.start()
+    assert entered.acquire(timeout=5)
+
+    httpd.shutdown()
+    httpd.server_close()
+    # Refused (or reset) at once instead of waiting unanswered in the backlog.
+    with pytest.raises((ConnectionRefusedError, ConnectionResetError)):
+        get(httpd.port, '/fast')
+    release.set()
+    assert httpd.drain(5)
+    in_flight.join(5)
+    assert results == [(200, None, b'done')]
+
+
+class FakeServer:
+    def __init__(self, stats):
+        self.storage = type('Storage', (), {'stats': lambda _: stats})()
+
+
+def test_default_workers_leave_room_for_background_connections():
+    assert serve.default_workers(FakeServer({'size': 10})) == 10 - serve.BACKGROUND_CONNECTIONS
+    assert serve.default_workers(FakeServer({'size': 2})) == 1
+    assert serve.default_workers(FakeServer({'backend': 'memory'})) == 10
+
+
+def test_no_route_holds_two_connections(server, nesting):
+    # workers + background holders fit the pool only while every request takes one connection at a time.
+    import random
+    import bench
+    rng = random.Random(7)
+    bench.seed(20, 2, 2, rng)
+    scenarios = bench.build_scenarios(20, 2, 2, rng)
+    nesting.deepest = 0  # seeding isn't a request
+    client = server.app.test_client()
+    for name, fn, *expected in scenarios:
+        status = fn(client).status_code
+        assert status < 400 or status in (expected or [()])[0], name
+    assert client.post('/api/index/rebuild').status_code == 200
+    assert client.post('/api/stats/rebuild').status_code == 200
+    assert nesting.deepest == 1
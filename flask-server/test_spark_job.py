@@ -0,0 +1,134 @@
+import json
+import shutil
+
+import pytest
+
+import records
+import spark_job
+from grading import GradingScale, parse_bands
+from writes import COL_REV, COL_REV_DONE, VersionedWriter, counter_value
+
+SCALE = GradingScale()
+
+
+def result_row(matric, units, points, cgpa, gpa='4.00', semesters=(('academic:100_First', '4.00', ()),), rev=0):
+    return {'matricNumber': matric, 'rev': rev, 'units': units, 'points': points, 'cgpa': cgpa, 'latest_gpa': gpa,
+            'semesters': [{'column': column, 'units': 0, 'points': 0, 'gpa': sem_gpa,
+                           'grades': [{'pos': i, 'grade': g} for i, g in enumerate(grades)]}
+                          for column, sem_gpa, grades in semesters]}
+
+
+def stored_semester(table, matric, semester='First'):
+    return records.decode_semester(table.row(matric.encode())[records.semester_column('100', semester)])
+
+
+def test_write_rows_regrades_in_place(server, upload):
+    upload('S1', courses=(('CSC101', 75, 3), ('CSC102', 65, 3)))
+    upload('S1', semester='Second', courses=(('CSC103', 55, 3),))
+    upload('S2')
+    upload('S3')
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        revs = {m: counter_value(table.row(m.encode()), COL_REV) for m in ('S1', 'S2', 'S3')}
+        table.put(b'OLD', {records.LEGACY_HISTORY: json.dumps([{'level': '100', 'semester': 'First', 'gpa': '5.00',
+                    'courses': [{'code': 'X', 'score': 75, 'unit': 3, 'grade': 'A'}]}]).encode()})
+        first = stored_semester(table, 'S1')
+    upload('S2', semester='Second')  # written after the snapshot
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        table.counter_inc(b'S3', COL_REV)  # mid-write elsewhere
+
+        report = spark_job.write_rows(table, [
+            result_row('S1', 9, 27, '3.00', '2.00', rev=revs['S1'], semesters=(
+                ('academic:100_First', '3.50', ('B', 'C')), ('academic:100_Second', '2.00', ('D',)))),
+            result_row('S2', 3, 3, '1.00', rev=revs['S2']),
+            result_row('S3', 3, 3, '1.00', rev=revs['S3']),
+            result_row('OLD', 3, 12, '4.00', semesters=(('academic:100_First', '4.00', ('B',)),)),
+            result_row('GONE', 3, 15, '5.00'),  # deleted since the snapshot
+        ], VersionedWriter(backoff=0), batch_size=2)
+        assert report == {'written': 2, 'skipped': 2}
+
+        s1 = table.row(b'S1')
+        assert (s1[records.COL_UNITS], s1[records.COL_POINTS], s1[records.COL_SEMESTERS]) == (b'9', b'27', b'2')
+        assert (s1[b'info:cgpa'], s1[b'info:gpa']) == (b'3.00', b'2.00')
+        assert json.loads(s1[records.COL_SUMMARY])['action'] == 'recompute'
+        assert counter_value(s1, COL_REV) == counter_value(s1, COL_REV_DONE) == revs['S1'] + 1
+        regraded = stored_semester(table, 'S1')
+        assert regraded['gpa'] == '3.50' and [c['grade'] for c in regraded['courses']] == ['B', 'C']
+        assert [{k: v for k, v in c.items() if k != 'grade'} for c in regraded['courses']] == [
+            {k: v for k, v in c.items() if k != 'grade'} for c in first['courses']]
+        assert [c['grade'] for c in stored_semester(table, 'S1', 'Second')['courses']] == ['D']
+        for skipped in ('S2', 'S3'):
+            assert table.row(skipped.encode())[b'info:cgpa'] == b'5.00'
+        old = table.row(b'OLD')
+        assert old[b'info:cgpa'] == b'4.00' and records.COL_UNITS not in old
+        assert records.COL_SUMMARY not in old
+        [sem] = json.loads(old[records.LEGACY_HISTORY])
+        assert (sem['gpa'], sem['courses'][0]['grade'], sem['courses'][0]['score']) == ('4.00', 'B', 75)
+        assert table.row(b'GONE') == {}
+
+
+def test_totals_cells_strip_thousands_separators():
+    cells = spark_job.totals_cells(result_row('S', 3000, 15000, '1,234.00', '1,000.00'))
+    assert (cells[b'info:cgpa'], cells[b'info:gpa']) == (b'1234.00', b'1000.00')
+
+
+def test_snapshot_round_trips_history(server, upload, tmp_path):
+    upload('S1', name='Ada', courses=(('CSC101', 75, 3),))
+    path = tmp_path / 'snapshot.ndjson'
+    assert spark_job.write_snapshot(str(path)) == 1
+    row = json.loads(path.read_text())
+    assert (row['matricNumber'], row['name']) == ('S1', 'Ada')
+    assert row['academicHistory'][0]['courses'][0]['score'] == 75
+    assert row['rev'] == 1  # one versioned upload
+
+
+needs_jvm = pytest.mark.skipif(shutil.which('java') is None, reason="Spark needs a JVM")
+
+
+def run_local(path, scale):
+    from pyspark.sql import SparkSession
+
+    spark = SparkSession.builder.master('local[*]').getOrCreate()
+    try:
+        return spark_job.recompute(spark.read.schema(spark_job.snapshot_schema()).json(str(path)), scale).collect()
+    finally:
+        spark.stop()
+
+
+@needs_jvm
+def test_recompute_matches_grading(tmp_path):
+    courses = [{'code': 'A', 'score': 75, 'unit': 3}, {'code': 'B', 'score': 'x', 'unit': 2},
+               {'code': 'C', 'score': 65}, {'code': 'D', 'score': 55, 'unit': None},
+               {'code': 'E', 'score': 65, 'unit': 'two'}]
+    history = [{'level': '100', 'semester': 'First', 'courses': courses},
+               {'level': '100', 'semester': 'Second', 'courses': []}]
+    path = tmp_path / 'snapshot.ndjson'
+    path.write_text(json.dumps({'matricNumber': 'S1', 'name': '', 'department': '', 'academicHistory': history}))
+
+    [row] = run_local(path, SCALE)
+    units, points = map(sum, zip(*SCALE.semester_totals(history)))
+    assert (row['units'], row['points']) == (units, points)
+    assert row['cgpa'] == records.format_cgpa(units, points)
+    assert row['latest_gpa'] == '0.00' and len(row['semesters']) == 2
+    assert row['rev'] == 0  # no "rev" in the line
+    semesters = {cell['column']: cell for cell in row['semesters']}
+    assert [(g['pos'], g['grade']) for g in semesters['academic:100_First']['grades']] == [
+        (0, 'A'), (1, 'F'), (2, 'B'), (3, 'C'), (4, 'B')]
+    assert semesters['academic:100_Second']['grades'] == []
+
+
+@needs_jvm
+def test_local_run_regrades_the_registry(server, client, upload, tmp_path):
+    upload('S1', courses=(('CSC101', 75, 3), ('CSC102', 65, 3)))
+    upload('S1', semester='Second', courses=(('CSC103', 55, 3),))
+    path = tmp_path / 'snapshot.ndjson'
+    spark_job.write_snapshot(str(path))
+
+    rows = run_local(path, GradingScale(parse_bands('80:A:5,70:B:4,60:C:3,50:D:2,0:F:0')))
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        assert spark_job.write_rows(table, rows) == {'written': 1, 'skipped': 0}
+    server.TRANSCRIPTS.invalidate(['S1'])
+    body = client.get('/api/results/S1').get_json()
+    history = body['academicHistory']
+    assert [[c['grade'] for c in sem['courses']] for sem in history] == [['B', 'C'], ['D']]
+    assert [[c['score'] for c in sem['courses']] for sem in history] == [[75, 65], [55]]
+    assert [sem['gpa'] for sem in history] == ['3.50', '2.00'] and body['cgpa'] == '3.00'
@@ -0,0 +1,79 @@
+import stats
+from storage import MemoryTable
+
+
+def make_table():
+    return MemoryTable(stats.TABLE_STATS, stats.STATS_FAMILIES)
+
+
+def test_record_changes_tracks_totals_and_max():
+    table = make_table()
+    stats.record_changes(table, [(None, ('Physics', '4.00')), (None, ('Physics', '3.00')),
+                                 (None, ('Law', '2.50'))])
+    result = stats.read_stats(table)
+    assert (result['total'], result['avgCGPA'], result['highestCGPA']) == (3, '3.17', '4.00')
+    by_name = {d['department']: d for d in result['departments']}
+    assert by_name['Physics'] == {'department': 'Physics', 'total': 2, 'avgCGPA': '3.50', 'highestCGPA': '4.00'}
+
+    # The best student leaves; the histogram still knows the next-highest CGPA.
+    stats.record_change(table, ('Physics', '4.00'), None)
+    physics = {d['department']: d for d in stats.read_stats(table)['departments']}['Physics']
+    assert (physics['total'], physics['highestCGPA']) == (1, '3.00')
+
+
+def test_departments_are_case_and_space_insensitive():
+    table = make_table()
+    stats.record_changes(table, [(None, ('Computer Science', '4.00')), (None, ('computer science ', '3.00'))])
+    departments = stats.read_stats(table)['departments']
+    assert len(departments) == 1 and departments[0]['total'] == 2
+    assert departments[0]['department'].lower() == 'computer science'
+
+
+def test_moving_department_empties_the_old_one():
+    table = make_table()
+    stats.record_change(table, None, ('Law', '3.00'))
+    stats.record_change(table, ('Law', '3.00'), ('Physics', '3.00'))
+    result = stats.read_stats(table)
+    assert result['total'] == 1 and [d['department'] for d in result['departments']] == ['Physics']
+
+
+class RecordingTable(MemoryTable):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.ops = []
+
+    def put(self, row, data, timestamp=None, wal=True):
+        self.ops.append(('put', row))
+        super().put(row, data, timestamp, wal)
+
+    def delete(self, row, columns=None, timestamp=None, wal=True):
+        self.ops.append(('delete', row))
+        super().delete(row, columns, timestamp, wal)
+
+
+def test_rebuild_writes_before_deleting_stale_rows(server, upload):
+    upload('A1', department='Physics', courses=(('PHY101', 75, 3),))
+    upload('A2', department='physics', courses=(('PHY101', 55, 3),))
+    table = RecordingTable(stats.TABLE_STATS, stats.STATS_FAMILIES)
+    stats.record_change(table, None, ('Gone', '1.00'))
+    stats.record_change(table, None, ('Physics', '1.00'))
+    table.ops.clear()
+    with server.get_db(server.TABLE_STUDENTS) as students:
+        assert stats.rebuild(students, table) == 2
+
+    kinds = [op for op, _ in table.ops]
+    assert kinds.index('delete') > max(i for i, op in enumerate(kinds) if op == 'put')
+    result = stats.read_stats(table)
+    assert result['total'] == 2 and result['highestCGPA'] == '5.00'
+    assert [(d['department'], d['total'], d['avgCGPA']) for d in result['departments']] == [('Physics', 2, '4.00')]
+    assert table.row(stats.dept_row('Gone')) == {}
+    # No bucket left over from the pre-rebuild 1.00 student.
+    assert stats.bucket_column(100) not in table.row(stats.dept_row('physics'))
+
+
+def test_stats_route_and_rebuild_route(client, upload):
+    upload('A1', department='Law', courses=(('LAW101', 65, 3),))
+    assert client.get('/api/stats').get_json()['avgCGPA'] == '4.00'
+    body = client.post('/api/stats/rebuild').get_json()
+    assert body == {'success': True, 'students': 1}
+    assert client.get('/api/stats').get_json()['departments'][0]['department'] == 'Law'
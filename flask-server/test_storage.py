@@ -0,0 +1,111 @@
+import struct
+
+import pytest
+
+import bench
+from storage import MemoryStorage, MemoryTable, make_storage, row_prefix_stop
+
+
+def make_table():
+    return MemoryTable('t', {'info': {'max_versions': 2}, 'academic': {}})
+
+
+def test_row_prefix_stop():
+    assert row_prefix_stop(b'CSC') == b'CSD'
+    assert row_prefix_stop(b'A\xff') == b'B'
+    assert row_prefix_stop(b'\xff\xff') is None
+
+
+def test_scan_is_sorted_and_bounded():
+    table = make_table()
+    for key in (b'b2', b'a1', b'c3', b'b1'):
+        table.put(key, {b'info:name': key})
+    assert [k for k, _ in table.scan()] == [b'a1', b'b1', b'b2', b'c3']
+    assert [k for k, _ in table.scan(row_prefix=b'b')] == [b'b1', b'b2']
+    assert [k for k, _ in table.scan(row_start=b'b2', row_stop=b'c3')] == [b'b2']
+    assert [k for k, _ in table.scan(row_start=b'c', reverse=True, limit=2)] == [b'b2', b'b1']
+    assert [k for k, _ in table.scan(batch_size=1, limit=3)] == [b'a1', b'b1', b'b2']
+
+
+def test_columns_and_families():
+    table = make_table()
+    table.put(b'r', {b'info:name': b'Ada', b'info:dept': b'CSC', b'academic:x': b'1'})
+    assert table.row(b'r', columns=[b'info:name']) == {b'info:name': b'Ada'}
+    assert set(table.row(b'r', columns=[b'info'])) == {b'info:name', b'info:dept'}
+    assert table.rows([b'r', b'missing'], columns=[b'academic']) == [(b'r', {b'academic:x': b'1'})]
+    with pytest.raises(ValueError):
+        table.put(b'r', {b'nope:x': b'1'})
+
+
+def test_versions_are_trimmed_to_max_versions():
+    table = make_table()
+    for ts, value in ((1, b'a'), (3, b'c'), (2, b'b')):
+        table.put(b'r', {b'info:name': value}, timestamp=ts)
+    assert table.cells(b'r', b'info:name', include_timestamp=True) == [(b'c', 3), (b'b', 2)]
+    assert table.row(b'r', timestamp=3) == {b'info:name': b'b'}
+
+
+def test_delete_columns_then_row():
+    table = make_table()
+    table.put(b'r', {b'info:name': b'Ada', b'info:dept': b'CSC'})
+    table.delete(b'r', columns=[b'info:dept'])
+    assert table.row(b'r') == {b'info:name': b'Ada'}
+    table.delete(b'r')
+    assert table.row(b'r') == {} and len(table) == 0
+
+
+def test_batch_applies_on_exit_and_every_batch_size():
+    table = make_table()
+    with table.batch(batch_size=2) as batch:
+        batch.put(b'a', {b'info:name': b'1'})
+        assert len(table) == 0
+        batch.put(b'b', {b'info:name': b'2'})
+        assert len(table) == 2
+        batch.delete(b'a')
+        batch.put(b'c', {b'info:name': b'3'})
+    assert [k for k, _ in table.scan()] == [b'b', b'c']
+
+
+def test_counters():
+    table = make_table()
+    assert table.counter_inc(b'r', b'info:n') == 1
+    assert table.counter_inc(b'r', b'info:n', 5) == 6
+    assert table.counter_dec(b'r', b'info:n') == 5
+    assert table.row(b'r')[b'info:n'] == struct.pack('>q', 5)
+    table.counter_set(b'r', b'info:n', 42)
+    assert table.counter_get(b'r', b'info:n') == 42
+
+
+def test_make_storage():
+    assert isinstance(make_storage('memory'), MemoryStorage)
+    with pytest.raises(ValueError):
+        make_storage('cassandra')
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def get_data(self):
+        return b''
+
+    def close(self):
+        pass
+
+
+def test_bench_counts_unexpected_errors_only():
+    statuses = iter([200, 404, 409, 500, 404])
+    result = bench.run_scenario(None, lambda client: Response(next(statuses)), 5, 0, expected={404})
+    assert result['requests'] == 5 and result['errors'] == 2
+    statuses = iter([200, 400, 404])
+    assert bench.run_scenario(None, lambda client: Response(next(statuses)), 3, 0)['errors'] == 2
+
+
+def test_bench_scenarios_run_clean(server):
+    import random
+    rng = random.Random(1)
+    bench.seed(40, 2, 3, rng)
+    client = server.app.test_client()
+    for name, fn, *expected in bench.build_scenarios(40, 2, 3, rng):
+        result = bench.run_scenario(client, fn, 2, 0, *expected)
+        assert result['errors'] == 0, name
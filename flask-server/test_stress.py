@@ -0,0 +1,58 @@
+import argparse
+import random
+from collections import Counter
+
+import pytest
+
+import stress
+
+
+def test_students_are_the_same_in_every_process():
+    assert stress.make_student(7, 42) == stress.make_student(7, 42)
+    matric, name, dept, history = stress.make_student(7, 42)
+    assert matric == stress.make_matric(42) and name == 'Student 42'
+    assert 8 <= len(history) <= 10 and (history[0]['level'], history[0]['semester']) == ('100', 'First')
+
+
+def test_zipf_skews_toward_the_head():
+    keys = stress.ZipfKeys(1000, 1.2, seed=1)
+    rng = random.Random(1)
+    counts = Counter(keys.sample(rng) for _ in range(5000))
+    assert counts[keys.ranking[0]] > counts[keys.ranking[500]] * 20
+    uniform = stress.ZipfKeys(10, 0, seed=1)
+    assert set(uniform.sample(rng) for _ in range(500)) == set(range(10))
+
+
+def test_parse_mix():
+    assert stress.parse_mix('lookup=3, upload=1') == {'lookup': 3.0, 'upload': 1.0}
+    for bad in ('fetch=1', 'lookup=x', 'lookup=-1', 'lookup=0'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            stress.parse_mix(bad)
+
+
+def test_summarize():
+    summary = stress.summarize([float(i) for i in range(100, 0, -1)], Counter({'HTTP 503': 2}), 2.0)
+    assert (summary['requests'], summary['errors'], summary['throughput_rps']) == (100, 2, 50.0)
+    assert (summary['p50_ms'], summary['p99_ms'], summary['max_ms']) == (50.0, 99.0, 100.0)
+    assert summary['error_kinds'] == {'HTTP 503': 2}
+
+
+def test_storage_target_runs_every_operation(server):
+    stress.seed_storage(server, 20, seed=3, log_events=50)
+    target = stress.StorageTarget(server)
+    rng = random.Random(3)
+    for op in stress.OPERATIONS:
+        assert stress.call(target, op, 5, rng) is None
+    assert target.lookup('NOBODY') == 'not found'
+
+
+def test_storage_target_upload_goes_through_the_coalescer(server, client):
+    target = stress.StorageTarget(server)
+    submitted = server.UPLOADS.stats()['submitted']
+    matric, name, _, dept = stress.identity(1)
+    target.upload(matric, name, dept, {'level': '100', 'semester': 'First',
+                                       'courses': [{'code': 'X', 'score': 75, 'unit': 3}]})
+    assert server.UPLOADS.stats()['submitted'] == submitted + 1
+    body = client.get(f'/api/results/{matric}').get_json()
+    assert body['cgpa'] == '5.00' and body['academicHistory'][0]['gpa'] == '5.00'
+    assert client.get('/api/stats').get_json()['total'] == 1
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def three_writes(upload):
+    # Versions are write timestamps in ms: keep the writes apart.
+    upload('S1', courses=(('CSC101', 75, 3),))
+    time.sleep(0.005)
+    upload('S1', semester='Second', courses=(('CSC102', 55, 3),))
+    time.sleep(0.005)
+    upload('S1', semester='Second', courses=(('CSC102', 65, 3), ('CSC104', 47, 3)))
+    return 'S1'
+
+
+def test_history_lists_summaries_newest_first(client, three_writes):
+    entries = client.get('/api/history/S1').get_json()
+    assert [e['action'] for e in entries] == [
+        "Uploaded 100 Lvl Second Sem", "Uploaded 100 Lvl Second Sem", "Uploaded 100 Lvl First Sem"]
+    assert [e['total_semesters'] for e in entries] == [2, 2, 1]
+    assert [e['cgpa'] for e in entries] == ['3.67', '4.00', '5.00']
+    assert entries[0]['version'] > entries[1]['version'] > entries[2]['version']
+    assert client.get('/api/history/NOBODY').get_json() == []
+
+
+def test_snapshot_at_a_version(client, three_writes):
+    entries = client.get('/api/history/S1').get_json()
+    oldest = client.get(f"/api/history/S1/{entries[2]['version']}").get_json()
+    assert [s['semester'] for s in oldest['academicHistory']] == ['First']
+    middle = client.get(f"/api/history/S1/{entries[1]['version']}").get_json()
+    assert [c['code'] for c in middle['academicHistory'][1]['courses']] == ['CSC102']
+    assert middle['cgpa'] == '4.00' and middle['matricNumber'] == 'S1'
+    assert client.get(f"/api/history/S1/{entries[0]['version'] + 1}").status_code == 404
+
+
+def test_diff_defaults_to_the_last_two_writes(client, three_writes):
+    result = client.get('/api/history/S1/diff').get_json()
+    [change] = result['semesters']
+    assert (change['level'], change['semester'], change['change']) == ('100', 'Second', 'changed')
+    assert [c['code'] for c in change['courses']['added']] == ['CSC104']
+    assert [c['courseCode'] for c in change['courses']['changed']] == ['CSC102']
+    assert change['courses']['removed'] == []
+
+
+def test_diff_between_chosen_versions(client, three_writes):
+    versions = [e['version'] for e in client.get('/api/history/S1').get_json()]
+    result = client.get(f'/api/history/S1/diff?from={versions[2]}&to={versions[0]}').get_json()
+    assert [(s['semester'], s['change']) for s in result['semesters']] == [('Second', 'added')]
+    assert result['cgpa'] == {'from': '5.00', 'to': '3.67'}
+    same = client.get(f'/api/history/S1/diff?from={versions[0]}&to={versions[0]}').get_json()
+    assert same['semesters'] == []
+
+
+def test_diff_errors(client, upload):
+    upload('S1')
+    assert client.get('/api/history/S1/diff').status_code == 404  # only one version
+    assert client.get('/api/history/S1/diff?from=x&to=1').status_code == 400
+    assert client.get('/api/history/S1/diff?from=1&to=2').status_code == 404
@@ -0,0 +1,212 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import records
+import writes
+from storage import MemoryTable
+from writes import COL_REV, COL_REV_DONE, Coalescer, VersionedWriter, WriteConflict, counter_value
+
+KEY = b'S1'
+SEMESTERS = [(str(level), name) for level in range(100, 1100, 100) for name in ('First', 'Second')]
+
+
+def make_table():
+    return MemoryTable('students', {'info': {}})
+
+
+def write_once(writer, table, value=b'1', build_hook=None):
+    def build(row):
+        if build_hook:
+            build_hook()
+        return {b'info:x': value}, 'ok'
+    return writer.write(table, KEY, lambda: table.row(KEY), build)
+
+
+def test_versioned_write_bumps_both_counters():
+    table, writer = make_table(), VersionedWriter(backoff=0)
+    assert write_once(writer, table) == ({}, 'ok')
+    row = table.row(KEY)
+    assert row[b'info:x'] == b'1' and counter_value(row, COL_REV) == counter_value(row, COL_REV_DONE) == 1
+    assert writer.stats()['writes'] == 1
+
+
+def test_lost_claim_retries_from_a_fresh_read():
+    table, writer = make_table(), VersionedWriter(backoff=0)
+    raced = []
+
+    def other_writer_claims_first():
+        if not raced:
+            raced.append(True)
+            table.counter_inc(KEY, COL_REV)
+            table.counter_inc(KEY, COL_REV_DONE)
+    row, _ = write_once(writer, table, build_hook=other_writer_claims_first)
+    assert counter_value(row, COL_REV) == 2  # the retry read the other write and the returned claim
+    stats = writer.stats()
+    assert (stats['conflicts'], stats['writes']) == (1, 1)
+    # The lost claim was given back, so the row isn't left looking busy.
+    final = table.row(KEY)
+    assert counter_value(final, COL_REV) == counter_value(final, COL_REV_DONE) == 3
+
+
+def test_write_in_flight_is_waited_on_then_given_up():
+    table, writer = make_table(), VersionedWriter(attempts=3, backoff=0, claim_timeout=60)
+    table.counter_inc(KEY, COL_REV)  # claimed, never finished
+    with pytest.raises(WriteConflict):
+        write_once(writer, table)
+    assert b'info:x' not in table.row(KEY)
+    stats = writer.stats()
+    assert (stats['in_flight_waits'], stats['exhausted'], stats['writes']) == (3, 1, 0)
+
+
+def test_stale_claim_is_written_off():
+    table, writer = make_table(), VersionedWriter(backoff=0, claim_timeout=0)
+    table.counter_inc(KEY, COL_REV)  # left behind by a crashed writer
+    write_once(writer, table)
+    row = table.row(KEY)
+    assert row[b'info:x'] == b'1' and counter_value(row, COL_REV) == counter_value(row, COL_REV_DONE) == 2
+    assert writer.stats()['stale_claims'] == 1
+
+
+def test_racing_writers_never_lose_an_update():
+    table, writer = make_table(), VersionedWriter(attempts=100, backoff=0.0005)
+
+    def add(i):
+        def build(row):
+            current = row.get(b'info:items', b'')
+            return {b'info:items': current + b'%d,' % i}, None
+        writer.write(table, KEY, lambda: table.row(KEY), build)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(add, range(40)))
+    items = table.row(KEY)[b'info:items'].decode().rstrip(',').split(',')
+    assert sorted(map(int, items)) == list(range(40))
+    assert writer.stats()['writes'] == 40
+
+
+def test_coalescer_batches_queued_items_per_key():
+    release, started = threading.Event(), threading.Event()
+    batches = []
+
+    def apply(key, items):
+        batches.append((key, list(items)))
+        if len(batches) == 1:
+            started.set()
+            release.wait(5)
+        return [f'{key}:{item}' for item in items]
+    coalescer = Coalescer(apply)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        first = pool.submit(coalescer.submit, 'a', 0)
+        assert started.wait(5)
+        queued = [pool.submit(coalescer.submit, 'a', i) for i in (1, 2, 3)]
+        other = pool.submit(coalescer.submit, 'b', 9)
+        assert other.result(5) == 'b:9'  # other keys never wait
+        while coalescer.stats()['contended'] < 3:
+            time.sleep(0.001)
+        release.set()
+        assert first.result(5) == 'a:0' and [f.result(5) for f in queued] == ['a:1', 'a:2', 'a:3']
+    assert sorted(len(items) for key, items in batches if key == 'a') == [1, 3]
+    stats = coalescer.stats()
+    assert (stats['submitted'], stats['batches'], stats['coalesced'], stats['largest_batch']) == (5, 3, 2, 3)
+    assert stats['queued_keys'] == 0
+
+
+def test_coalescer_fails_only_the_bad_item():
+    release, started = threading.Event(), threading.Event()
+    batches = []
+
+    def apply(key, items):
+        batches.append(list(items))
+        if items == ['first']:
+            started.set()
+            release.wait(5)
+        if 'bad' in items:
+            raise ValueError('bad upload')
+        return items
+    coalescer = Coalescer(apply)
+    with pytest.raises(ValueError):
+        coalescer.submit('a', 'bad')
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        first = pool.submit(coalescer.submit, 'a', 'first')
+        assert started.wait(5)
+        queued = [pool.submit(coalescer.submit, 'a', item) for item in ('good', 'bad', 'also good')]
+        while coalescer.stats()['contended'] < 3:
+            time.sleep(0.001)
+        release.set()
+        assert first.result(5) == 'first'
+        assert queued[0].result(5) == 'good' and queued[2].result(5) == 'also good'
+        with pytest.raises(ValueError):
+            queued[1].result(5)
+    # The batch of three failed as a whole, then each item ran alone.
+    assert sorted(batches[2]) == ['also good', 'bad', 'good']
+    assert sorted(batches[3:]) == [['also good'], ['bad'], ['good']]
+    stats = coalescer.stats()
+    assert (stats['split_batches'], stats['queued_keys']) == (1, 0)
+
+
+def upload_body(matric, level, semester, score):
+    return {'matricNumber': matric, 'name': 'Student', 'department': 'Computer Science',
+            'level': level, 'semester': semester,
+            'courses': [{'code': f'C{level}{semester}', 'score': score, 'unit': 3}]}
+
+
+def check_every_semester(server, client, scores):
+    body = client.get('/api/results/S1').get_json()
+    assert [(s['level'], s['semester']) for s in body['academicHistory']] == SEMESTERS
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        row = table.row(b'S1')
+    assert row[records.COL_SEMESTERS] == str(len(SEMESTERS)).encode()
+    assert counter_value(row, COL_REV) == counter_value(row, COL_REV_DONE)
+    points = {75: 5, 65: 4, 55: 3, 47: 2, 30: 0}
+    assert body['cgpa'] == f'{sum(points[s] for s in scores) / len(scores):.2f}'
+
+
+def test_concurrent_uploads_to_one_matric_keep_every_semester(server):
+    scores = [(75, 65, 55, 47, 30)[i % 5] for i in range(len(SEMESTERS))]
+    submitted = server.write_stats()['submitted']
+
+    def post(i):
+        level, semester = SEMESTERS[i]
+        body = upload_body('S1', level, semester, scores[i])
+        return server.app.test_client().post('/api/results', json=body).status_code
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        assert set(pool.map(post, range(len(SEMESTERS)))) == {200}
+    check_every_semester(server, server.app.test_client(), scores)
+    assert server.write_stats()['submitted'] == submitted + len(SEMESTERS)
+
+
+def test_writers_in_other_processes_keep_every_semester(server, monkeypatch):
+    # apply_uploads straight from many threads stands in for several app processes:
+    # no shared coalescer, only the version check between them.
+    monkeypatch.setattr(server, 'WRITES', VersionedWriter(attempts=200, backoff=0.0005))
+    scores = [75] * len(SEMESTERS)
+
+    def apply(i):
+        level, semester = SEMESTERS[i]
+        sem = {'level': level, 'semester': semester, 'gpa': '5.00',
+               'courses': [{'code': f'C{i}', 'score': 75, 'unit': 3, 'grade': 'A'}]}
+        return server.apply_uploads('S1', [{'sem': sem, 'name': 'Student', 'department': 'Computer Science'}])
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        list(pool.map(apply, range(len(SEMESTERS))))
+    check_every_semester(server, server.app.test_client(), scores)
+    assert server.WRITES.stats()['writes'] == len(SEMESTERS)
+
+
+def test_conflicting_upload_answers_409(server, client, upload, monkeypatch):
+    upload('S1')
+    with server.get_db(server.TABLE_STUDENTS) as table:
+        table.counter_inc(b'S1', COL_REV)  # another process is mid-write
+    monkeypatch.setattr(server, 'WRITES', VersionedWriter(attempts=2, backoff=0, claim_timeout=60))
+    response = client.post('/api/results', json=upload_body('S1', '100', 'Second', 75))
+    assert response.status_code == 409 and response.headers['Retry-After'] == '1'
+    stats = client.get('/api/writes').get_json()
+    assert stats['exhausted'] == 1 and stats['in_flight_waits'] == 2
+    assert [s['semester'] for s in client.get('/api/results/S1').get_json()['academicHistory']] == ['First']
+
+
+def test_make_writer_reads_the_environment(monkeypatch):
+    monkeypatch.setenv('UNISEMI_WRITE_ATTEMPTS', '0')
+    monkeypatch.setenv('UNISEMI_WRITE_BACKOFF', '0.5')
+    writer = writes.make_writer()
+    assert (writer.attempts, writer.backoff, writer.claim_timeout) == (1, 0.5, writes.CLAIM_TIMEOUT)
@@ -0,0 +1,173 @@
+"""
+Version history of a student's results.
+
+Every write to a student row carries an `academic:summary` cell (see
+records.summarise) in the same mutation, so it shares that write's
+timestamp, which doubles as the version id:
+
+    {"action": "upload", "level": "200", "semester": "First", "semesters": 3, "gpa": "4.10", "cgpa": "3.95"}
+
+Listing a student's history is therefore one read of at most five ~100-byte
+cells instead of decoding five full snapshots. A full snapshot is rebuilt
+only on request, by reading the academic family as of the version's
+timestamp: each semester cell as it stood right after that write. The
+family keeps 5 versions and every write adds a summary, so any semester
+cell was rewritten at most 4 times after a listed version, and its version
+at that point is still stored.
+
+A diff compares two such reads cell by cell; semesters whose cells are
+byte-identical are skipped without decoding.
+"""
+import datetime
+import json
+
+import records
+
+MAX_VERSIONS = 5
+ACTIONS = {
+    'upload': "Uploaded {level} Lvl {semester} Sem",
+    'bulk': "Bulk upload {level} Lvl {semester} Sem",
+    'migrate': "Converted to per-semester layout",
+    'recompute': "Grades recomputed",
+}
+
+
+def format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
+
+def summaries(table, key, limit=MAX_VERSIONS):
+    """[(version, summary dict)] newest first; empty for rows written before summaries existed."""
+    cells = table.cells(key, records.COL_SUMMARY, versions=limit, include_timestamp=True)
+    return [(timestamp, json.loads(value)) for value, timestamp in cells]
+
+def legacy_entries(table, key, limit=MAX_VERSIONS):
+    """
+    History of a row with no summaries yet: the versions of a legacy
+    academic:history blob, or else the latest semester cell writes.
+    """
+    blobs = table.cells(key, records.LEGACY_HISTORY, versions=limit, include_timestamp=True)
+    entries = []
+    for value, timestamp in blobs:
+        data = json.loads(value.decode('utf-8'))
+        last = data[-1] if data else {}
+        entries.append(entry(timestamp, {'action': 'upload' if data else None, 'level': last.get('level'),
+                                         'semester': last.get('semester'), 'semesters': len(data)}))
+    if blobs:
+        return entries
+    for timestamp, column, total in semester_uploads(table, key, limit):
+        level, semester = records.semester_label(column)
+        entries.append(entry(timestamp, {'action': 'upload', 'level': level, 'semester': semester,
+                                         'semesters': total}))
+    return entries
+
+def semester_uploads(table, key, limit=MAX_VERSIONS):
+    """
+    The latest `limit` semester writes as (timestamp, column, semesters on
+    record at that time), newest first. Labels come from the column names,
+    so no semester JSON is decoded.
+    """
+    first_seen, events = {}, []
+    latest = table.row(key, columns=[b'academic'], include_timestamp=True)
+    for column in latest:
+        if not records.is_semester_column(column): continue
+        versions = table.cells(key, column, versions=MAX_VERSIONS, include_timestamp=True)
+        first_seen[column] = min(ts for _, ts in versions)
+        events.extend((ts, column) for _, ts in versions)
+    events.sort(reverse=True)
+    return [(ts, column, sum(1 for seen in first_seen.values() if seen <= ts))
+            for ts, column in events[:limit]]
+
+def history(table, key, limit=MAX_VERSIONS):
+    """/api/history rows, newest first."""
+    found = summaries(table, key, limit)
+    if found:
+        return [entry(version, summary) for version, summary in found]
+    return legacy_entries(table, key, limit)
+
+def describe(summary):
+    template = ACTIONS.get(summary.get('action'), "Result Update")
+    return template.format(level=summary.get('level'), semester=summary.get('semester'))
+
+def entry(version, summary):
+    """One /api/history row."""
+    return {
+        'version': version,
+        'timestamp': format_time(version),
+        'action': describe(summary),
+        'total_semesters': summary.get('semesters'),
+        'level': summary.get('level'),
+        'semester': summary.get('semester'),
+        'gpa': summary.get('gpa'),
+        'cgpa': summary.get('cgpa'),
+    }
+
+
+# --- SNAPSHOTS ---
+def cells_at(table, key, version):
+    """The academic cells as they stood right after the write at `version`."""
+    return table.row(key, columns=[b'academic'], timestamp=version + 1)
+
+def snapshot(table, key, version):
+    """(summary entry, semester list) at `version`."""
+    cells = cells_at(table, key, version)
+    summary = json.loads(cells[records.COL_SUMMARY]) if records.COL_SUMMARY in cells else {}
+    return entry(version, summary), records.assemble_history(cells)
+
+
+# --- DIFFS ---
+def _semester_cells(cells):
+    """{semester column: cell bytes (or semester dict for a legacy blob)}."""
+    if records.LEGACY_HISTORY in cells:
+        return {records.semester_column(sem.get('level'), sem.get('semester')): sem
+                for sem in records.assemble_history(cells)}
+    return {column: value for column, value in cells.items() if records.is_semester_column(column)}
+
+def _as_semester(value):
+    if value is None or isinstance(value, dict):
+        return value
+    return records.decode_semester(value)
+
+def _course_key(course):
+    return course.get('courseCode') or course.get('code')
+
+def diff_courses(old, new):
+    before = {_course_key(c): c for c in old}
+    after = {_course_key(c): c for c in new}
+    return {
+        'added': [c for code, c in after.items() if code not in before],
+        'removed': [c for code, c in before.items() if code not in after],
+        'changed': [{'courseCode': code, 'from': before[code], 'to': c}
+                    for code, c in after.items() if code in before and before[code] != c],
+    }
+
+def diff(table, key, old_version, new_version):
+    """Semester- and course-level changes between two versions (entries for both ends included)."""
+    old_cells, new_cells = cells_at(table, key, old_version), cells_at(table, key, new_version)
+    old_sems, new_sems = _semester_cells(old_cells), _semester_cells(new_cells)
+    changes = []
+    for column in sorted(old_sems.keys() | new_sems.keys()):
+        if old_sems.get(column) == new_sems.get(column):
+            continue
+        before, after = _as_semester(old_sems.get(column)), _as_semester(new_sems.get(column))
+        if before == after:  # same semester, different encoding
+            continue
+        level, semester = records.semester_label(column)
+        changes.append({
+            'level': level,
+            'semester': semester,
+            'change': 'added' if before is None else 'removed' if after is None else 'changed',
+            'gpa': {'from': (before or {}).get('gpa'), 'to': (after or {}).get('gpa')},
+            'courses': diff_courses((before or {}).get('courses', []), (after or {}).get('courses', [])),
+        })
+    changes.sort(key=records.semester_sort_key)
+
+    ends = []
+    for version, cells in ((old_version, old_cells), (new_version, new_cells)):
+        summary = json.loads(cells[records.COL_SUMMARY]) if records.COL_SUMMARY in cells else {}
+        ends.append(entry(version, summary))
+    return {
+        'from': ends[0],
+        'to': ends[1],
+        'cgpa': {'from': ends[0]['cgpa'], 'to': ends[1]['cgpa']},
+        'semesters': changes,
+    }
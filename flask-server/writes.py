@@ -0,0 +1,229 @@
+"""
+Result uploads: per-student write coalescing and optimistic concurrency.
+
+Uploads for one matric are queued per key. The first request to arrive
+becomes the leader: it takes everything queued for that matric, applies it
+with one read, one recompute and one write, hands each request its own
+result, and passes leadership to the first request that queued meanwhile.
+Different matrics never wait on each other, and a burst of uploads for one
+student costs a single write instead of one read-modify-write each.
+
+Across processes each write is version checked, using two counters in the
+student row (HBase increments are atomic):
+
+    info:rev        revisions claimed: counter_inc'd by every writer
+    info:rev_done   revisions finished: bumped after the put, or at once by a loser
+
+A writer reads the row and proceeds only if rev == rev_done (no write in
+flight). It computes its cells, then claims with counter_inc(rev). It wins
+if the claim is exactly one past what it read; only then does it put and
+bump rev_done. Otherwise another writer got in first, so it gives its claim
+back by bumping rev_done, backs off, and retries from a fresh read, at most
+`attempts` times before WriteConflict. A claim left over by a crashed writer
+(rev > rev_done for longer than `claim_timeout`) is written off by setting
+rev_done to rev.
+
+Bulk ingest takes part a chunk at a time: it claims each row against the
+rev it read (`claim`), puts every row it won through one batch, then
+`release`s them. Rows it lost are retried one by one through `write`.
+The Spark write-back (spark_job.py) claims the same way, but skips rows
+whose rev moved since its snapshot instead of retrying them.
+"""
+import os
+import random
+import struct
+import threading
+import time
+
+COL_REV = b'info:rev'
+COL_REV_DONE = b'info:rev_done'
+MAX_ATTEMPTS = 8
+BACKOFF = 0.002                 # seconds; doubled (with jitter) on every retry
+CLAIM_TIMEOUT = 5.0             # seconds before a claim with no finished write is written off
+
+
+# --- VERSIONED WRITES ---
+class WriteConflict(Exception):
+    """Every attempt lost to another writer."""
+
+
+def counter_value(row, column):
+    value = row.get(column)
+    return struct.unpack('>q', value)[0] if value else 0
+
+
+class VersionedWriter:
+    """Version-checked read-compute-put on one row, with bounded retries."""
+
+    def __init__(self, attempts=MAX_ATTEMPTS, backoff=BACKOFF, claim_timeout=CLAIM_TIMEOUT):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.claim_timeout = claim_timeout
+        self._lock = threading.Lock()
+        self._counts = {'writes': 0, 'conflicts': 0, 'in_flight_waits': 0, 'stale_claims': 0, 'exhausted': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _sleep(self, attempt):
+        time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def _stale(self, table, key):
+        claims = table.cells(key, COL_REV, versions=1, include_timestamp=True)
+        return not claims or time.time() * 1000 - claims[0][1] > self.claim_timeout * 1000
+
+    def claim(self, table, key, row):
+        """
+        One claim on a row read as `row`, for writers that batch their puts:
+        True if the row is now ours (put, then `release`), False if another
+        write is in flight or got in first.
+        """
+        claimed, done = counter_value(row, COL_REV), counter_value(row, COL_REV_DONE)
+        if claimed != done:
+            return False
+        if table.counter_inc(key, COL_REV) != claimed + 1:
+            table.counter_inc(key, COL_REV_DONE)  # give the claim back
+            self._count('conflicts')
+            return False
+        return True
+
+    def release(self, table, key, written=True):
+        """Finishes a write claimed with `claim`; written=False if its put failed."""
+        table.counter_inc(key, COL_REV_DONE)
+        if written:
+            self._count('writes')
+
+    def write(self, table, key, read, build):
+        """
+        `read()` returns the row (with the info: family); `build(row)` returns
+        (cells, result). Puts the cells only if no other writer claimed the
+        row since the read, and returns (row as read, result).
+        """
+        for attempt in range(self.attempts):
+            row = read()
+            claimed, done = counter_value(row, COL_REV), counter_value(row, COL_REV_DONE)
+            if claimed != done:
+                if not self._stale(table, key):
+                    self._count('in_flight_waits')
+                    self._sleep(attempt)
+                    continue
+                self._count('stale_claims')
+                table.counter_set(key, COL_REV_DONE, claimed)
+            cells, result = build(row)
+            if table.counter_inc(key, COL_REV) != claimed + 1:
+                table.counter_inc(key, COL_REV_DONE)  # give the claim back
+                self._count('conflicts')
+                self._sleep(attempt)
+                continue
+            try:
+                table.put(key, cells)
+            finally:
+                table.counter_inc(key, COL_REV_DONE)
+            self._count('writes')
+            return row, result
+        self._count('exhausted')
+        raise WriteConflict(f"{key.decode('utf-8')} is being updated elsewhere; try again")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def make_writer():
+    """Writer tuned by UNISEMI_WRITE_ATTEMPTS / UNISEMI_WRITE_BACKOFF / UNISEMI_WRITE_CLAIM_TIMEOUT."""
+    return VersionedWriter(
+        attempts=max(int(os.environ.get('UNISEMI_WRITE_ATTEMPTS', MAX_ATTEMPTS)), 1),
+        backoff=float(os.environ.get('UNISEMI_WRITE_BACKOFF', BACKOFF)),
+        claim_timeout=float(os.environ.get('UNISEMI_WRITE_CLAIM_TIMEOUT', CLAIM_TIMEOUT)),
+    )
+
+
+# --- COALESCING ---
+class _Waiter:
+    __slots__ = ('item', 'event', 'lead', 'done', 'result', 'error')
+
+    def __init__(self, item):
+        self.item = item
+        self.event = threading.Event()
+        self.lead = self.done = False
+        self.result = self.error = None
+
+
+class Coalescer:
+    """
+    Runs `apply(key, items) -> results` (one result per item, in order) on
+    everything queued for a key, one batch per key at a time. If a batch
+    raises, its items are applied one by one and each waiter gets only its
+    own result or error.
+    """
+
+    def __init__(self, apply):
+        self.apply = apply
+        self._lock = threading.Lock()
+        self._queues = {}          # key -> waiters for the next batch (present while a batch runs)
+        self._counts = {'submitted': 0, 'batches': 0, 'coalesced': 0, 'largest_batch': 0, 'contended': 0,
+                        'split_batches': 0}
+
+    def submit(self, key, item):
+        """Queues `item` and blocks until the batch it lands in has been applied."""
+        waiter = _Waiter(item)
+        with self._lock:
+            self._counts['submitted'] += 1
+            queue = self._queues.get(key)
+            if queue is None:
+                self._queues[key] = [waiter]
+                waiter.lead = True
+            else:
+                queue.append(waiter)
+                self._counts['contended'] += 1
+        if not waiter.lead:
+            waiter.event.wait()
+        if not waiter.done:  # leading the next batch
+            self._run(key)
+        if waiter.error is not None:
+            raise waiter.error
+        return waiter.result
+
+    def _run(self, key):
+        with self._lock:
+            batch, self._queues[key] = self._queues[key], []
+            self._counts['batches'] += 1
+            self._counts['coalesced'] += len(batch) - 1
+            self._counts['largest_batch'] = max(self._counts['largest_batch'], len(batch))
+        try:
+            results = self.apply(key, [w.item for w in batch])
+            for waiter, result in zip(batch, results):
+                waiter.result = result
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+            else:
+                self._apply_alone(key, batch)
+        except BaseException as e:
+            for waiter in batch:
+                waiter.error = e
+        for waiter in batch:
+            waiter.done = True
+            waiter.event.set()
+        with self._lock:
+            queue = self._queues[key]
+            if queue:
+                queue[0].lead = True
+                queue[0].event.set()
+            else:
+                del self._queues[key]
+
+    def _apply_alone(self, key, batch):
+        """A batch failed: applies each item by itself, so one bad item fails only its own request."""
+        with self._lock:
+            self._counts['split_batches'] += 1
+        for waiter in batch:
+            try:
+                [waiter.result] = self.apply(key, [waiter.item])
+            except Exception as e:
+                waiter.error = e
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, queued_keys=len(self._queues))
@@ -1,18 +1,20 @@
+// Mirrors flask-server/grading.py DEFAULT_BANDS; highest band first.
+const GRADING_SCALE = [
+  { min: 70, grade: 'A', point: 5 },
+  { min: 60, grade: 'B', point: 4 },
+  { min: 50, grade: 'C', point: 3 },
+  { min: 45, grade: 'D', point: 2 },
+  { min: 0, grade: 'F', point: 0 }
+];
+const LOWEST_BAND = GRADING_SCALE[GRADING_SCALE.length - 1];
+
 function scoreToGrade(score) {
-  if (score >= 70) return 'A';
-  if (score >= 60) return 'B';
-  if (score >= 50) return 'C';
-  if (score >= 45) return 'D';
-  return 'F';
+  const band = GRADING_SCALE.find(b => score >= b.min) || LOWEST_BAND;
+  return band.grade;
 }
 function gradePointFromGrade(g) {
-  switch (g) {
-    case 'A': return 5;
-    case 'B': return 4;
-    case 'C': return 3;
-    case 'D': return 2;
-    default: return 0;
-  }
+  const band = GRADING_SCALE.find(b => b.grade === g) || LOWEST_BAND;
+  return band.point;
 }
 
 /**
@@ -41,4 +43,4 @@ function computeSemesterStats(courses = []) {
   return { semesterUnits, semesterPoints, semesterGPA, processedCourses: processed };
 }
 
-module.exports = { computeSemesterStats, scoreToGrade, gradePointFromGrade };
\ No newline at end of file
+module.exports = { computeSemesterStats, scoreToGrade, gradePointFromGrade, GRADING_SCALE };
\ No newline at end of file